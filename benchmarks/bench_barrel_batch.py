@@ -0,0 +1,80 @@
+"""Compare per-term and batched hitlist requests to the barrel manager
+
+The manager runs in its own process, the indexer uses remote barrels.
+
+Usage: python -m benchmarks.bench_barrel_batch [docCount]
+"""
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.common import syntheticCorpus, timeit
+from src.indexing.barrel_manager import BarrelManager
+from src.indexing.inverted_index import Indexer
+
+TERM_COUNTS = [1, 4, 16]
+QUERY_COUNT = 200
+
+
+def serve(path: str):
+    sys.stdout = open(os.devnull, "w")
+    BarrelManager("reindex", path).run()
+
+
+def main():
+    docCount = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    os.chdir(tempfile.mkdtemp())
+    path = os.path.join(os.getcwd(), "barrel.sock")
+    process = multiprocessing.Process(target=serve, args=(path, ))
+    process.start()
+    while not os.path.exists(path):
+        time.sleep(0.01)
+
+    try:
+        idx = Indexer(None, "reindex", "false", "remote",
+                      barrelSocket=path)  #type: ignore
+        idx.generateIndex(syntheticCorpus(docCount))
+        idx.sortHitlists()
+        idx.storeIndex()
+        words = [w for w in idx.getWords() if w not in idx.commonWords]
+        idx.cleanup()
+
+        idx = Indexer(None, "search", "false", "remote",
+                      barrelSocket=path)  #type: ignore
+        idx.prepareIndexer()
+        remote = idx.wordPairs
+        rng = random.Random(0)
+
+        print(f"\nDocuments: {docCount} | lexicon: {len(words)} words")
+        print(f"{'terms':>5} | {'per term':>10} | {'batched':>10} | "
+              f"{'rankQuery':>10}")
+        for termCount in TERM_COUNTS:
+            queries = [rng.sample(words, termCount)
+                       for _ in range(QUERY_COUNT)]
+            for query in queries[:10]:
+                fetched = remote.fetch(query)  #type: ignore
+                assert all(fetched[w] == remote[w] for w in query)
+
+            perTerm = timeit(
+                lambda: [[remote[w] for w in query] for query in queries])
+            batched = timeit(
+                lambda: [remote.fetch(query)  #type: ignore
+                         for query in queries])
+            ranking = timeit(
+                lambda: [idx.rankQuery(" ".join(query), 10)
+                         for query in queries],
+                repeat=1)
+            print(f"{termCount:5} | " + " | ".join(
+                f"{t / QUERY_COUNT * 1e3:8.3f}ms"
+                for t in (perTerm, batched, ranking)))
+        idx.cleanup()
+    finally:
+        process.terminate()
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Compare DocSet against Python lists / sets for document set operations
+
+Usage: python -m benchmarks.bench_docset [docCount]
+"""
+import random
+import sys
+from functools import reduce
+from itertools import combinations
+from operator import and_
+
+from benchmarks.common import timeit
+from src.indexing.bitmap import DocSet, docSetUnion
+from src.indexing.hitlist import MAX_DOC_ID
+
+# Fraction of documents matched by each query word
+DENSITIES = [0.001, 0.01, 0.1, 0.5]
+WORD_COUNT = 4
+
+
+def main():
+    docCount = int(sys.argv[1]) if len(sys.argv) > 1 else MAX_DOC_ID
+    rng = random.Random(0)
+    universe = range(1, docCount + 1)
+
+    blacklist = rng.sample(universe, docCount // 10)
+    blacklistSet = DocSet(blacklist)
+    probes = rng.sample(universe, 2000)
+    listTime = timeit(lambda: [p in blacklist for p in probes], repeat=1)
+    docSetTime = timeit(lambda: [p in blacklistSet for p in probes])
+    print(f"\nDocuments: {docCount}")
+    print(f"blacklist lookup: list {listTime / len(probes) * 1e6:10.2f}us | "
+          f"DocSet {docSetTime / len(probes) * 1e6:6.2f}us")
+
+    print(f"\n{'density':>8} | {'op':>12} | {'set':>9} | {'DocSet':>9}")
+    for density in DENSITIES:
+        lists = [
+            sorted(rng.sample(universe, int(docCount * density)))
+            for _ in range(WORD_COUNT)
+        ]
+        sets = [set(d) for d in lists]
+        docSets = [DocSet.fromSorted(d) for d in lists]
+
+        def partialSet():
+            for size in range(1, WORD_COUNT):
+                result = set()
+                for pair in combinations(sets, size):
+                    result |= reduce(and_, pair)
+
+        def partialDocSet():
+            for size in range(1, WORD_COUNT):
+                docSetUnion(
+                    reduce(and_, pair)
+                    for pair in combinations(docSets, size))
+
+        results = [
+            ("AND", lambda: sets[0] & sets[1],
+             lambda: docSets[0] & docSets[1]),
+            ("OR", lambda: sets[0] | sets[1], lambda: docSets[0] | docSets[1]),
+            ("cardinality", lambda: len(sets[0] | sets[1]),
+             lambda: len(docSets[0] | docSets[1])),
+            ("partial", partialSet, partialDocSet),
+        ]
+        for name, setFn, docSetFn in results:
+            print(f"{density:>8} | {name:>12} | {timeit(setFn) * 1e3:7.2f}ms"
+                  f" | {timeit(docSetFn) * 1e3:7.2f}ms")
+
+        setSize = sum(sys.getsizeof(s) for s in sets)
+        docSetSize = sum(
+            sum(sys.getsizeof(c) for c in d.containers.values())
+            for d in docSets)
+        print(f"{density:>8} | {'memory':>12} | {setSize / 1e6:7.2f}MB"
+              f" | {docSetSize / 1e6:7.2f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Compare fuzzy lookup with FuzzyIndex against a full lexicon scan
+
+Usage: python -m benchmarks.bench_fuzzy [vocabularySize]
+"""
+import os
+import random
+import string
+import sys
+import tempfile
+from collections import Counter
+from typing import List, Tuple
+
+from benchmarks.common import syntheticVocabulary, timeit
+from src.indexing.fuzzy import FuzzyIndex, gramKeys
+from src.indexing.storage import readFuzzyIndex, writeFuzzyIndex
+
+QUERY_COUNT = 200
+LIMIT = 10
+
+
+def typo(rng: random.Random, word: str) -> str:
+    i = rng.randrange(len(word))
+    letter = rng.choice(string.ascii_lowercase)
+    return rng.choice([
+        word[:i] + letter + word[i + 1:],
+        word[:i] + letter + word[i:],
+        word[:i] + word[i + 1:] or letter,
+    ])
+
+
+def scanLexicon(words: List[str], word: str) -> List[Tuple[str, float]]:
+    """Jaccard index of every lexicon word, as ranked before FuzzyIndex"""
+    grams = Counter(gramKeys(word))
+    result = []
+    for other in words:
+        otherGrams = Counter(gramKeys(other))
+        shared = sum((grams & otherGrams).values())
+        if shared > 0:
+            result.append(
+                (other, shared / (len(word) + len(other) + 2 - shared)))
+    return sorted(result, key=lambda x: (-x[1], x[0]))[:LIMIT]
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    words = syntheticVocabulary(size)
+    rng = random.Random(0)
+    queries = [typo(rng, w) for w in rng.sample(words, QUERY_COUNT)]
+
+    buildTime = timeit(lambda: FuzzyIndex.build(words), repeat=1)
+    index = FuzzyIndex.build(words)
+    path = os.path.join(tempfile.mkdtemp(), "fuzzy.bin")
+    writeFuzzyIndex(path, index)
+    loadTime = timeit(lambda: readFuzzyIndex(path), repeat=1)
+    index = readFuzzyIndex(path)
+    print(f"\nLexicon: {size} words, {os.path.getsize(path)} bytes")
+    print(f"build {buildTime:0.3f}s | load {loadTime:0.3f}s")
+
+    scanQueries = queries[:10]
+    scanTime = timeit(lambda: [scanLexicon(words, q) for q in scanQueries],
+                      repeat=1)
+    bestTime = timeit(lambda: [index.search(q, 1) for q in queries])
+    indexTime = timeit(lambda: [index.search(q, LIMIT) for q in queries])
+    for q in scanQueries:
+        expected = scanLexicon(words, q)
+        result = index.search(q, LIMIT)
+        assert [w for w, _ in result] == [w for w, _ in expected], q
+        assert index.search(q, 1) == result[:1], q
+        assert all(
+            abs(a - b) < 1e-12
+            for (_, a), (_, b) in zip(result, expected)), q
+
+    print(f"full scan   {scanTime / len(scanQueries) * 1e3:10.3f}ms/query")
+    print(f"FuzzyIndex  {indexTime / len(queries) * 1e3:10.3f}ms/query "
+          f"(top {LIMIT})")
+    print(f"FuzzyIndex  {bestTime / len(queries) * 1e3:10.3f}ms/query "
+          f"(best match)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""Compare suffix tree builders
+
+Usage: python -m benchmarks.bench_gst_build [titleCount...]
+"""
+import sys
+import time
+
+from benchmarks.common import syntheticTitles
+from src.indexing.gst import GST
+from src.indexing.suffix_tree import BUILDERS
+
+SIZES = [10000, 100000, 1000000]
+
+
+def main():
+    sizes = [int(s) for s in sys.argv[1:]] or SIZES
+    print(f"\n{'titles':>8} | {'builder':>8} | {'time':>9} | {'nodes':>9}")
+    for size in sizes:
+        titles = syntheticTitles(size)
+        for builder in BUILDERS:
+            start = time.perf_counter()
+            tree = GST(None, builder).makeTree(titles)  #type: ignore
+            elapsed = time.perf_counter() - start
+            print(f"{size:>8} | {builder:>8} | {elapsed:8.3f}s | {len(tree):>9}")
+
+
+if __name__ == "__main__":
+    main()
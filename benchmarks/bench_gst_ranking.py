@@ -0,0 +1,127 @@
+"""Compare GST ranking against the previous set intersection version
+
+Usage: python -m benchmarks.bench_gst_ranking [docCount]
+"""
+import random
+import sys
+from typing import Dict, List
+
+from benchmarks.common import syntheticCorpus, timeit
+from src.indexing.hitlist import encodeDocument
+from src.indexing.inverted_index import (
+    PARTIAL_MATCH_OCCUR_FACTOR,
+    Indexer,
+    UserQuery,
+    getDocID,
+    getPosition,
+)
+
+TERM_COUNTS = [2, 4, 8]
+QUERY_COUNT = 5
+
+
+def legacyRanking(query: UserQuery) -> Dict[int, float]:
+    """Previous `calculateRankingGST`"""
+    documentRank: Dict[int, float] = {}
+    temp = [set(h[1]) for h in query.wordPairs.values()]
+    for doc in query.docHitlists.keys():
+        exactCount = 0
+        pos: List[int] = []
+        subMatch: Dict[float, int] = {}
+        for termHits in temp:
+            t = list(set(query.docHitlists[doc]).intersection(termHits))
+            if len(t) > 0:
+                pos.extend(t)
+        if len(pos) == 0:
+            continue
+        pos.sort()
+        if len(pos) >= len(query.expectedPos):
+            marked = list(set(pos).intersection(query.rootHitlists))
+            curIter: List[int] = []
+            maxLen = len(pos) - 1
+            for idx, p in enumerate(pos):
+                if p in marked or idx == maxLen:
+                    if idx == maxLen:
+                        curIter.append(p)
+                    if len(curIter) > 0:
+                        for i, item in enumerate(curIter):
+                            curIter[i] = getPosition(item)
+                        diff = curIter[0] - query.expectedPos[0]
+                        for j, _ in enumerate(curIter):
+                            curIter[j] -= diff
+                        if curIter == query.expectedPos:
+                            exactCount += 1
+                        else:
+                            subScore = len(pos) / len(query.expectedPos)
+                            subMatch[subScore] = subMatch.get(subScore, 0) + 1
+                        if idx == maxLen:
+                            if exactCount > 0:
+                                documentRank[doc] = (exactCount *
+                                                     query.globalModifier)
+                            else:
+                                maxSubScore = max(subMatch.keys())
+                                documentRank[doc] = (
+                                    maxSubScore +
+                                    (maxSubScore / PARTIAL_MATCH_OCCUR_FACTOR *
+                                     subMatch[maxSubScore])) * query.globalModifier
+                        curIter.clear()
+                curIter.append(p)
+    return documentRank
+
+
+def main():
+    docCount = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    corpus = syntheticCorpus(docCount)
+    idx = Indexer(None, "reindex", "false", "local")  #type: ignore
+    idx.generateIndex(corpus)
+    idx.sortHitlists()
+    documentPairs = {
+        docID: encodeDocument(docID, paragraphs)[1]
+        for docID, paragraphs in corpus
+    }
+
+    ranked = sorted(idx.wordPairs.keys(),
+                    key=lambda w: len(idx.wordPairs[w]),
+                    reverse=True)
+    frequent = [w for w in ranked if w not in idx.commonWords][:100]
+
+    rng = random.Random(0)
+    print(f"\nDocuments: {docCount}")
+    print(f"{'terms':>5} | {'candidates':>10} | {'previous':>9} | {'kernel':>9}")
+    for termCount in TERM_COUNTS:
+        queries: List[UserQuery] = []
+        for _ in range(QUERY_COUNT):
+            query = UserQuery()
+            infoPairs = idx._Indexer__parseInput(  #type: ignore
+                " ".join(rng.sample(frequent, termCount)))
+            idx._Indexer__getInputPairs(query, infoPairs)  #type: ignore
+            # Every document containing a query term is a candidate, the
+            # same as documents found by the suffix tree
+            candidates = sorted({
+                getDocID(h)
+                for _, hits in query.wordPairs.values() for h in hits
+            })
+            for doc in candidates:
+                query.docHitlists[doc] = documentPairs[doc]
+            query.generateExpectedPos()
+            query.processQuery()
+            queries.append(query)
+
+        def previous():
+            return [legacyRanking(q) for q in queries]
+
+        def kernel():
+            for q in queries:
+                q.documentRank.clear()
+                q.calculateRankingGST()
+            return [dict(q.documentRank) for q in queries]
+
+        assert previous() == kernel()
+        candidates = sum(len(q.docHitlists) for q in queries)
+        print(f"{termCount:>5} | {candidates // QUERY_COUNT:>10} | "
+              f"{timeit(previous, repeat=1) / QUERY_COUNT * 1e3:7.2f}ms | "
+              f"{timeit(kernel) / QUERY_COUNT * 1e3:7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
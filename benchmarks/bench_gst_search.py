@@ -0,0 +1,65 @@
+"""Measure GST search latency on long query words
+
+Compare the whole-edge search with hashed child lookup (`GST.searchTree`)
+against the previous search, which scanned children linearly and advanced
+one character at a time.
+
+Usage: python -m benchmarks.bench_gst_search [titleCount]
+"""
+import random
+import sys
+from typing import List
+
+from benchmarks.common import syntheticTitles, timeit
+from src.indexing.gst import GST
+from src.indexing.suffix_tree import NONE, ROOT, SuffixTree
+
+QUERY_COUNT = 2000
+WORD_LENGTHS = [8, 16, 32, 64]
+
+
+def searchPerChar(tree: SuffixTree, word: str) -> int:
+    node = ROOT
+    for char in word.encode() + b"$":
+        child = tree.firstChild[node]
+        while child != NONE and tree.text[tree.edgeStart[child]] != char:
+            child = tree.nextSibling[child]
+        if child != NONE:
+            node = child
+    return node
+
+
+def main():
+    titleCount = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    titles = syntheticTitles(titleCount)
+    gst = GST(None)  #type: ignore
+    gst.tree = gst.makeTree(titles)  #type: ignore
+
+    rng = random.Random(0)
+    words = sorted({w for t in titles for w in t["title"].split()})
+    print(f"\nTitles: {titleCount} | Nodes: {len(gst.tree)}")
+    print(f"{'length':>6} | {'per char':>10} | {'whole edge':>10} | speedup")
+    for length in WORD_LENGTHS:
+        # Long words are built from title words, so most of them walk deep
+        queries: List[str] = []
+        while len(queries) < QUERY_COUNT:
+            word = ""
+            while len(word) < length:
+                word += rng.choice(words)
+            queries.append(word[:length])
+
+        def perChar():
+            for q in queries:
+                searchPerChar(gst.tree, q)
+
+        def wholeEdge():
+            for q in queries:
+                gst.searchTree(q)
+
+        old = timeit(perChar) / QUERY_COUNT * 1e6
+        new = timeit(wholeEdge) / QUERY_COUNT * 1e6
+        print(f"{length:>6} | {old:8.2f}us | {new:8.2f}us | {old / new:0.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Compare hit encoding throughput between bitarray and integer packing
+
+Usage: python -m benchmarks.bench_hit_encoding [docCount]
+"""
+import sys
+from collections import defaultdict
+from re import match, sub
+from typing import Dict, List
+
+from bitarray import bitarray
+from bitarray.util import ba2int
+
+from benchmarks.common import syntheticCorpus, timeit
+from src.indexing.hitlist import CAPITAL_PATTERN, FILTERED_CHAR, encodeDocument
+
+
+def legacyHitlists(docID: int, paragraphs: List[str],
+                   wordPairs: Dict[str, List[int]]) -> int:
+    # Previous implementation of Indexer.generateHitlists
+    sdocID = bitarray(bin(docID)[2:].zfill(19))
+    wordCount = 1
+    totalCount = 0
+    for paragraph in paragraphs:
+        paragraph = sub(r'\W+', ' ', paragraph)
+        for char in FILTERED_CHAR:
+            paragraph = paragraph.replace(char, ' ')
+        for word in paragraph.split():
+            if len(word) > 30:
+                continue
+            if wordCount > 4094:
+                wordCount = 4095
+            if word == "" or len(word) == 1:
+                continue
+            isCapital = bool(match(CAPITAL_PATTERN, word))
+            if not isCapital:
+                word = word.lower()
+            hit = ba2int(sdocID + bitarray(bin(wordCount)[2:].zfill(12)) +
+                         bitarray(bin(int(isCapital))[2:].zfill(1)))
+            wordPairs[word].append(hit)
+            wordCount += 1
+            totalCount += 1
+    return totalCount
+
+
+def packedHitlists(docID: int, paragraphs: List[str],
+                   wordPairs: Dict[str, List[int]]) -> int:
+    words, hits = encodeDocument(docID, paragraphs)
+    for word, hit in zip(words, hits):
+        wordPairs[word].append(hit)
+    return len(hits)
+
+
+def main():
+    docCount = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    corpus = syntheticCorpus(docCount)
+
+    # Both path must produce identical hitlists
+    legacy: Dict[str, List[int]] = defaultdict(list)
+    packed: Dict[str, List[int]] = defaultdict(list)
+    tokens = sum(legacyHitlists(d, p, legacy) for d, p in corpus)
+    sum(packedHitlists(d, p, packed) for d, p in corpus)
+    assert legacy == packed, "Packed hits differ from bitarray hits"
+
+    def run(fn):
+        def inner():
+            wordPairs: Dict[str, List[int]] = defaultdict(list)
+            for docID, paragraphs in corpus:
+                fn(docID, paragraphs, wordPairs)
+
+        return inner
+
+    legacyTime = timeit(run(legacyHitlists))
+    packedTime = timeit(run(packedHitlists))
+    print(f"Documents: {docCount} | Tokens: {tokens}")
+    print(f"bitarray : {tokens / legacyTime:12.0f} tokens/s")
+    print(f"packed   : {tokens / packedTime:12.0f} tokens/s")
+    print(f"Speedup  : {legacyTime / packedTime:0.2f}x")
+
+
+if __name__ == "__main__":
+    main()
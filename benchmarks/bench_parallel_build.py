@@ -0,0 +1,41 @@
+"""Measure parallel index build scaling
+
+Usage: python -m benchmarks.bench_parallel_build [docCount]
+"""
+import sys
+import time
+
+from benchmarks.common import syntheticCorpus
+from src.indexing.shard import buildIndex, buildShard
+
+WORKERS = [1, 2, 4, 8]
+
+
+def main():
+    docCount = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    corpus = syntheticCorpus(docCount)
+
+    start = time.perf_counter()
+    serial = buildShard(corpus, useGST=True)
+    serialTime = time.perf_counter() - start
+
+    results = []
+    for workers in WORKERS:
+        start = time.perf_counter()
+        shard = buildIndex(corpus, workers, useGST=True)
+        elapsed = time.perf_counter() - start
+        assert shard.wordPairs == serial.wordPairs
+        assert shard.wordDocCount == serial.wordDocCount
+        results.append((workers, elapsed))
+
+    tokens = sum(serial.wordDocCount.values())
+    print(f"\nDocuments: {docCount} | Tokens: {tokens}")
+    print(f"serial     : {serialTime:8.3f}s")
+    for workers, elapsed in results:
+        print(f"{workers} worker(s): {elapsed:8.3f}s "
+              f"| {tokens / elapsed:10.0f} tokens/s "
+              f"| {serialTime / elapsed:0.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Compare index load time between pickle files and the binary format
+
+Usage: python -m benchmarks.bench_persistence_load [docCount]
+"""
+import os
+import pickle
+import shelve
+import sys
+import tempfile
+from typing import Dict, List
+
+from benchmarks.common import syntheticCorpus, timeit
+from src.indexing.gst import GST, DBResult
+from src.indexing.inverted_index import (
+    DOC_WORD_COUNT_FILE,
+    GST_FILE,
+    PERSISTENT_DOCPAIRS_FILE,
+    PERSISTENT_WORDPAIRS_FILE,
+    Indexer,
+)
+from src.indexing.shard import buildShard
+from src.indexing.storage import (
+    BarrelStore,
+    readDocumentPairs,
+    readDocWordCount,
+    readTree,
+    writeDocumentPairs,
+    writeTree,
+)
+
+PICKLE_WORDPAIRS_FILE = "telusuri_wordpairs.pkl"
+PICKLE_DOCPAIRS_FILE = "telusuri_docpairs.pkl"
+PICKLE_GST_FILE = "telusuri_gst.pkl"
+PICKLE_DOC_WORD_COUNT_FILE = "telusuri_docwordcount.pkl"
+
+
+def main():
+    docCount = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    corpus = syntheticCorpus(docCount)
+    titles: List[DBResult] = [{
+        "id_page": docID,
+        "title": paragraphs[0][:60].lower()
+    } for docID, paragraphs in corpus]
+
+    os.chdir(tempfile.mkdtemp())
+    # GST is generated from the database, so build GST artifacts separately
+    idx = Indexer(None, "reindex", "false", "local")  #type: ignore
+    idx.generateIndex(corpus)
+    idx.sortHitlists()
+    idx.storeIndex()
+    tree = GST(None).makeTree(titles)  #type: ignore
+    documentPairs = buildShard(corpus, useGST=True).documentPairs
+    writeTree(GST_FILE, tree)
+    writeDocumentPairs(PERSISTENT_DOCPAIRS_FILE, documentPairs)
+
+    # Same artifacts, written the previous way
+    store = BarrelStore(PERSISTENT_WORDPAIRS_FILE)
+    with shelve.open(PICKLE_WORDPAIRS_FILE,
+                     protocol=pickle.HIGHEST_PROTOCOL) as shelf:
+        for firstWord, barrel in store.items():
+            shelf[firstWord] = barrel
+    store.close()
+    for path, data in ((PICKLE_DOCPAIRS_FILE, documentPairs),
+                       (PICKLE_GST_FILE, tree),
+                       (PICKLE_DOC_WORD_COUNT_FILE, idx.wordDocCount)):
+        with open(path, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loadPickle():
+        wordPairs: Dict = {}
+        with shelve.open(PICKLE_WORDPAIRS_FILE) as shelf:
+            for barrel in shelf.values():
+                wordPairs.update(barrel.pairs)
+        for path in (PICKLE_DOCPAIRS_FILE, PICKLE_GST_FILE,
+                     PICKLE_DOC_WORD_COUNT_FILE):
+            with open(path, "rb") as f:
+                pickle.load(f)
+
+    def loadBinary():
+        wordPairs: Dict = {}
+        store = BarrelStore(PERSISTENT_WORDPAIRS_FILE)
+        for barrel in store.values():
+            wordPairs.update(barrel.pairs)
+        store.close()
+        readDocumentPairs(PERSISTENT_DOCPAIRS_FILE)
+        readTree(GST_FILE)
+        readDocWordCount(DOC_WORD_COUNT_FILE)
+
+    def loadBinaryIndex():
+        # Without the GST
+        store = BarrelStore(PERSISTENT_WORDPAIRS_FILE)
+        for barrel in store.values():
+            barrel.pairs
+        store.close()
+        readDocumentPairs(PERSISTENT_DOCPAIRS_FILE)
+        readDocWordCount(DOC_WORD_COUNT_FILE)
+
+    def loadPickleIndex():
+        with shelve.open(PICKLE_WORDPAIRS_FILE) as shelf:
+            for barrel in shelf.values():
+                barrel.pairs
+        for path in (PICKLE_DOCPAIRS_FILE, PICKLE_DOC_WORD_COUNT_FILE):
+            with open(path, "rb") as f:
+                pickle.load(f)
+
+    print(f"\nDocuments: {docCount} | Words: {len(idx.wordPairs)}")
+    print(f"pickle (all)       : {timeit(loadPickle):8.4f}s")
+    print(f"binary (all)       : {timeit(loadBinary):8.4f}s")
+    print(f"pickle (no GST)    : {timeit(loadPickleIndex):8.4f}s")
+    print(f"binary (no GST)    : {timeit(loadBinaryIndex):8.4f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Compare phrase ranking against the previous concatenate-and-sort version
+
+Usage: python -m benchmarks.bench_phrase_ranking [docCount]
+"""
+import random
+import sys
+from typing import Dict, List
+
+from benchmarks.common import syntheticCorpus, timeit
+from src.indexing.inverted_index import (
+    EXACT_MATCH_FACTOR,
+    PARTIAL_MATCH_OCCUR_FACTOR,
+    Indexer,
+    UserQuery,
+    getDocID,
+    getPosition,
+)
+
+TERM_COUNTS = [2, 4, 8]
+QUERY_COUNT = 5
+
+
+def legacyRanking(query: UserQuery) -> Dict[int, float]:
+    """Previous `processQuery` and `calculateRanking`"""
+    documentRank: Dict[int, float] = {}
+    data = list(sorted(query.wordPairs.values(), key=lambda x: x[0][0]))
+    merged: List[int] = []
+    if len(data) > 1:
+        for q in data:
+            if not q[0][1]:
+                merged.extend(q[1])
+    else:
+        merged.extend(data[0][1])
+
+    merged.sort()
+    curDoc = getDocID(merged[0])
+    subMatch: Dict[float, int] = {}
+    curIter: List[int] = []
+    exactCount = 0
+    for info in merged:
+        docID = getDocID(info)
+        pos = getPosition(info)
+        if info in query.rootHitlists:
+            if len(curIter) == len(query.expectedPos):
+                diff = curIter[0] - query.expectedPos[0]
+                for i, _ in enumerate(curIter):
+                    curIter[i] -= diff
+                if curIter == query.expectedPos:
+                    exactCount += 1
+            else:
+                subScore = len(curIter) / len(query.expectedPos)
+                subMatch[subScore] = subMatch.get(subScore, 0) + 1
+            curIter.clear()
+
+        if curDoc != docID:
+            if exactCount > 0:
+                documentRank[curDoc] = (exactCount * query.globalModifier *
+                                        EXACT_MATCH_FACTOR)
+            elif len(subMatch) > 0:
+                maxSubScore = max(subMatch.keys())
+                documentRank[curDoc] = (
+                    maxSubScore + (maxSubScore / PARTIAL_MATCH_OCCUR_FACTOR *
+                                   subMatch[maxSubScore])) * query.globalModifier
+            exactCount = 0
+            subMatch.clear()
+            curIter.clear()
+            curDoc = docID
+        curIter.append(pos)
+    return documentRank
+
+
+def main():
+    docCount = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    idx = Indexer(None, "reindex", "false", "local")  #type: ignore
+    idx.generateIndex(syntheticCorpus(docCount))
+    idx.sortHitlists()
+
+    # Frequent words, right after the common words
+    ranked = sorted(idx.wordPairs.keys(),
+                    key=lambda w: len(idx.wordPairs[w]),
+                    reverse=True)
+    frequent = [w for w in ranked if w not in idx.commonWords][:100]
+
+    rng = random.Random(0)
+    print(f"\nDocuments: {docCount}")
+    print(f"{'terms':>5} | {'hits':>8} | {'previous':>9} | {'merge':>9}")
+    for termCount in TERM_COUNTS:
+        queries: List[UserQuery] = []
+        for _ in range(QUERY_COUNT):
+            query = UserQuery()
+            infoPairs = idx._Indexer__parseInput(  #type: ignore
+                " ".join(rng.sample(frequent, termCount)))
+            idx._Indexer__getInputPairs(query, infoPairs)  #type: ignore
+            query.generateExpectedPos()
+            queries.append(query)
+
+        def previous():
+            return [legacyRanking(q) for q in queries]
+
+        def merge():
+            for q in queries:
+                q.termHitlists.clear()
+                q.documentRank.clear()
+                q.processQuery()
+                q.calculateRanking()
+            return [dict(q.documentRank) for q in queries]
+
+        assert previous() == merge()
+        hits = sum(len(h) for q in queries for _, h in q.wordPairs.values())
+        print(f"{termCount:>5} | {hits // QUERY_COUNT:>8} | "
+              f"{timeit(previous, repeat=1) / QUERY_COUNT * 1e3:7.2f}ms | "
+              f"{timeit(merge) / QUERY_COUNT * 1e3:7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Compare memory usage of list-based and array-based hitlists
+
+Usage: python -m benchmarks.bench_postings_memory [hitCount]
+"""
+import sys
+import tracemalloc
+from collections import defaultdict
+from typing import Callable, Dict, List, Tuple, TypeVar
+
+from benchmarks.common import syntheticCorpus
+from src.indexing.hitlist import PostingStore, encodeDocument
+
+T = TypeVar("T")
+
+
+def measure(build: Callable[[], T]) -> Tuple[T, int]:
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def main():
+    hitCount = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    # 300 words per document by default
+    corpus = syntheticCorpus(hitCount // 300 + 1)
+    encoded = [(docID, encodeDocument(docID, paragraphs))
+               for docID, paragraphs in corpus]
+
+    def buildList():
+        wordPairs: Dict[str, List[int]] = defaultdict(list)
+        documentPairs: Dict[int, List[int]] = defaultdict(list)
+        for docID, (words, hits) in encoded:
+            for word, hit in zip(words, hits):
+                wordPairs[word].append(int(hit))
+            documentPairs[docID].extend(int(hit) for hit in hits)
+        for hitlists in wordPairs.values():
+            hitlists.sort(reverse=True)
+        return wordPairs, documentPairs
+
+    def buildStore():
+        wordPairs: PostingStore[str] = PostingStore()
+        documentPairs: PostingStore[int] = PostingStore()
+        for docID, (words, hits) in encoded:
+            for word, hit in zip(words, hits):
+                wordPairs.append(word, hit)
+            documentPairs.extend(docID, hits)
+        wordPairs.freeze()
+        documentPairs.freeze(sort=False)
+        return wordPairs, documentPairs
+
+    (listPairs, _), listSize = measure(buildList)
+    (storePairs, _), storeSize = measure(buildStore)
+    hits = sum(len(h) for h in listPairs.values())
+    assert hits == storePairs.hitCount()
+
+    print(f"Hits: {hits} | Words: {len(storePairs)}")
+    print(f"list  : {listSize / 2**20:10.2f} MiB "
+          f"({listSize / hits:0.1f} bytes/hit, word + document pairs)")
+    print(f"array : {storeSize / 2**20:10.2f} MiB "
+          f"({storeSize / hits:0.1f} bytes/hit, word + document pairs)")
+    print(f"Reduction: {100 * (1 - storeSize / listSize):0.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Compare the struct packed protocol against the pickled framing
+
+Usage: python -m benchmarks.bench_protocol [messages]
+"""
+import pickle
+import random
+import socket
+import sys
+import threading
+from array import array
+from typing import Any, Dict, List
+
+from benchmarks.common import timeit
+from src.indexing.hitlist import HIT_TYPECODE
+from src.indexing.protocol import (
+    HEADER_LEN,
+    MSG_HEADER,
+    PacketCommand,
+    PacketEnd,
+    PacketScope,
+    encodeHeader,
+    parseHeader,
+    parsePostings,
+    postingsPayload,
+    recvPacket,
+    sendPacket,
+)
+
+HIT_COUNTS = [0, 100, 10000, 1000000]
+# Pickled header of the previous protocol, sliced with a fixed length
+LEGACY_HEADER_LEN = 156
+
+
+def legacyEncode(hits: List[int]) -> bytes:
+    header = {
+        "magicPacket": MSG_HEADER,
+        "isEnd": PacketEnd.T,
+        "command": PacketCommand.GET,
+        "scope": PacketScope.WORD,
+    }
+    data = pickle.dumps(header, protocol=pickle.HIGHEST_PROTOCOL)
+    assert len(data) == LEGACY_HEADER_LEN
+    return data + pickle.dumps(hits, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def legacyDecode(data: bytes) -> Dict[str, Any]:
+    h = pickle.loads(data[:LEGACY_HEADER_LEN])
+    if h["magicPacket"] != MSG_HEADER:
+        raise ValueError
+    return pickle.loads(data[LEGACY_HEADER_LEN:])
+
+
+def encode(hits: "array[int]") -> List[Any]:
+    payload = postingsPayload(hits)
+    return [
+        encodeHeader(PacketCommand.GET, PacketScope.WORD, PacketEnd.T,
+                     payload.nbytes), payload
+    ]
+
+
+def decode(data: bytes) -> memoryview:
+    view = memoryview(data)
+    parseHeader(view[:HEADER_LEN])
+    return parsePostings(view[HEADER_LEN:])
+
+
+def socketRate(hits: "array[int]", messages: int) -> float:
+    left, right = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    def receive():
+        for _ in range(messages):
+            result = recvPacket(right)
+            assert result is not None
+            assert len(parsePostings(result[1])) == len(hits)
+
+    def run():
+        receiver = threading.Thread(target=receive)
+        receiver.start()
+        for _ in range(messages):
+            sendPacket(left, PacketCommand.GET, PacketScope.WORD,
+                       postingsPayload(hits))
+        receiver.join()
+
+    elapsed = timeit(run, repeat=1)
+    left.close()
+    right.close()
+    return messages / elapsed
+
+
+def main():
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rng = random.Random(0)
+
+    print(f"\n{'hits':>8} | {'pickle enc':>12} | {'struct enc':>12} | "
+          f"{'pickle dec':>12} | {'struct dec':>12} | {'socket':>10}")
+    for hitCount in HIT_COUNTS:
+        hits = array(HIT_TYPECODE,
+                     sorted(rng.getrandbits(32) for _ in range(hitCount)))
+        hitList = hits.tolist()
+        count = max(1, messages // max(1, hitCount // 100))
+
+        legacyData = legacyEncode(hitList)
+        data = b"".join(encode(hits))
+        assert legacyDecode(legacyData) == hitList
+        assert decode(data) == hits
+
+        rates = [
+            count / timeit(lambda: [fn(arg) for _ in range(count)])
+            for fn, arg in ((legacyEncode, hitList), (encode, hits),
+                            (legacyDecode, legacyData), (decode, data))
+        ]
+        print(f"{hitCount:8} | " +
+              " | ".join(f"{r:10.0f}/s" for r in rates) +
+              f" | {socketRate(hits, count):8.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
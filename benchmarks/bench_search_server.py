@@ -0,0 +1,177 @@
+"""Load test the search services over a Unix socket
+
+Report throughput and latency of the threaded and the asyncio search
+server, for several numbers of connections and pipelined requests. Servers
+run in their own process and only rank documents, without a database.
+
+Usage: python -m benchmarks.bench_search_server [docCount] [requests]
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import sys
+import tempfile
+import time
+from typing import List, Tuple
+
+from benchmarks.common import syntheticCorpus
+from src.indexing.inverted_index import Indexer
+from src.indexing.search_server import (
+    SERVER_ASYNC,
+    SERVER_THREADED,
+    AsyncSearchServer,
+    SearchServer,
+)
+
+# (connections, pipelined requests per connection)
+LOADS = [(1, 1), (8, 1), (8, 8)]
+K = 10
+# Requests pipelined before stopping the server
+SHUTDOWN_REQUESTS = 32
+
+
+def serve(kind: str, path: str):
+    sys.stdout = open(os.devnull, "w")
+    idx = Indexer(None, "search", "false", "segment")  #type: ignore
+    idx.prepareIndexer()
+
+    def rankOnly(input: str, k):
+        rank = idx.rankQuery(input, k).documentRank
+        return {
+            docID: (docID, score, "", "")
+            for docID, score in sorted(
+                rank.items(), key=lambda x: x[1], reverse=True)
+        }
+
+    if kind == SERVER_THREADED:
+        SearchServer(path, rankOnly).serve()
+    else:
+        AsyncSearchServer(path, rankOnly).serve()
+
+
+async def connection(path: str, queries: List[str], depth: int,
+                     latencies: List[float]):
+    reader, writer = await asyncio.open_unix_connection(path)
+    sent: List[float] = []
+
+    def send(query: str):
+        writer.write(json.dumps({"query": query, "k": K}).encode() + b"\n")
+        sent.append(time.perf_counter())
+
+    for query in queries[:depth]:
+        send(query)
+    for i in range(len(queries)):
+        response = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - sent[i])
+        assert "results" in response, response
+        if i + depth < len(queries):
+            send(queries[i + depth])
+    writer.close()
+    await writer.wait_closed()
+
+
+async def generateLoad(path: str, queries: List[str], connections: int,
+                       depth: int) -> Tuple[float, List[float]]:
+    latencies: List[float] = []
+    perConnection = len(queries) // connections
+    start = time.perf_counter()
+    await asyncio.gather(*(connection(
+        path, queries[i * perConnection:(i + 1) * perConnection], depth,
+        latencies) for i in range(connections)))
+    return time.perf_counter() - start, latencies
+
+
+def checkShutdown(path: str, process: multiprocessing.Process,
+                  queries: List[str]) -> int:
+    """checkShutdown
+
+    Pipeline requests, stop the server, then keep sending. Every request
+    received before the signal must still be answered.
+
+    Returns:
+        Number of answers
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(path)
+    requests = [
+        json.dumps({"query": query, "k": None}).encode() + b"\n"
+        for query in queries[:SHUTDOWN_REQUESTS]
+    ]
+    sock.sendall(b"".join(requests))
+    time.sleep(0.05)
+    assert process.pid is not None
+    os.kill(process.pid, signal.SIGTERM)
+    time.sleep(0.01)
+    try:
+        sock.sendall(requests[0])
+    except OSError:
+        # Already closed by the server
+        pass
+
+    answers = 0
+    with sock.makefile("rb") as f:
+        try:
+            for line in f:
+                assert "results" in json.loads(line), line
+                answers += 1
+        except ConnectionResetError:
+            # Closed with the late request unread
+            pass
+    sock.close()
+    return answers
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    docCount = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    requestCount = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    os.chdir(tempfile.mkdtemp())
+    idx = Indexer(None, "reindex", "false", "segment")  #type: ignore
+    idx.generateIndex(syntheticCorpus(docCount))
+    idx.sortHitlists()
+    idx.storeIndex()
+    ranked = sorted(idx.getWords(),
+                    key=lambda w: len(idx.wordPairs[w]),
+                    reverse=True)
+    frequent = [w for w in ranked if w not in idx.commonWords][:100]
+    rng = random.Random(0)
+    queries = [
+        " ".join(rng.sample(frequent, rng.randint(1, 4)))
+        for _ in range(requestCount)
+    ]
+
+    print(f"\nDocuments: {docCount} | requests: {requestCount}")
+    print(f"{'server':>9} | {'conns':>5} | {'depth':>5} | {'QPS':>8} | "
+          f"{'p50':>9} | {'p99':>9}")
+    for kind in (SERVER_THREADED, SERVER_ASYNC):
+        path = os.path.join(os.getcwd(), f"{kind}.sock")
+        process = multiprocessing.Process(target=serve, args=(kind, path))
+        process.start()
+        while not os.path.exists(path):
+            time.sleep(0.01)
+
+        for connections, depth in LOADS:
+            elapsed, latencies = asyncio.run(
+                generateLoad(path, queries, connections, depth))
+            print(f"{kind:>9} | {connections:5} | {depth:5} | "
+                  f"{len(latencies) / elapsed:8.1f} | "
+                  f"{percentile(latencies, 0.5) * 1e3:7.2f}ms | "
+                  f"{percentile(latencies, 0.99) * 1e3:7.2f}ms")
+
+        answers = checkShutdown(path, process, queries)
+        process.join()
+        print(f"{kind:>9} | shutdown answered {answers}/{SHUTDOWN_REQUESTS} "
+              f"pipelined requests")
+        assert answers >= SHUTDOWN_REQUESTS
+
+
+if __name__ == "__main__":
+    main()
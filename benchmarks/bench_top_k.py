@@ -0,0 +1,84 @@
+"""Compare ranking every document against top-k ranking
+
+Usage: python -m benchmarks.bench_top_k [docCount]
+"""
+import os
+import random
+import sys
+import tempfile
+
+from benchmarks.common import syntheticCorpus, timeit
+from src.indexing.inverted_index import Indexer, UserQuery
+
+TERM_COUNTS = [1, 2, 4, 8]
+QUERY_COUNT = 5
+K = 10
+
+
+def main():
+    docCount = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    os.chdir(tempfile.mkdtemp())
+    idx = Indexer(None, "reindex", "false", "segment")  #type: ignore
+    idx.generateIndex(syntheticCorpus(docCount))
+    idx.sortHitlists()
+    idx.storeIndex()
+    ranked = sorted(idx.getWords(),
+                    key=lambda w: len(idx.wordPairs[w]),
+                    reverse=True)
+    frequent = [w for w in ranked if w not in idx.commonWords][:100]
+
+    # Search from the stored segment, postings are decoded on every query
+    idx = Indexer(None, "search", "false", "segment")  #type: ignore
+    idx.prepareIndexer()
+
+    def parse(text: str) -> UserQuery:
+        query = UserQuery()
+        infoPairs = idx._Indexer__parseInput(text)  #type: ignore
+        idx._Indexer__getInputPairs(query, infoPairs)  #type: ignore
+        query.generateExpectedPos()
+        query.processQuery()
+        return query
+
+    rng = random.Random(0)
+    print(f"\nDocuments: {docCount}, k: {K}")
+    print(f"{'terms':>5} | {'ranked':>7} | {'every doc':>10} | {'top-k':>9}")
+    for termCount in TERM_COUNTS:
+        queries = [
+            " ".join(rng.sample(frequent, termCount))
+            for _ in range(QUERY_COUNT)
+        ]
+        ranked = []
+
+        def everyDocument():
+            result = []
+            for text in queries:
+                query = parse(text)
+                query.calculateRanking()
+                idx.filterQuery(query)
+                ranked.append(len(query.documentRank))
+                result.append(
+                    sorted(query.documentRank.items(),
+                           key=lambda x: x[1],
+                           reverse=True)[:K])
+            return result
+
+        def topK():
+            result = []
+            for text in queries:
+                query = parse(text)
+                query.calculateTopRanking(K, idx.documentBlacklist)
+                result.append(
+                    sorted(query.documentRank.items(),
+                           key=lambda x: x[1],
+                           reverse=True))
+            return result
+
+        assert everyDocument() == topK()
+        print(f"{termCount:>5} | {sum(ranked[:QUERY_COUNT]) // QUERY_COUNT:>7} | "
+              f"{timeit(everyDocument) / QUERY_COUNT * 1e3:8.2f}ms | "
+              f"{timeit(topK) / QUERY_COUNT * 1e3:7.2f}ms")
+    idx.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import random
+import string
+import time
+from itertools import accumulate
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+Document = Tuple[int, List[str]]
+
+
+def syntheticVocabulary(size: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    words: Set[str] = set()
+    while len(words) < size:
+        length = rng.randint(2, 12)
+        word = "".join(rng.choices(string.ascii_lowercase, k=length))
+        # Sprinkle some capital words, the indexer store them as-is
+        if rng.random() < 0.05:
+            word = word.upper()
+        words.add(word)
+    return sorted(words)
+
+
+def syntheticCorpus(docCount: int,
+                    paragraphs: int = 5,
+                    wordsPerParagraph: int = 60,
+                    vocabularySize: int = 20000,
+                    seed: int = 0) -> List[Document]:
+    """syntheticCorpus
+
+    Generate documents with a Zipf-like word distribution, so frequent words
+    behave like real common words.
+
+    Returns:
+        List of (docID, paragraphs)
+    """
+    rng = random.Random(seed)
+    vocabulary = syntheticVocabulary(vocabularySize, seed)
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    corpus: List[Document] = []
+    for docID in range(1, docCount + 1):
+        texts = [
+            " ".join(rng.choices(vocabulary, weights, k=wordsPerParagraph))
+            for _ in range(paragraphs)
+        ]
+        corpus.append((docID, texts))
+    return corpus
+
+
+def timeit(fn: Callable[[], object], repeat: int = 3) -> float:
+    """Return the best wall clock time of `repeat` runs"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def syntheticTitles(count: int,
+                    wordsPerTitle: int = 6,
+                    vocabularySize: int = 50000,
+                    seed: int = 0) -> List[Dict[str, Any]]:
+    """syntheticTitles
+
+    Generate page titles in the shape returned by `GST.getTitle`.
+    """
+    rng = random.Random(seed)
+    vocabulary = [w.lower() for w in syntheticVocabulary(vocabularySize, seed)]
+    cumWeights = list(
+        accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+    titles: List[Dict[str, Any]] = []
+    for docID in range(1, count + 1):
+        words = rng.choices(vocabulary, cum_weights=cumWeights, k=wordsPerTitle)
+        titles.append({"id_page": docID, "title": " ".join(words)})
+    return titles
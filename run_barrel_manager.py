@@ -0,0 +1,18 @@
+import os
+
+from dotenv import load_dotenv
+
+from src.indexing.barrel_manager import BarrelManager
+from src.indexing.protocol import BARREL_SOCKET_PATH
+
+# INDEXER_STATUS:
+#   reindex: Start empty, then wait for an indexer to dump its index
+#   search: Load the stored barrels
+
+if __name__ == "__main__":
+    load_dotenv()
+    status = str(os.getenv("INDEXER_STATUS"))
+    # Socket path of the barrel manager
+    socketPath = os.getenv("INDEXER_BARREL_SOCKET") or BARREL_SOCKET_PATH
+    manager = BarrelManager(status, socketPath)
+    manager.run()
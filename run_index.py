@@ -4,28 +4,49 @@ from dotenv import load_dotenv
 
 from src.database.database import Database
 from src.indexing.inverted_index import Indexer
+from src.indexing.protocol import BARREL_SOCKET_PATH
+from src.indexing.search_server import SEARCH_SOCKET_PATH, SERVER_ASYNC
+from src.indexing.suffix_tree import BUILDER_UKKONEN
 
-# TODO This will be only for testing purpose.
-# Next step will hide this behind an IPC handler
+# INDEXER_STATUS:
+#   reindex: Build and store the index, then answer a single query
+#   search: Load the stored index, then answer a single query
+#   serve: Load the stored index, then serve queries on INDEXER_SOCKET
 
 if __name__ == "__main__":
     load_dotenv()
     status = str(os.getenv("INDEXER_STATUS"))
     useGST = str(os.getenv("INDEXER_USE_GST"))
     barrelMode = str(os.getenv("INDEXER_BARREL_STORE"))
+    # Number of indexing processes, only used when reindexing
+    workers = int(os.getenv("INDEXER_WORKERS") or 1)
+    # Memory budget for loaded barrels in search mode
+    cacheBudget = int(os.getenv("INDEXER_BARREL_CACHE_MB") or 256) * 1024 * 1024
+    # Suffix tree builder, either "ukkonen" (default) or "naive"
+    gstBuilder = os.getenv("INDEXER_GST_BUILDER") or BUILDER_UKKONEN
+    # Socket path of the search service
+    socketPath = os.getenv("INDEXER_SOCKET") or SEARCH_SOCKET_PATH
+    # Search service, either "async" (default) or "threaded"
+    server = os.getenv("INDEXER_SERVER") or SERVER_ASYNC
+    # Socket path of the barrel manager, only used in remote barrel mode
+    barrelSocket = os.getenv("INDEXER_BARREL_SOCKET") or BARREL_SOCKET_PATH
     db = Database()
-    idx = Indexer(db, status, useGST, barrelMode)
+    idx = Indexer(db, status, useGST, barrelMode, cacheBudget, gstBuilder,
+                  barrelSocket)
 
     try:
         if status == "reindex":
             dump = idx.getRepositoryDump()
-            idx.generateIndex(dump)
+            idx.generateIndex(dump, workers)
             idx.sortHitlists()
             idx.storeIndex()
-        elif status == "search":
+        elif status in ("search", "serve"):
             idx.prepareIndexer()
 
-        userInput = input("Input query: ")
-        idx.search(userInput)
+        if status == "serve":
+            idx.listen(socketPath, server)
+        else:
+            userInput = input("Input query: ")
+            idx.search(userInput)
     finally:
         idx.cleanup()
@@ -0,0 +1,150 @@
+import socket
+import threading
+from array import array
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from src.indexing.hitlist import HIT_TYPECODE
+from src.indexing.protocol import (
+    BARREL_SOCKET_PATH,
+    PacketCommand,
+    PacketScope,
+    encodeBatch,
+    encodeKey,
+    encodeKeys,
+    iterBatch,
+    parsePostings,
+    recvPacket,
+    sendPacket,
+)
+
+
+class BarrelClient:
+    """BarrelClient - Connection to a `BarrelManager`
+
+    A single connection is kept open, and messages are sent one at a time.
+
+    Attributes:
+        sock: Connected socket
+        lock: Serialize messages from several threads
+    """
+    __slots__ = ("sock", "lock")
+
+    def __init__(self, path: str = BARREL_SOCKET_PATH) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.lock = threading.Lock()
+
+    def request(self, command: PacketCommand, scope: PacketScope,
+                payload: Union[bytes, bytearray] = b"") -> memoryview:
+        with self.lock:
+            sendPacket(self.sock, command, scope, payload)
+            message = recvPacket(self.sock)
+        if message is None:
+            raise ConnectionError("Barrel manager closed the connection")
+        return message[1]
+
+    def get(self, scope: PacketScope,
+            key: Union[str, int]) -> Optional[memoryview]:
+        """get
+
+        Returns:
+            Raw hitlist of key, None when key is missing
+        """
+        payload = self.request(PacketCommand.GET, scope, encodeKey(scope, key))
+        for _, hits in iterBatch(scope, payload):
+            return hits
+        return None
+
+    def getBatch(
+        self, scope: PacketScope, keys: Iterable[Union[str, int]]
+    ) -> Iterator[Tuple[Union[str, int], memoryview]]:
+        """getBatch
+
+        Fetch the hitlists of many keys with a single request.
+
+        Returns:
+            (key, raw hitlist) of every key found, hitlists are views into
+            the response
+        """
+        payload = self.request(PacketCommand.GET_BATCH, scope,
+                               encodeKeys(scope, keys))
+        return iterBatch(scope, payload)
+
+    def dump(self, scope: PacketScope,
+             pairs: Iterable[Tuple[Union[str, int], Sequence[int]]]):
+        """dump
+
+        Replace every pairs of scope, and wait until they are persisted.
+        """
+        self.request(PacketCommand.DUMP, scope, encodeBatch(scope, pairs))
+
+    def close(self):
+        self.sock.close()
+
+
+class RemotePostings(Mapping[Any, "array[int]"]):
+    """RemotePostings - Hitlists of a scope, fetched from a `BarrelManager`
+
+    Nothing is kept locally, every access asks the manager.
+
+    Attributes:
+        client: Connection to the manager
+        scope: Word or document pairs
+    """
+    __slots__ = ("client", "scope")
+
+    def __init__(self, client: BarrelClient, scope: PacketScope) -> None:
+        self.client = client
+        self.scope = scope
+
+    def __getitem__(self, key: Union[str, int]) -> "array[int]":
+        if key == "":
+            # An empty key asks for every key
+            raise KeyError(key)
+        payload = self.client.get(self.scope, key)
+        if payload is None:
+            raise KeyError(key)
+        hits = array(HIT_TYPECODE)
+        hits.frombytes(payload.cast("B"))
+        return hits
+
+    def fetch(self,
+              keys: Iterable[Union[str, int]]) -> Dict[Any, Sequence[int]]:
+        """Hitlists of every key found, with a single request"""
+        result: Dict[Any, Sequence[int]] = {}
+        keys = list(keys)
+        if len(keys) == 0:
+            return result
+        if len(keys) == 1:
+            # A plain GET is lighter for a single key
+            try:
+                result[keys[0]] = self[keys[0]]
+            except KeyError:
+                pass
+            return result
+        for key, view in self.client.getBatch(self.scope, keys):
+            hits = array(HIT_TYPECODE)
+            hits.frombytes(view.cast("B"))
+            result[key] = hits
+        return result
+
+    def __iter__(self) -> Iterator[Union[str, int]]:
+        payload = self.client.request(PacketCommand.GET, self.scope)
+        if self.scope == PacketScope.WORD:
+            if len(payload) == 0:
+                return iter(())
+            return iter(bytes(payload).decode().split("\n"))
+        return iter(parsePostings(payload).tolist())
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
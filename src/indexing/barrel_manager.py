@@ -1,145 +1,260 @@
 import os
-import pickle
-import shelve
+import signal
 import socket
+import socketserver
+import threading
 import time
-from collections import defaultdict
-from typing import Dict, List
+from array import array
+from typing import Dict, Iterator, Mapping, Sequence, Set
 
+from src.indexing.compression import CompressedPostings
+from src.indexing.hitlist import HIT_TYPECODE
 from src.indexing.protocol import (
+    BARREL_SOCKET_PATH,
+    DOC_KEY,
+    Buffer,
     HeaderDict,
     PacketCommand,
-    PacketEnd,
     PacketScope,
-    parseHeader,
+    batchRecords,
+    decodeKey,
+    encodeBatch,
+    iterBatch,
+    postingsPayload,
+    recvPacket,
+    sendPacket,
+    sendStream,
+)
+from src.indexing.storage import (
+    BarrelStore,
+    readDocumentPairs,
+    splitBarrels,
+    writeBarrels,
+    writeDocumentPairs,
 )
 
 MANAGER_STATUS_READY = 0  # Ready to use for searching
 MANAGER_STATUS_REINDEX = 1  # Empty. Need to feeded by data
 MANAGER_STATUS_PREPARING = 2  # Nah
 
-PERSISTENT_WORDPAIRS_FILE = "telusuri_wordpairs.pkl"
-PERSISTENT_DOCPAIRS_FILE = "telusuri_docpairs.pkl"
-SOCKET_PATH = "/tmp/telusuri.sock"
+PERSISTENT_WORDPAIRS_FILE = "telusuri_wordpairs.bin"
+PERSISTENT_DOCPAIRS_FILE = "telusuri_docpairs.bin"
+BARREL_COUNT = 128
+# Connections waiting to be accepted
+MAX_BACKLOG = 128
+
 
-MAX_PACKET_LEN = 65536
-HEADER_LEN = 156
+class BarrelRequestHandler(socketserver.BaseRequestHandler):
+    """BarrelRequestHandler - Answer every message of a single connection
 
+    Every message is answered by a single message, with the same command and
+    scope.
 
-class Barrel:
+    GET: key as payload, see `encodeKey`. Answered by the pair of the key
+        as a single record, see `encodeBatch`, so an empty hitlist isn't
+        mistaken for a missing key, answered by an empty payload. An empty
+        key is answered by every key instead, words separated by newlines
+        or uint32 docIDs.
+    GET_BATCH: keys as payload, see `encodeKeys`. Answered by the pairs of
+        every key found, see `encodeBatch`, streamed in several packets.
+    DUMP: every pairs as payload, see `encodeBatch`. Replace the pairs of
+        the scope and answered by an empty payload once they are persisted.
+    """
+    server: "BarrelManager"
 
-    __slots__ = ("lastAccessed","pairs", "isLoaded" )
+    def setup(self):
+        self.server.track(self.request, True)
 
-    def __init__(self) -> None:
-        self.pairs: Dict[str, List[int]] = {}
-        self.isLoaded = False
-        # self.documentPairs: Dict[int, List[int]] = defaultdict(list)
+    def finish(self):
+        self.server.track(self.request, False)
 
+    def handle(self):
+        while True:
+            try:
+                message = recvPacket(self.request)
+            except (ConnectionError, ValueError):
+                # Peer is gone or framing is lost
+                return
+            if message is None:
+                return
+            header, payload = message
+            if header["command"] == PacketCommand.GET_BATCH:
+                sendStream(self.request, header["command"], header["scope"],
+                           self.server.getBatch(header["scope"], payload))
+            else:
+                sendPacket(self.request, header["command"], header["scope"],
+                           self.server.answer(header, payload))
 
-class BarrelManager:
-    """BarrelManager - Manage persistence storage
 
-    Persistence storage are implemented using multiple binary files (barrels),
-    spread into several, fixed amount of file.
+class BarrelManager(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """BarrelManager - Postings server over a Unix socket
 
-    File format are: `barrel_{baseWord}.pkl`
+    Hold the postings of every word, and of every document when GST is used,
+    so several search processes share a single copy instead of loading the
+    index on their own. Word postings stay compressed in memory and are
+    persisted as barrels, see `storage.writeBarrels`.
 
     Attributes:
-        barrelCount: Number of total barrel
-        pairs: Dictionary for mapping between huhu and hehe
-        rootPath: Root directory path where barrels are/will be located
+        path: Socket path
+        status: One of MANAGER_STATUS_*
+        wordPairs: Compressed hitlist of every word
+        documentPairs: Hitlist of every document
+        lock: Serialize dumps
+        connections: Currently open connections
     """
-    __slots__ = ("wordPairs", "documentPairs","wordPersistence", "documentPersistence",
-                 "sock")
+    daemon_threads = False
+    block_on_close = True
+    request_queue_size = MAX_BACKLOG
 
-    def __init__(self, status: str) -> None:
-        self.__check()
+    def __init__(self, status: str, path: str = BARREL_SOCKET_PATH) -> None:
+        if os.path.exists(path):
+            # Left by a manager that wasn't shut down properly
+            os.remove(path)
+        self.path = path
+        self.status = MANAGER_STATUS_PREPARING
+        self.wordPairs: Dict[str, CompressedPostings] = {}
+        self.documentPairs: Mapping[int, Sequence[int]] = {}
+        self.lock = threading.Lock()
+        self.connections: Set[socket.socket] = set()
+        self.connectionsLock = threading.Lock()
 
-        self.wordPairs: Dict[str, List[int]] = defaultdict(list)
-        self.documentPairs: Dict[int, List[int]] = defaultdict(list)
-        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-
-        # Remove file if reindexing
         if status == "reindex":
-            # self.status = MANAGER_STATUS_REINDEX
-            if os.path.exists(PERSISTENT_WORDPAIRS_FILE):
-                os.remove(PERSISTENT_WORDPAIRS_FILE)
-            if os.path.exists(PERSISTENT_DOCPAIRS_FILE):
-                os.remove(PERSISTENT_DOCPAIRS_FILE)
+            # Remove file if reindexing
+            for persistence in (PERSISTENT_WORDPAIRS_FILE,
+                                PERSISTENT_DOCPAIRS_FILE):
+                if os.path.exists(persistence):
+                    os.remove(persistence)
+            self.status = MANAGER_STATUS_REINDEX
+        else:
+            self.loadPersistence()
+            self.status = MANAGER_STATUS_READY
+        super().__init__(path, BarrelRequestHandler)
 
-        self.wordPersistence: shelve.Shelf[Barrel] = shelve.open(
-            PERSISTENT_FILE, protocol=pickle.HIGHEST_PROTOCOL)
-        self.sock.bind(SOCKET_PATH)
-        self.sock.listen(1)
+    def loadPersistence(self):
+        start = time.perf_counter()
+        if os.path.exists(PERSISTENT_WORDPAIRS_FILE):
+            store = BarrelStore(PERSISTENT_WORDPAIRS_FILE)
+            try:
+                for firstWord in store:
+                    self.wordPairs.update(store[firstWord].pairs)
+            finally:
+                store.close()
+        if os.path.exists(PERSISTENT_DOCPAIRS_FILE):
+            self.documentPairs = readDocumentPairs(PERSISTENT_DOCPAIRS_FILE)
+        end = time.perf_counter()
+        print(f"Loaded {len(self.wordPairs)} words, "
+              f"{len(self.documentPairs)} documents: {end - start:0.4f}s")
 
-    def dumpDocumentPairs(self):
-        pass
+    def answer(self, header: HeaderDict, payload: memoryview) -> Buffer:
+        scope = header["scope"]
+        if header["command"] == PacketCommand.GET:
+            if scope == PacketScope.WORD:
+                return self.getWordPairs(payload)
+            return self.getDocumentPairs(payload)
 
-    def dumpWordPairs(self):
-        pass
+        with self.lock:
+            if scope == PacketScope.WORD:
+                self.dumpWordPairs(payload)
+            else:
+                self.dumpDocumentPairs(payload)
+        return b""
 
-    def getWordPairs(self, input: str) -> bytes:
-        # TODO
-        pass
+    def getWordPairs(self, payload: memoryview) -> Buffer:
+        if len(payload) == 0:
+            return "\n".join(self.wordPairs).encode()
+        word = str(decodeKey(PacketScope.WORD, payload))
+        postings = self.wordPairs.get(word)
+        if postings is None:
+            return b""
+        return encodeBatch(PacketScope.WORD, [(word, postings.decode())])
 
-    def getDocumentPairs(self, input: int) -> bytes:
-        # TODO
-        pass
+    def getDocumentPairs(self, payload: memoryview) -> Buffer:
+        if len(payload) == 0:
+            return postingsPayload(list(self.documentPairs))
+        if len(payload) != DOC_KEY.size:
+            return b""
+        docID = int(decodeKey(PacketScope.DOC, payload))
+        hits = self.documentPairs.get(docID)
+        if hits is None:
+            return b""
+        return encodeBatch(PacketScope.DOC, [(docID, hits)])
 
-    def loadPersistence(self):
-        for barrel in self.persistence.values():
-            self.pairs.update(barrel.pairs)
+    def getBatch(self, scope: PacketScope,
+                 payload: memoryview) -> Iterator[Buffer]:
+        if scope == PacketScope.WORD:
+            return batchRecords(scope, (
+                (word, self.wordPairs[str(word)].decode())
+                for word, _ in iterBatch(scope, payload)
+                if word in self.wordPairs))
+        return batchRecords(scope, (
+            (docID, self.documentPairs[int(docID)])
+            for docID, _ in iterBatch(scope, payload)
+            if docID in self.documentPairs))
+
+    def dumpWordPairs(self, payload: memoryview):
+        start = time.perf_counter()
+        pairs = sorted((str(word), CompressedPostings.encode(hits))
+                       for word, hits in iterBatch(PacketScope.WORD, payload))
+        barrels, manifest = splitBarrels(pairs, BARREL_COUNT)
+        writeBarrels(PERSISTENT_WORDPAIRS_FILE, barrels, manifest)
+        self.wordPairs = dict(pairs)
+        self.status = MANAGER_STATUS_READY
+        end = time.perf_counter()
+        print(f"Stored {len(pairs)} words in {len(manifest)} barrels: "
+              f"{end - start:0.4f}s")
+
+    def dumpDocumentPairs(self, payload: memoryview):
+        start = time.perf_counter()
+        # Copy hits out of the payload, which isn't kept
+        pairs = {
+            int(docID): array(HIT_TYPECODE, hits)
+            for docID, hits in iterBatch(PacketScope.DOC, payload)
+        }
+        writeDocumentPairs(PERSISTENT_DOCPAIRS_FILE, pairs)
+        self.documentPairs = pairs
+        end = time.perf_counter()
+        print(f"Stored {len(pairs)} documents: {end - start:0.4f}s")
+
+    def track(self, connection: socket.socket, isOpen: bool):
+        with self.connectionsLock:
+            if isOpen:
+                self.connections.add(connection)
+            else:
+                self.connections.discard(connection)
+
+    def stop(self):
+        """stop
+
+        Stop accepting connections and end every open connection once its
+        current message is answered. Safe to call from a signal handler.
+        """
+        # shutdown() waits for serve_forever(), which may run in this thread
+        threading.Thread(target=self.shutdown).start()
+        with self.connectionsLock:
+            for connection in self.connections:
+                try:
+                    connection.shutdown(socket.SHUT_RD)
+                except OSError:
+                    continue
+
+    def run(self):
+        """run
 
-    def getHitlist(self, word: str):
-        result: List[int] = []
+        Serve until SIGINT or SIGTERM, then wait for open connections and
+        remove the socket.
+        """
+        handlers = {
+            s: signal.signal(s, lambda *_: self.stop())
+            for s in (signal.SIGINT, signal.SIGTERM)
+        }
+        print(f"Running manager on {self.path}")
         try:
-            result = self.pairs[word]
-        except KeyError:
-            result = []
-
-        if len(result) == 0:
-            pass
-
-    # def run(self):
-    #     try:
-    #         print(f"Running manager on {SOCKET_PATH}")
-    #         while True:
-    #             h: HeaderDict = {}
-    #             buffer: List[bytes] = []
-    #             conn, addr = self.sock.accept()
-    #             data: bytes = bytes()
-    #             while True:
-    #                 data = conn.recv(MAX_PACKET_LEN)
-    #                 if not data:
-    #                     break
-    #                 h = parseHeader(data[:HEADER_LEN])
-    #                 if h["isEnd"] == PacketEnd.T:
-    #                     buffer.append(data[HEADER_LEN:])
-    #                     break
-    #                 else:
-    #                     buffer.append(data[HEADER_LEN:])
-    #
-    #             parsed = bytes()
-    #             parsed.join(buffer)
-    #             dic = pickle.loads(parsed.join(buffer))
-    #
-    #             if h["scope"] == PacketScope.WORD:
-    #                 if h["command"] == PacketCommand.GET:
-    #                 elif h["command"] == PacketCommand.DUMP:
-    #             elif h["scope"] == PacketScope.DOC:
-    #                 if h["command"] == PacketCommand.GET:
-    #                 elif h["command"] == PacketCommand.DUMP:
-    #
-    #
-    #             print(dic)
-    #     finally:
-    #         self.sock.shutdown(1)
-    #         print("Shutting down Manager...")
-    #         self.sock.close()
-    #         self.persistence.close()
-    #         print("Shutting down Manager...DONE")
-    #         print("Manager has been shut down")
-
-    def __check(self):
-        if os.path.exists(SOCKET_PATH):
-            os.remove(SOCKET_PATH)
+            self.serve_forever()
+        finally:
+            for s, handler in handlers.items():
+                signal.signal(s, handler)
+            print("Shutting down Manager...")
+            self.server_close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            print("Shutting down Manager...DONE")
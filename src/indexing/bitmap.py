@@ -0,0 +1,250 @@
+import re
+from array import array
+from bisect import bisect_left
+from collections import deque
+from itertools import compress, filterfalse, groupby, repeat
+from typing import AbstractSet, Dict, Iterable, Iterator, List, Union
+
+# Containers holding at most this many values are stored as sorted arrays,
+# denser ones as bitmaps
+ARRAY_LIMIT = 4096
+CONTAINER_BITS = 16
+CONTAINER_MASK = (1 << CONTAINER_BITS) - 1
+CONTAINER_BYTES = (1 << CONTAINER_BITS) // 8
+LOW_TYPECODE = "H"
+
+# Either a sorted array of low bits, or a bitmap stored as an integer
+Container = Union["array[int]", int]
+
+CONTAINER_SIZE = 1 << CONTAINER_BITS
+BITMAP_FORMAT = f"0{CONTAINER_SIZE}b"
+# Binary digits to byte flags
+DIGIT_FLAGS = bytes.maketrans(b"01", b"\x00\x01")
+ZERO_DIGITS = b"0" * CONTAINER_SIZE
+ONE_DIGIT = ord("1")
+SET_FLAG = re.compile(b"\x01")
+# Bitmaps with less bits set than this are decoded by searching set flags
+SPARSE_LIMIT = CONTAINER_SIZE // 8
+
+
+class DocSet(AbstractSet[int]):
+    """DocSet - Compressed set of document IDs, in the style of Roaring
+
+    Document IDs are partitioned by their high 16 bits. Every partition is
+    stored in a container holding the low 16 bits, either as a sorted
+    `array('H')` (sparse, up to `ARRAY_LIMIT` values) or as a 65536 bit
+    bitmap held in a Python integer (dense). Intersection, union and
+    difference work container by container, bitmaps with a single integer
+    operation.
+
+    Array containers are converted to bitmaps once they grow over
+    `ARRAY_LIMIT`. Bitmaps are kept as is when they shrink, decoding them in
+    Python costs more than their memory.
+
+    Attributes:
+        containers: Mapping between high bits and container
+    """
+    __slots__ = ("containers", )
+
+    def __init__(self, values: Iterable[int] = ()) -> None:
+        self.containers: Dict[int, Container] = {}
+        self.__fill(sorted(set(values)))
+
+    @classmethod
+    def fromSorted(cls, values: Iterable[int]) -> "DocSet":
+        """Build from unique values in ascending order, skipping the sort"""
+        result = cls()
+        result.__fill(values)
+        return result
+
+    @classmethod
+    def fromContainers(cls, containers: Dict[int, Container]) -> "DocSet":
+        result = cls()
+        result.containers = {k: c for k, c in containers.items() if c}
+        return result
+
+    def add(self, docID: int):
+        high, low = docID >> CONTAINER_BITS, docID & CONTAINER_MASK
+        container = self.containers.get(high)
+        if container is None:
+            self.containers[high] = array(LOW_TYPECODE, (low, ))
+        elif isinstance(container, int):
+            self.containers[high] = container | (1 << low)
+        else:
+            i = bisect_left(container, low)
+            if i == len(container) or container[i] != low:
+                # Containers may be shared with other sets, never modify them
+                container = container[:i] + array(LOW_TYPECODE,
+                                                  (low, )) + container[i:]
+                self.containers[high] = canonical(container)
+
+    def update(self, values: Iterable[int]):
+        self.containers = (self | DocSet(values)).containers
+
+    def __contains__(self, docID: object) -> bool:
+        if not isinstance(docID, int):
+            return False
+        container = self.containers.get(docID >> CONTAINER_BITS)
+        if container is None:
+            return False
+        low = docID & CONTAINER_MASK
+        if isinstance(container, int):
+            return bool(container >> low & 1)
+        i = bisect_left(container, low)
+        return i < len(container) and container[i] == low
+
+    def __iter__(self) -> Iterator[int]:
+        for high in sorted(self.containers):
+            base = high << CONTAINER_BITS
+            container = self.containers[high]
+            if isinstance(container, int):
+                container = toArray(container)
+            for low in container:
+                yield base | low
+
+    def __len__(self) -> int:
+        return sum(
+            popcount(c) if isinstance(c, int) else len(c)
+            for c in self.containers.values())
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, DocSet):
+            return super().__eq__(other)
+        if self.containers.keys() != other.containers.keys():
+            return False
+        for high, container in self.containers.items():
+            otherContainer = other.containers[high]
+            if isinstance(container, int) or isinstance(otherContainer, int):
+                container = asBitmap(container)
+                otherContainer = asBitmap(otherContainer)
+            if container != otherContainer:
+                return False
+        return True
+
+    def __and__(self, other: Iterable) -> "DocSet":
+        otherSet = asDocSet(other)
+        result: Dict[int, Container] = {}
+        for high, container in self.containers.items():
+            otherContainer = otherSet.containers.get(high)
+            if otherContainer is not None:
+                result[high] = intersect(container, otherContainer)
+        return DocSet.fromContainers(result)
+
+    def __or__(self, other: Iterable) -> "DocSet":  #type: ignore[override]
+        otherSet = asDocSet(other)
+        result = dict(self.containers)
+        for high, container in otherSet.containers.items():
+            ownContainer = result.get(high)
+            result[high] = container if ownContainer is None else union(
+                ownContainer, container)
+        return DocSet.fromContainers(result)
+
+    def __sub__(self, other: Iterable) -> "DocSet":
+        otherSet = asDocSet(other)
+        result: Dict[int, Container] = {}
+        for high, container in self.containers.items():
+            otherContainer = otherSet.containers.get(high)
+            result[high] = container if otherContainer is None else difference(
+                container, otherContainer)
+        return DocSet.fromContainers(result)
+
+    def __fill(self, values: Iterable[int]):
+        for high, group in groupby(values, key=lambda v: v >> CONTAINER_BITS):
+            lows = array(LOW_TYPECODE, (v & CONTAINER_MASK for v in group))
+            self.containers[high] = canonical(lows)
+
+    def __repr__(self) -> str:
+        return f"DocSet({list(self)})"
+
+    __rand__ = __and__
+    __ror__ = __or__
+
+
+###################
+# Utility functions
+###################
+def asDocSet(values: Iterable[int]) -> DocSet:
+    return values if isinstance(values, DocSet) else DocSet(values)
+
+
+def popcount(bits: int) -> int:
+    try:
+        return bits.bit_count()  #type: ignore
+    except AttributeError:
+        # int.bit_count() only exists since Python 3.10
+        return bin(bits).count("1")
+
+
+def toBitmap(lows: Iterable[int]) -> int:
+    # Bits are set through a digit string, so the loop runs in C
+    digits = bytearray(ZERO_DIGITS)
+    deque(map(digits.__setitem__, lows, repeat(ONE_DIGIT)), maxlen=0)
+    return int(digits[::-1], 2)
+
+
+def asBitmap(container: Container) -> int:
+    return container if isinstance(container, int) else toBitmap(container)
+
+
+def toFlags(bits: int) -> bytes:
+    """Get a byte per bit of bitmap, 1 if set and 0 otherwise"""
+    return format(bits, BITMAP_FORMAT).encode().translate(DIGIT_FLAGS)[::-1]
+
+
+def toArray(bits: int) -> "array[int]":
+    flags = toFlags(bits)
+    if popcount(bits) < SPARSE_LIMIT:
+        return array(LOW_TYPECODE, [m.start() for m in SET_FLAG.finditer(flags)])
+    return array(LOW_TYPECODE, compress(range(CONTAINER_SIZE), flags))
+
+
+def canonical(container: Container) -> Container:
+    """Convert array container growing over `ARRAY_LIMIT` into a bitmap
+
+    Bitmaps are never converted back, decoding them is far more expensive
+    than keeping them.
+    """
+    if not isinstance(container, int) and len(container) > ARRAY_LIMIT:
+        return toBitmap(container)
+    return container
+
+
+def intersect(a: Container, b: Container) -> Container:
+    if isinstance(a, int):
+        if isinstance(b, int):
+            return a & b
+        return intersect(b, a)
+    if isinstance(b, int):
+        return array(LOW_TYPECODE, filter(toFlags(b).__getitem__, a))
+    return array(LOW_TYPECODE, sorted(set(a).intersection(b)))
+
+
+def union(a: Container, b: Container) -> Container:
+    if isinstance(a, int) or isinstance(b, int):
+        return asBitmap(a) | asBitmap(b)
+    return canonical(array(LOW_TYPECODE, sorted(set(a).union(b))))
+
+
+def difference(a: Container, b: Container) -> Container:
+    if isinstance(a, int):
+        return a & ~asBitmap(b)
+    if isinstance(b, int):
+        return array(LOW_TYPECODE, filterfalse(toFlags(b).__getitem__, a))
+    exclude = set(b)
+    return array(LOW_TYPECODE, (low for low in a if low not in exclude))
+
+
+def docSetUnion(sets: Iterable[DocSet]) -> DocSet:
+    """Union of many sets, merging containers once per partition"""
+    groups: Dict[int, List[Container]] = {}
+    for s in sets:
+        for high, container in s.containers.items():
+            groups.setdefault(high, []).append(container)
+
+    result: Dict[int, Container] = {}
+    for high, containers in groups.items():
+        merged = containers[0]
+        for container in containers[1:]:
+            merged = union(merged, container)
+        result[high] = merged
+    return DocSet.fromContainers(result)
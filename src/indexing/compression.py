@@ -0,0 +1,204 @@
+import struct
+from array import array
+from typing import Iterator, Optional, Sequence, Tuple, Union
+
+from src.indexing.hitlist import DOCID_SHIFT, HIT_TYPECODE
+
+BLOCK_SIZE = 128
+
+# Serialized layout: (hit count, block count), followed by skip entries
+# (block first hit, block byte offset) and the variable-byte delta stream
+POSTINGS_HEADER = struct.Struct("=II")
+
+Buffer = Union[bytes, bytearray, memoryview]
+# Skip entries, built as arrays or viewed out of a serialized buffer
+IntBuffer = Union["array[int]", memoryview]
+
+
+class CompressedPostings:
+    """CompressedPostings - Delta + variable-byte compressed hitlist
+
+    Hitlists are expected to be sorted in descending order (see
+    `Indexer.sortHitlists`), so every hit is stored as the (non negative)
+    difference from the previous one, encoded as variable-byte integer.
+
+    Hits are grouped into blocks of `BLOCK_SIZE`. Each block has a skip
+    entry holding its first hit uncompressed, which is also the highest hit
+    of the block and therefore carries the block's max docID. Lookups use
+    the skip entries to decode only the blocks that may contain a document.
+
+    Attributes:
+        count: Number of hits
+        blockFirst: First (highest) hit of each block
+        blockOffset: Offset of each block's delta stream inside `data`
+        data: Variable-byte encoded deltas
+    """
+    __slots__ = ("count", "blockFirst", "blockOffset", "data")
+
+    def __init__(self, count: int, blockFirst: IntBuffer,
+                 blockOffset: IntBuffer, data: Buffer) -> None:
+        self.count = count
+        self.blockFirst = blockFirst
+        self.blockOffset = blockOffset
+        self.data = data
+
+    @classmethod
+    def encode(cls, hits: Sequence[int]) -> "CompressedPostings":
+        """encode
+
+        Args:
+            hits: Hitlist sorted in descending order
+        """
+        blockFirst = array(HIT_TYPECODE)
+        blockOffset = array(HIT_TYPECODE)
+        data = bytearray()
+        prev = 0
+        for i, hit in enumerate(hits):
+            if i % BLOCK_SIZE == 0:
+                blockFirst.append(hit)
+                blockOffset.append(len(data))
+            else:
+                delta = prev - hit
+                if delta < 0:
+                    raise ValueError("Hitlist must be sorted in descending order")
+                while delta > 0x7F:
+                    data.append((delta & 0x7F) | 0x80)
+                    delta >>= 7
+                data.append(delta)
+            prev = hit
+        return cls(len(hits), blockFirst, blockOffset, bytes(data))
+
+    @classmethod
+    def fromBytes(cls, buffer: Buffer) -> "CompressedPostings":
+        """fromBytes
+
+        Restore postings written by `toBytes`. Skip entries and delta stream
+        are views into `buffer`, nothing is copied.
+        """
+        view = memoryview(buffer)
+        count, blockCount = POSTINGS_HEADER.unpack_from(view)
+        start = POSTINGS_HEADER.size
+        skipLen = blockCount * 4
+        blockFirst = view[start:start + skipLen].cast(HIT_TYPECODE)
+        start += skipLen
+        blockOffset = view[start:start + skipLen].cast(HIT_TYPECODE)
+        start += skipLen
+        return cls(count, blockFirst, blockOffset, view[start:])
+
+    def toBytes(self) -> bytes:
+        return b"".join((
+            POSTINGS_HEADER.pack(self.count, len(self.blockFirst)),
+            bytes(memoryview(self.blockFirst).cast("B")),
+            bytes(memoryview(self.blockOffset).cast("B")),
+            bytes(self.data),
+        ))
+
+    def nbytes(self) -> int:
+        return POSTINGS_HEADER.size + 8 * len(self.blockFirst) + len(self.data)
+
+    def decodeBlock(self, block: int) -> "array[int]":
+        hit = self.blockFirst[block]
+        result = array(HIT_TYPECODE, (hit, ))
+        size = min(BLOCK_SIZE, self.count - block * BLOCK_SIZE)
+        data = self.data
+        offset = self.blockOffset[block]
+        for _ in range(size - 1):
+            delta = 0
+            shift = 0
+            while True:
+                byte = data[offset]
+                offset += 1
+                delta |= (byte & 0x7F) << shift
+                if byte < 0x80:
+                    break
+                shift += 7
+            hit -= delta
+            result.append(hit)
+        return result
+
+    def decode(self) -> "array[int]":
+        result = array(HIT_TYPECODE)
+        for block in range(len(self.blockFirst)):
+            result.extend(self.decodeBlock(block))
+        return result
+
+    def hitsForDocument(self, docID: int) -> "array[int]":
+        """hitsForDocument
+
+        Get every hit belonging to docID, decoding only the candidate blocks.
+        """
+        low, high = docID << DOCID_SHIFT, ((docID + 1) << DOCID_SHIFT) - 1
+        result = array(HIT_TYPECODE)
+        first, last = self.__blockRange(low, high)
+        for block in range(first, last):
+            result.extend(h for h in self.decodeBlock(block) if low <= h <= high)
+        return result
+
+    def hitAbove(self, hit: int) -> Optional[int]:
+        """hitAbove
+
+        Get the lowest hit above hit, decoding a single block.
+
+        Returns:
+            The hit, or None when every hit is below or equal to hit
+        """
+        if self.count == 0 or self.blockFirst[0] <= hit:
+            return None
+        block = self.__findBlock(hit + 1)
+        return next(h for h in reversed(self.decodeBlock(block)) if h > hit)
+
+    def lowest(self) -> int:
+        """Lowest hit, decoding only the last block"""
+        return self.decodeBlock(len(self.blockFirst) - 1)[-1]
+
+    def blockCount(self) -> int:
+        return len(self.blockFirst)
+
+    def __blockRange(self, low: int, high: int) -> Tuple[int, int]:
+        """Get range of blocks that may contain hits between low and high"""
+        # Blocks before the last one starting above high only hold hits
+        # above high, blocks after the last one starting at/above low only
+        # hold hits below low (blocks are descending)
+        first = self.__findBlock(high + 1)
+        last = self.__findBlock(low)
+        return first, min(last + 1, len(self.blockFirst))
+
+    def __findBlock(self, hit: int) -> int:
+        """Index of the block that would hold hit.
+
+        Returns the last block whose first hit is >= hit, or 0.
+        """
+        lo, hi = 0, len(self.blockFirst)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.blockFirst[mid] >= hit:
+                lo = mid + 1
+            else:
+                hi = mid
+        return max(lo - 1, 0)
+
+    def __contains__(self, hit: object) -> bool:
+        if not isinstance(hit, int) or self.count == 0:
+            return False
+        block = self.__findBlock(hit)
+        if self.blockFirst[block] < hit:
+            return False
+        return hit in self.decodeBlock(block)
+
+    def __iter__(self) -> Iterator[int]:
+        for block in range(len(self.blockFirst)):
+            yield from self.decodeBlock(block)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getstate__(self):
+        return self.toBytes()
+
+    def __setstate__(self, state: bytes):
+        restored = CompressedPostings.fromBytes(state)
+        self.count = restored.count
+        # Keep pickled postings independent from the unpickled buffer
+        self.blockFirst = array(HIT_TYPECODE, restored.blockFirst)
+        self.blockOffset = array(HIT_TYPECODE, restored.blockOffset)
+        self.data = bytes(restored.data)
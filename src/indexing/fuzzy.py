@@ -0,0 +1,177 @@
+import math
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from heapq import heappush, heapreplace, nsmallest
+from typing import (
+    Container,
+    Dict,
+    Final,
+    Iterable,
+    List,
+    Sequence,
+    Tuple,
+)
+
+# Words are padded, so their first and last character form a gram too
+PAD_START = "^"
+PAD_END = "$"
+# Separate occurrence number of repeated grams, never part of a word
+OCCURRENCE_SEP = "#"
+ID_TYPECODE: Final = "I"
+# Tolerance of similarity comparisons, ties are broken by word
+SIMILARITY_EPSILON = 1e-9
+# Lookups first only look for words above a similarity, and retry with a lower
+# one when less words than requested are found
+SIMILARITY_FLOORS = (0.4, 0.0)
+
+
+class FuzzyIndex:
+    """FuzzyIndex - Character bigram index of the lexicon
+
+    Similarity between two words is the Jaccard index of their character
+    bigram multisets. Repeated grams are indexed as separate keys ("ab",
+    "ab#2", ...), so the multiset intersection is the number of shared keys.
+
+    Words are sorted by their number of grams, every posting list is
+    therefore sorted by size too, and words of a given size are a single
+    slice of each posting list. Two words of size a and b can't be more
+    similar than min(a, b) / max(a, b), so lookups start with words of the
+    same size as the input and skip sizes that can't beat the current best
+    candidates. Inside a size, the needed overlap also limits which grams
+    have to be read in full (see `__collect`).
+
+    Attributes:
+        words: Lexicon, sorted by size then by word
+        sizeStarts: Index of the first word of every size
+        postings: Mapping between gram key and sorted word indexes
+    """
+    __slots__ = ("words", "sizeStarts", "postings")
+
+    def __init__(self, words: List[str], sizeStarts: Sequence[int],
+                 postings: Dict[str, Sequence[int]]) -> None:
+        self.words = words
+        self.sizeStarts = sizeStarts
+        self.postings = postings
+
+    @classmethod
+    def build(cls, lexicon: Iterable[str]) -> "FuzzyIndex":
+        words = sorted(lexicon, key=lambda w: (len(w), w))
+        postings: Dict[str, Sequence[int]] = {}
+        for i, word in enumerate(words):
+            for key in gramKeys(word):
+                try:
+                    postings[key].append(i)  #type: ignore
+                except KeyError:
+                    postings[key] = array(ID_TYPECODE, (i, ))
+
+        # A word of n characters has n + 1 grams
+        maxSize = len(words[-1]) + 1 if words else 0
+        # Words are sorted by length, sizeStarts[size] is the first word of
+        # at least size - 1 characters. bisect `key=` needs Python 3.10
+        sizeStarts = array(ID_TYPECODE, (0, ))
+        i = 0
+        for size in range(1, maxSize + 2):
+            while i < len(words) and len(words[i]) < size - 1:
+                i += 1
+            sizeStarts.append(i)
+        return cls(words, sizeStarts, postings)
+
+    def search(self,
+               word: str,
+               limit: int,
+               exclude: Container[str] = ()) -> List[Tuple[str, float]]:
+        """search
+
+        Args:
+            word: Word to look up
+            limit: Number of candidates
+            exclude: Words never returned
+
+        Returns:
+            List of (word, similarity) of the most similar words, sorted by
+            similarity then by word. Words sharing no gram are left out
+        """
+        keys = gramKeys(word)
+        # Rarest grams first, a word sharing `need` grams with the input
+        # shares at least one of the first `len(keys) - need + 1` of them
+        # (prefix filtering)
+        keys.sort(key=lambda k: len(self.postings.get(k, ())))
+        for floor in SIMILARITY_FLOORS:
+            candidates = self.__collect(keys, floor, limit, exclude)
+            if len(candidates) >= limit:
+                break
+
+        result = nsmallest(limit, candidates, key=lambda c: (-c[0], c[1]))
+        return [(w, similarity) for similarity, w in result]
+
+    def __collect(self, keys: List[str], floor: float, limit: int,
+                  exclude: Container[str]) -> List[Tuple[float, str]]:
+        """Every word at least as similar as floor and the best candidates"""
+        size = len(keys)
+        maxSize = len(self.sizeStarts) - 2
+        # Best similarities found so far, the lowest first
+        best: List[float] = []
+        candidates: List[Tuple[float, str]] = []
+
+        for other in sorted(range(1, maxSize + 1),
+                            key=lambda s: abs(s - size)):
+            lo, hi = self.sizeStarts[other], self.sizeStarts[other + 1]
+            threshold = max(floor, best[0]) if len(best) == limit else floor
+            need = minOverlap(size, other, threshold)
+            if lo == hi or need > min(size, other):
+                continue
+
+            shared: Counter = Counter()
+            for n, key in enumerate(keys):
+                posting = self.postings.get(key)
+                if posting is None:
+                    continue
+                start = bisect_left(posting, lo)
+                ids = posting[start:bisect_left(posting, hi, start)]
+                if n <= size - need:
+                    shared.update(ids)
+                else:
+                    # Only count words already found with a rarer gram
+                    shared.update(filter(shared.__contains__, ids))
+
+            # Similarity only grows with the overlap of words of one size
+            matches = [(count, i) for i, count in shared.items()
+                       if count >= need]
+            for count, i in sorted(matches, reverse=True):
+                if count < need:
+                    break
+                if self.words[i] in exclude:
+                    continue
+                similarity = count / (size + other - count)
+                candidates.append((similarity, self.words[i]))
+                if len(best) < limit:
+                    heappush(best, similarity)
+                elif similarity > best[0]:
+                    heapreplace(best, similarity)
+                if len(best) == limit:
+                    need = max(need, minOverlap(size, other, best[0]))
+        return candidates
+
+
+###################
+# Utility functions
+###################
+def gramKeys(word: str) -> List[str]:
+    padded = f"{PAD_START}{word}{PAD_END}"
+    seen: Dict[str, int] = {}
+    keys: List[str] = []
+    for i in range(len(padded) - 1):
+        gram = padded[i:i + 2]
+        count = seen.get(gram, 0) + 1
+        seen[gram] = count
+        keys.append(gram if count == 1 else f"{gram}{OCCURRENCE_SEP}{count}")
+    return keys
+
+
+def minOverlap(size: int, other: int, similarity: float) -> int:
+    """Smallest gram overlap of two words reaching the similarity"""
+    # I / (size + other - I) >= similarity
+    need = math.ceil(similarity * (size + other) / (1 + similarity) -
+                     SIMILARITY_EPSILON)
+    return max(need, 1)
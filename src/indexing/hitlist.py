@@ -0,0 +1,158 @@
+import re
+from array import array
+from typing import Dict, Final, Iterable, List, Tuple, TypeVar
+
+# TODO should be on crawling
+FILTERED_CHAR = ['\r\n\xa0', '\\']
+CAPITAL_PATTERN = '^[A-Z].*[A-Z]$'
+
+# Hit layout (32 bit): docID (19 bit) | position (12 bit) | capital (1 bit)
+HIT_TYPECODE: Final = "I"
+DOCID_SHIFT = 13
+POSITION_SHIFT = 1
+MAX_DOC_ID = (1 << 19) - 1
+MAX_POSITION = (1 << 12) - 1
+MAX_WORD_LEN = 30
+
+NON_WORD_REGEX = re.compile(r'\W+')
+CAPITAL_REGEX = re.compile(CAPITAL_PATTERN)
+
+K = TypeVar("K", str, int)
+
+# Document: (docID, paragraphs)
+Document = Tuple[int, List[str]]
+
+
+def packHit(docID: int, position: int, isCapital: bool) -> int:
+    """packHit
+
+    Merge docID, word offset and capital information into a single hit.
+    Produce the same layout as the bitarray-based encoding, so hits can
+    still be decoded with `getDocID`, `getPosition` and `getCapital`.
+
+    Args:
+        docID: Document ID
+        position: Word offset inside the document
+        isCapital: Capital status of the word
+    """
+    return (docID << DOCID_SHIFT) | (position << POSITION_SHIFT) | isCapital
+
+
+def tokenize(paragraph: str) -> List[str]:
+    # TODO
+    # Stripping information might be better done in crawling process
+    paragraph = NON_WORD_REGEX.sub(' ', paragraph)
+    for char in FILTERED_CHAR:
+        paragraph = paragraph.replace(char, ' ')
+    return paragraph.split()
+
+
+def encodeDocument(docID: int,
+                   paragraphs: List[str]) -> Tuple[List[str], "array[int]"]:
+    """encodeDocument
+
+    Tokenize a document and pack every accepted word into a hit.
+
+    Hits are stored in a single `array('I')` buffer in document order,
+    aligned with the returned word list.
+
+    Args:
+        docID: Document ID
+        paragraphs: List of texts in paragraph tags
+
+    Returns:
+        Tuple of (words, hits)
+    """
+    if docID > MAX_DOC_ID:
+        raise OverflowError(f"DocID {docID} does not fit in a hit")
+
+    base = docID << DOCID_SHIFT
+    words: List[str] = []
+    hits = array(HIT_TYPECODE)
+    wordCount = 1
+    for paragraph in paragraphs:
+        for word in tokenize(paragraph):
+            # Skip word longer than 30 characters
+            # Realistically, if there is an abnormal condition where there are
+            # word longer than 30 chars, then there's a problem with filtering
+            if len(word) > MAX_WORD_LEN:
+                continue
+
+            # Word limit
+            if wordCount > MAX_POSITION - 1:
+                wordCount = MAX_POSITION
+
+            # Strip empty or single-character word
+            if len(word) < 2:
+                continue
+
+            if CAPITAL_REGEX.match(word):
+                hits.append(base | (wordCount << POSITION_SHIFT) | 1)
+            else:
+                word = word.lower()
+                hits.append(base | (wordCount << POSITION_SHIFT))
+
+            words.append(word)
+            wordCount += 1
+
+    return words, hits
+
+
+class PostingStore(Dict[K, "array[int]"]):
+    """PostingStore - Typed contiguous hitlists storage
+
+    Every hitlist is stored as an `array('I')` (4 bytes per hit) instead of a
+    list of Python ints. Appending is amortized by the array itself during
+    indexing, while `freeze` sorts and compacts every hitlist once indexing
+    is done.
+
+    Read access behave like a plain dictionary, and missing key raise
+    `KeyError`.
+
+    Attributes:
+        isFrozen: Whether hitlists are already sorted and compacted
+    """
+    __slots__ = ("isFrozen", )
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.isFrozen = False
+
+    def append(self, key: K, hit: int):
+        self.__checkFrozen()
+        try:
+            self[key].append(hit)
+        except KeyError:
+            self[key] = array(HIT_TYPECODE, (hit, ))
+
+    def extend(self, key: K, hits: Iterable[int]):
+        self.__checkFrozen()
+        try:
+            self[key].extend(hits)
+        except KeyError:
+            self[key] = array(HIT_TYPECODE, hits)
+
+    def freeze(self, sort: bool = True):
+        """freeze
+
+        Compact every hitlist to its exact size. Hitlists are sorted in
+        descending order (same as `sortHit`) unless `sort` is False.
+        """
+        for key, hits in self.items():
+            if sort:
+                self[key] = array(HIT_TYPECODE, sorted(hits, reverse=True))
+            else:
+                self[key] = array(HIT_TYPECODE, hits)
+        self.isFrozen = True
+
+    def hitCount(self) -> int:
+        return sum(len(hits) for hits in self.values())
+
+    def nbytes(self) -> int:
+        """Size of all hitlists buffers, in bytes"""
+        return sum(hits.buffer_info()[1] * hits.itemsize
+                   for hits in self.values())
+
+    def __checkFrozen(self):
+        if self.isFrozen:
+            raise RuntimeError("Unable to modify frozen posting store")
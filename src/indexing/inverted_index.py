@@ -1,46 +1,121 @@
 import os
-import pickle
-import shelve
-import socket
 import time
+from array import array
+from bisect import bisect_right
 from collections import defaultdict
 from heapq import nlargest
-from itertools import combinations
-from re import match, sub
-from typing import Dict, List, Tuple, TypedDict, Union
+from itertools import chain, compress, groupby, islice
+from operator import itemgetter
+from re import match
+from typing import (
+    AbstractSet,
+    Container,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    TypedDict,
+)
 
 import pymysql
 import pymysql.cursors
-from bitarray import bitarray
-from bitarray.util import ba2int
-from simphile import jaccard_similarity  #type: ignore
 
 from src.database.database import Database  #type: ignore
+from src.indexing.barrel_client import BarrelClient, RemotePostings
+from src.indexing.bitmap import DocSet, docSetUnion
+from src.indexing.compression import CompressedPostings
+from src.indexing.fuzzy import FuzzyIndex
 from src.indexing.gst import GST
-
-# TODO should be on crawling
-FILTERED_CHAR = ['\r\n\xa0', '\\']
+from src.indexing.hitlist import (
+    CAPITAL_PATTERN,
+    DOCID_SHIFT,
+    HIT_TYPECODE,
+    Document,
+    K,
+    PostingStore,
+    encodeDocument,
+)
+from src.indexing.matching import (
+    candidatePostings,
+    decodedHits,
+    documentHits,
+    iterDocuments,
+    lowestHit,
+    matchWindows,
+    phraseMatches,
+    termHits,
+    topDocuments,
+)
+from src.indexing.protocol import BARREL_SOCKET_PATH, PacketScope
+from src.indexing.scoring import (
+    BM25Scorer,
+    BM25Stats,
+    Scorer,
+    documentFrequencies,
+)
+from src.indexing.search_server import (
+    SEARCH_SOCKET_PATH,
+    SERVER_ASYNC,
+    SERVER_THREADED,
+    AsyncSearchServer,
+    SearchServer,
+)
+from src.indexing.segment import Segment, writeSegment
+from src.indexing.shard import buildIndex
+from src.indexing.storage import (
+    Barrel,
+    BarrelStore,
+    readDocumentPairs,
+    readDocWordCount,
+    readFuzzyIndex,
+    readScoringStats,
+    readTermStats,
+    readTree,
+    splitBarrels,
+    writeBarrels,
+    writeDocumentPairs,
+    writeDocWordCount,
+    writeFuzzyIndex,
+    writeScoringStats,
+    writeTermStats,
+    writeTree,
+)
+from src.indexing.suffix_tree import BUILDER_UKKONEN
 
 POSITION_MASK = 0b00000000000000000001111111111110
 CAPITAL_MASK = 0b00000000000000000000000000000001
 
 BARREL_COUNT = 128
+BARREL_CACHE_BUDGET = 256 * 1024 * 1024
 COMMON_WORD_RATIO = 0.001
+# Number of nearest words returned by fuzzy lookup
+FUZZY_CANDIDATES = 10
 LOWER_ELIMINATION_RATIO = 0.05
 UPPER_ELIMINATION_RATIO = 0.05
 
 PARTIAL_MATCH_OCCUR_FACTOR = 15
 EXACT_MATCH_FACTOR = 1
-
-PERSISTENT_WORDPAIRS_FILE = "telusuri_wordpairs.pkl"
-PERSISTENT_DOCPAIRS_FILE = "telusuri_docpairs.pkl"
-GST_FILE = "telusuri_gst.pkl"
-DOC_WORD_COUNT_FILE = "telusuri_docwordcount.pkl"
-CAPITAL_PATTERN = '^[A-Z].*[A-Z]$'
+SCORE_BOUND_SLACK = 1e-9
+# Share of the smallest gap between two phrase scores left to the scorer
+SCORER_TIE_SHARE = 0.5
+
+PERSISTENT_WORDPAIRS_FILE = "telusuri_wordpairs.bin"
+PERSISTENT_DOCPAIRS_FILE = "telusuri_docpairs.bin"
+GST_FILE = "telusuri_gst.bin"
+DOC_WORD_COUNT_FILE = "telusuri_docwordcount.bin"
+SEGMENT_FILE = "telusuri_segment.idx"
+SCORING_FILE = "telusuri_scoring.bin"
+FUZZY_FILE = "telusuri_fuzzy.bin"
+TERM_STATS_FILE = "telusuri_terms.bin"
 
 # WordInfo: (position, isCommonWord, isCapital)
 WordInfo = Tuple[int, bool, bool]
-HitLists = List[int]
+HitLists = Sequence[int]
 
 
 class GSTResult(TypedDict):
@@ -48,13 +123,107 @@ class GSTResult(TypedDict):
     count: int
     query: str
 
-class Barrel:
+class BarrelCache(Mapping[str, CompressedPostings]):
+    """BarrelCache - Lazily loaded barrels with LRU eviction
 
-    __slots__ = ("lastAccessed","pairs", "isLoaded" )
+    Only the barrel manifest written by `storeIndex` is kept in memory. A
+    lookup bisect the barrel first words to find the barrel covering the
+    word, and load it on demand. Words outside of the barrel word range are
+    rejected without loading anything. When loaded barrels exceed the memory
+    budget, barrels with the oldest `lastAccessed` are evicted.
 
-    def __init__(self) -> None:
-        self.pairs: Dict[str, List[int]] = {}
-        self.isLoaded = False
+    Attributes:
+        persistence: Barrel persistence, keyed by barrel first word
+        budget: Memory budget for loaded barrels, in bytes
+        manifest: Information of every barrel, sorted by first word
+        firstWords: Sorted first word of every barrel
+        loaded: Currently loaded barrels, keyed by first word
+        loadedBytes: Size of currently loaded barrels
+        clock: Logical clock used for `Barrel.lastAccessed`
+        hits: Number of lookups served by a loaded barrel
+        misses: Number of lookups that needed to load a barrel
+        evictions: Number of evicted barrels
+    """
+    __slots__ = ("persistence", "budget", "manifest", "firstWords", "loaded",
+                 "loadedBytes", "clock", "hits", "misses", "evictions",
+                 "wordCount")
+
+    def __init__(self, persistence: BarrelStore, budget: int) -> None:
+        self.persistence = persistence
+        self.budget = budget
+        self.manifest = persistence.manifest
+        self.firstWords = [info["firstWord"] for info in self.manifest]
+        self.loaded: Dict[str, Barrel] = {}
+        self.loadedBytes = 0
+        self.clock = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.wordCount = sum(info["wordCount"] for info in self.manifest)
+
+    def getBarrel(self, firstWord: str) -> Barrel:
+        self.clock += 1
+        try:
+            barrel = self.loaded[firstWord]
+            self.hits += 1
+        except KeyError:
+            self.misses += 1
+            barrel = self.persistence[firstWord]
+            barrel.isLoaded = True
+            size = barrel.nbytes()
+            # Always keep at least the requested barrel
+            while len(self.loaded) > 0 and self.loadedBytes + size > self.budget:
+                self.evict()
+            self.loaded[firstWord] = barrel
+            self.loadedBytes += size
+
+        barrel.lastAccessed = self.clock
+        return barrel
+
+    def evict(self):
+        firstWord = min(self.loaded, key=lambda k: self.loaded[k].lastAccessed)
+        barrel = self.loaded.pop(firstWord)
+        barrel.isLoaded = False
+        self.loadedBytes -= barrel.nbytes()
+        self.evictions += 1
+
+    def barrelFor(self, word: str) -> Optional[str]:
+        """Get first word of the barrel that may contain word"""
+        i = bisect_right(self.firstWords, word) - 1
+        if i < 0 or word > self.manifest[i]["lastWord"]:
+            return None
+        return self.firstWords[i]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "loaded": len(self.loaded),
+            "loadedBytes": self.loadedBytes,
+        }
+
+    def __getitem__(self, word: str) -> CompressedPostings:
+        firstWord = self.barrelFor(word)
+        if firstWord is None:
+            raise KeyError(word)
+        return self.getBarrel(firstWord).pairs[word]
+
+    def __contains__(self, word: object) -> bool:
+        if not isinstance(word, str):
+            return False
+        try:
+            self[word]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self) -> Iterator[str]:
+        for firstWord in self.firstWords:
+            yield from list(self.getBarrel(firstWord).pairs.keys())
+
+    def __len__(self) -> int:
+        return self.wordCount
 
 
 class UserQuery:
@@ -67,11 +236,16 @@ class UserQuery:
         expectedPos: Expected word position. For ranking purpose
         documentRank: Mapping between document ID and it's score
         globalModifier: Global query score modifier
-        mergedHitlists: List of hits that has been merged
+        termHitlists: Hitlist of every matched term, see `termHits`
+        termWords: Word of every matched term
+        rootTerm: Index of root hitlist in termHitlists, or -1
+        scorer: Tie breaker between documents with the same phrase score,
+            if any (see `scorerWeight`)
     """
     __slots__ = ("docPairs", "docHitlists", "wordPairs", "expectedPos",
                  "documentRank", "globalModifier", "rootHitlists",
-                 "mergedHitlists", "gstResult")
+                 "termHitlists", "termWords", "rootTerm", "scorer",
+                 "gstResult")
 
     def __init__(self) -> None:
         self.docHitlists: Dict[int, HitLists] = defaultdict(list)
@@ -80,7 +254,10 @@ class UserQuery:
         self.expectedPos: List[int] = []
         self.globalModifier: float = 1.0
         self.gstResult: List[Tuple[int, int]]
-        self.mergedHitlists: HitLists = []
+        self.termHitlists: List[Sequence[int]] = []
+        self.termWords: List[str] = []
+        self.rootTerm = -1
+        self.scorer: Optional[Scorer] = None
         self.rootHitlists: HitLists = []
         self.wordPairs: Dict[str, Tuple[WordInfo, HitLists]] = {}
 
@@ -101,243 +278,305 @@ class UserQuery:
                 self.expectedPos.append(i[0][0])
 
     def processQuery(self):
-        data = list(sorted(self.wordPairs.values(), key=lambda x: x[0][0]))
-        root: Tuple[List[WordInfo], HitLists] = ([], self.mergedHitlists)
-
+        data = list(sorted(self.wordPairs.items(), key=lambda x: x[1][0][0]))
         if len(data) > 1:
-            for q in data:
-                root[0].append(q[0])
-                # Check if common
-                if not q[0][1]:
-                    if len(q[1]) > 0:
-                        root[1].extend(q[1])
-
+            # Skip common words
+            terms = [(w, q[1]) for w, q in data if not q[0][1]]
         else:
-            self.mergedHitlists.extend(data[0][1])
-            root = ([data[0][0]], self.mergedHitlists)
+            terms = [(data[0][0], data[0][1][1])]
 
-    def calculateRankingGST(self):
+        self.rootTerm = -1
+        for i, (word, hits) in enumerate(terms):
+            if hits is self.rootHitlists:
+                self.rootTerm = i
+            self.termHitlists.append(termHits(hits))
+            self.termWords.append(word)
+
+    def calculateRankingGST(self, k: Optional[int] = None):
+        """calculateRankingGST
+
+        Args:
+            k: Number of best documents to keep, every document when None
+        """
         if len(self.docHitlists) == 0:
             raise IndexError("""
                 Unable to calculate document ranking because
                 there are no document hitlist
             """)
-        temp = [set(h[1]) for h in self.wordPairs.values()]
 
+        # Hits of every candidate document are sliced out of the term
+        # hitlists, instead of intersecting them with document hitlists
+        hitlists = [
+            candidatePostings(hits, len(self.docHitlists))
+            for hits in self.termHitlists
+        ]
         for doc in self.docHitlists.keys():
-            exactCount = 0
-            pos: List[int] = [] 
-            subMatch: Dict[float, int] = {}
-            for i in temp:
-                t = list(set(self.docHitlists[doc]).intersection(i))
-                if len(t) > 0:
-                    pos.extend(t)
-
-            if len(pos) == 0:
+            slices = documentHits(hitlists, doc)
+            pos = sorted(chain.from_iterable(slices))
+
+            if len(pos) == 0 or len(pos) < len(self.expectedPos):
                 continue
 
-            # Extra sort to make sure
-            pos.sort()
-
-            if len(pos) >= len(self.expectedPos):
-                marked = list(set(pos).intersection(self.rootHitlists))
-
-                curIter: List[int] = []
-                maxLen = len(pos)-1
-                for idx, p in enumerate(pos):
-                    if p in marked or idx == maxLen:
-                        if idx == maxLen:
-                            curIter.append(p)
-
-                        if len(curIter) > 0:
-                            # Calculate
-                            for i, item in enumerate(curIter):
-                                curIter[i] = getPosition(item)
-
-                            # Normalize
-                            diff = curIter[0] - self.expectedPos[0]
-                            for j, _ in enumerate(curIter):
-                                curIter[j] -= diff
-
-                            if curIter == self.expectedPos:
-                                exactCount += 1
-                            # If different len, then its a partial match
-                            else:
-                                subScore = len(pos) / len(self.expectedPos)
-                                try:
-                                    subMatch[subScore] += 1
-                                except KeyError:
-                                    subMatch[subScore] = 1
-
-
-                            # Sum up calculation
-                            if idx == maxLen:
-                                if exactCount > 0:
-                                    self.documentRank[doc] = exactCount * self.globalModifier
-                                else:
-                                    # For submatch, get the highest submatch occurrence
-                                    # and calculate the result with the occurrence
-                                    maxSubScore = max(subMatch.keys())
-                                    self.documentRank[doc] = (
-                                        maxSubScore +
-                                        (maxSubScore / PARTIAL_MATCH_OCCUR_FACTOR *
-                                         subMatch[maxSubScore])) * self.globalModifier
-
-                            # Reset
-                            curIter.clear()
-
-                    curIter.append(p)
+            rootHits = set(slices[self.rootTerm]) if self.rootTerm >= 0 else set()
+            exactCount, partialCount = phraseMatches(pos, rootHits,
+                                                     self.expectedPos)
+            if exactCount > 0:
+                score = exactCount * self.globalModifier
+            else:
+                # Partial matches of a document share the same score, based
+                # on the number of matched hits
+                subScore = len(pos) / len(self.expectedPos)
+                score = (subScore + (subScore / PARTIAL_MATCH_OCCUR_FACTOR *
+                                     partialCount)) * self.globalModifier
+
+            if self.scorer is not None:
+                score += self.scorer.score(doc, slices) * self.scorerWeight()
+            self.documentRank[doc] = score
+
+        if k is not None:
+            # Lowest docID first on ties, the same as sorting every score
+            best = nlargest(k,
+                            self.documentRank.items(),
+                            key=lambda x: (x[1], -x[0]))
+            self.documentRank.clear()
+            self.documentRank.update(best)
 
     def calculateRanking(self):
-        if len(self.mergedHitlists) == 0:
+        if all(len(h) == 0 for h in self.termHitlists):
             raise IndexError(
                 "Unable to calculate document ranking because there are no hitlist"
             )
-        self.mergedHitlists.sort()
-        curDoc = getDocID(self.mergedHitlists[0])
-        subMatch: Dict[float, int] = {}
-
-        curIter: List[int] = []
-        exactCount = 0
-
-        for info in self.mergedHitlists:
-            docID = getDocID(info)
-            pos = getPosition(info)
-
-            if info in self.rootHitlists:
-                # If len are the same, chances are not a partial match
-                if len(curIter) == len(self.expectedPos):
-                    # Normalize curIter
-                    diff = curIter[0] - self.expectedPos[0]
-                    for i, _ in enumerate(curIter):
-                        curIter[i] -= diff
-
-                    # Compare to expectedPos
-                    if curIter == self.expectedPos:
-                        exactCount += 1
-                # If different len, then its a partial match
-                else:
-                    subScore = len(curIter) / len(self.expectedPos)
-                    try:
-                        subMatch[subScore] += 1
-                    except KeyError:
-                        subMatch[subScore] = 1
-
-                curIter.clear()
-
-            if curDoc != docID:
-                # Exact match exist
-                if exactCount > 0:
-                    self.documentRank[
-                        curDoc] = exactCount * self.globalModifier * EXACT_MATCH_FACTOR
-                elif len(subMatch) > 0:
-                    # For submatch, get the highest submatch occurrence and
-                    # calculate the result with the occurrence
-                    maxSubScore = max(subMatch.keys())
-                    self.documentRank[curDoc] = (
-                        maxSubScore +
-                        (maxSubScore / PARTIAL_MATCH_OCCUR_FACTOR *
-                         subMatch[maxSubScore])) * self.globalModifier
-
-                # Reset context
-                exactCount = 0
-                subMatch.clear()
-                curIter.clear()
-                curDoc = docID
-                curIter.append(pos)
-            else:
-                curIter.append(pos)
+
+        # A document is scored once the next one is known, since the window
+        # left open at its end is only counted when the next document starts
+        # with a root hit. The last document is never scored
+        documents = iterDocuments(
+            [decodedHits(hits) for hits in self.termHitlists])
+        docID, slices = next(documents)
+        isFirst = True
+        for nextDoc, nextSlices in documents:
+            score = self.scoreDocument(docID, slices, isFirst,
+                                       self.startsWithRoot(nextSlices))
+            if score is not None:
+                self.documentRank[docID] = score
+            docID, slices, isFirst = nextDoc, nextSlices, False
+
+    def calculateTopRanking(self, k: int,
+                            blacklist: AbstractSet[int] = frozenset()):
+        """calculateTopRanking
+
+        Rank only the best k documents, skipping documents with too few hits
+        to make it (see `topDocuments`). Give the same scores as
+        `calculateRanking` followed by removing blacklisted documents.
+
+        Args:
+            k: Number of documents
+            blacklist: Documents to leave out
+        """
+        if all(len(h) == 0 for h in self.termHitlists):
+            raise IndexError(
+                "Unable to calculate document ranking because there are no hitlist"
+            )
+        hitlists = self.termHitlists
+        firstDoc = min(lowestHit(h) for h in hitlists
+                       if len(h) > 0) >> DOCID_SHIFT
+
+        def score(docID: int, slices: List[Sequence[int]],
+                  following: List[Sequence[int]]) -> Optional[float]:
+            # The last document is never scored
+            if docID in blacklist or not any(following):
+                return None
+            return self.scoreDocument(docID, slices, docID == firstDoc,
+                                      self.startsWithRoot(following))
+
+        self.documentRank.clear()
+        self.documentRank.update(
+            topDocuments(hitlists, k, self.scoreBound, score))
+
+    def scoreDocument(self, docID: int, slices: List[Sequence[int]],
+                      isFirst: bool, isTrailing: bool) -> Optional[float]:
+        """scoreDocument
+
+        Args:
+            docID: Document ID
+            slices: Hits of the document for every term, in ascending order
+            isFirst: Whether no document comes before
+            isTrailing: Whether the window left open at the end is counted
+
+        Returns:
+            Score of the document, or None if nothing matched
+        """
+        hits = sorted(chain.from_iterable(
+            slices)) if len(slices) > 1 else slices[0]
+        rootHits = set(slices[self.rootTerm]) if self.rootTerm >= 0 else set()
+
+        # A new window starts at every root hit, the first hit already started
+        # one. Only the first document has an empty window to close
+        bounds = [0]
+        if isFirst and hits[0] in rootHits:
+            bounds.append(0)
+        bounds.extend(
+            compress(range(1, len(hits)),
+                     map(rootHits.__contains__, islice(hits, 1, None))))
+        if isTrailing:
+            bounds.append(len(hits))
+
+        exactCount, partial = matchWindows(hits, bounds, self.expectedPos)
+        # Windows as long as the query are either exact or not matching
+        partial.pop(len(self.expectedPos), None)
+
+        if exactCount > 0:
+            score = exactCount * self.globalModifier * EXACT_MATCH_FACTOR
+        elif len(partial) > 0:
+            # For submatch, get the highest submatch occurrence and
+            # calculate the result with the occurrence
+            maxLen = max(partial.keys())
+            maxSubScore = maxLen / len(self.expectedPos)
+            score = (maxSubScore +
+                     (maxSubScore / PARTIAL_MATCH_OCCUR_FACTOR *
+                      partial[maxLen])) * self.globalModifier
+        else:
+            return None
+
+        if self.scorer is not None:
+            score += self.scorer.score(docID, slices) * self.scorerWeight()
+        return score
+
+    def scoreBound(self, hitCount: int) -> float:
+        """scoreBound
+
+        Get the highest score `scoreDocument` can give to a document with
+        hitCount hits. Windows never overlap, so there are at most
+        hitCount / len(expectedPos) exact matches, and the partial score is
+        the highest with a single window holding every hit.
+        """
+        size = len(self.expectedPos)
+        exact = hitCount // size * self.globalModifier * EXACT_MATCH_FACTOR
+        partial = hitCount / size * (
+            1 + 1 / PARTIAL_MATCH_OCCUR_FACTOR) * self.globalModifier
+        bound = max(exact, partial)
+        if self.scorer is not None:
+            bound += self.scorer.bound(hitCount) * self.scorerWeight()
+        # Leave room for floating point rounding of the actual score
+        return bound * (1 + SCORE_BOUND_SLACK)
+
+    def scorerWeight(self) -> float:
+        """scorerWeight
+
+        Get the weight of scorer scores. Phrase scores are multiples of
+        globalModifier / (len(expectedPos) * PARTIAL_MATCH_OCCUR_FACTOR) and
+        scorer scores stay below 1, so a weighted scorer score is less than
+        any gap between phrase scores and only orders documents with the
+        same phrase score.
+        """
+        return self.globalModifier * SCORER_TIE_SHARE / (
+            max(len(self.expectedPos), 1) * PARTIAL_MATCH_OCCUR_FACTOR)
+
+    def startsWithRoot(self, slices: List[Sequence[int]]) -> bool:
+        """Whether the first hit of a document is a root hit"""
+        if self.rootTerm < 0 or len(slices[self.rootTerm]) == 0:
+            return False
+        first = min(h[0] for h in slices if len(h) > 0)
+        return slices[self.rootTerm][0] == first
 
 
 class Indexer:
 
     __slots__ = ("db", "useGST", "documentPairs", "wordPairs", "commonWords",
-                 "gst", "documentPersistence", "wordPersistence",
-                 "treePersistence", "docWordCountPersistence" ,"sock",
-                 "documentBlacklist", "wordDocCount")
-
-    def __init__(self, db: Database, status: str, useGST: str,
-                 barrelMode: str) -> None:
-        self.commonWords: List[str] = []
+                 "gst", "wordPersistence", "barrelClient", "documentBlacklist",
+                 "wordDocCount", "barrelMode", "segment", "cacheBudget",
+                 "scoringStats", "fuzzyIndex", "documentFrequency")
+
+    def __init__(self,
+                 db: Database,
+                 status: str,
+                 useGST: str,
+                 barrelMode: str,
+                 cacheBudget: int = BARREL_CACHE_BUDGET,
+                 gstBuilder: str = BUILDER_UKKONEN,
+                 barrelSocket: str = BARREL_SOCKET_PATH) -> None:
+        self.commonWords: FrozenSet[str] = frozenset()
+        self.documentFrequency: Dict[str, int] = {}
         self.db = db
-        self.documentBlacklist: List[int] = []
-        self.wordPairs: Dict[str, List[int]] = defaultdict(
-            list)  # Array / standard list
+        self.documentBlacklist = DocSet()
+        self.wordPairs: PostingStore[str] = PostingStore()
         self.wordDocCount: Dict[int, int] = {}
+        self.barrelMode = barrelMode
+        self.segment: Optional[Segment] = None
+        self.wordPersistence: Optional[BarrelStore] = None
+        self.cacheBudget = cacheBudget
+        self.scoringStats: Optional[BM25Stats] = None
+        self.fuzzyIndex: Optional[FuzzyIndex] = None
+        self.barrelClient: Optional[BarrelClient] = None
 
         if barrelMode == "remote":
-            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            # Postings are held by a running BarrelManager
+            self.barrelClient = BarrelClient(barrelSocket)
 
-        if barrelMode == "local" and status == "reindex":
+        if barrelMode != "remote" and status == "reindex":
             # Remove file if reindexing
-            if os.path.exists(PERSISTENT_WORDPAIRS_FILE):
-                os.remove(PERSISTENT_WORDPAIRS_FILE)
-            if os.path.exists(DOC_WORD_COUNT_FILE):
-                os.remove(DOC_WORD_COUNT_FILE)
-
-
-        if status == "reindex":
-            self.docWordCountPersistence = open(DOC_WORD_COUNT_FILE, 'ab' )
-        else:
-            self.docWordCountPersistence = open(DOC_WORD_COUNT_FILE, 'rb')
-
-        self.wordPersistence: shelve.Shelf[Barrel] = shelve.open(
-            PERSISTENT_WORDPAIRS_FILE, protocol=pickle.HIGHEST_PROTOCOL)
+            for path in (PERSISTENT_WORDPAIRS_FILE, DOC_WORD_COUNT_FILE,
+                         SEGMENT_FILE, SCORING_FILE, FUZZY_FILE,
+                         TERM_STATS_FILE):
+                if os.path.exists(path):
+                    os.remove(path)
 
         if useGST == "true":
             self.useGST = True
-            self.gst = GST(self.db)
-            self.documentPairs: Dict[int, HitLists] = defaultdict(
-                list)  # Array / standard list
+            self.gst = GST(self.db, gstBuilder)
+            self.documentPairs: PostingStore[int] = PostingStore()
 
-            if barrelMode == "local" and status == "reindex":
+            if barrelMode != "remote" and status == "reindex":
                 # Remove file if reindexing
-                if os.path.exists(PERSISTENT_DOCPAIRS_FILE):
-                    os.remove(PERSISTENT_DOCPAIRS_FILE)
-                if os.path.exists(GST_FILE):
-                    os.remove(GST_FILE)
-                self.documentPersistence = open(PERSISTENT_DOCPAIRS_FILE, 'ab')
-                self.treePersistence = open(GST_FILE, 'ab')
-            elif status == "search":
-                # self.documentPersistence: shelve.Shelf[List[int]] = shelve.open(
-                #     PERSISTENT_DOCPAIRS_FILE, protocol=pickle.HIGHEST_PROTOCOL)
-                self.documentPersistence = open(PERSISTENT_DOCPAIRS_FILE, 'rb')
-                self.treePersistence = open(GST_FILE, 'rb')
+                for path in (PERSISTENT_DOCPAIRS_FILE, GST_FILE):
+                    if os.path.exists(path):
+                        os.remove(path)
         else:
             self.useGST = False
 
-    def getRepositoryDump(self) -> List[Dict[str, Union[int, str]]]:
-        print("Getting data from database...")
+    def getRepositoryDump(self) -> Iterator[Document]:
+        """getRepositoryDump
+
+        Stream documents from the database as (docID, paragraphs).
+
+        Rows are read through a server-side cursor ordered by page_id, so only
+        a single document is held in memory at a time.
+        """
+        print("Streaming data from database...")
         start = time.perf_counter()
         conn: pymysql.Connection[
             pymysql.cursors.Cursor] = self.db.connect()  #type: ignore
 
         try:
-            with conn.cursor(cursor=pymysql.cursors.DictCursor) as cursor:
-                cursor.execute("SELECT page_id, paragraph FROM page_paragraph")
-                result = cursor.fetchall()
+            with conn.cursor(cursor=pymysql.cursors.SSCursor) as cursor:
+                cursor.execute("SELECT page_id, paragraph FROM page_paragraph "
+                               "ORDER BY page_id")
+                yield from groupParagraphs(cursor)  #type: ignore
         finally:
             conn.close()
 
         end = time.perf_counter()
-        print(f"Time elapsed getting data from database: {end - start:0.4f}s")
-        return result  #type: ignore
+        print(f"Time elapsed streaming data from database: {end - start:0.4f}s")
 
     def sortHitlists(self):
         start = time.perf_counter()
         print("Sorting hitlists...")
 
-        for word, hitlists in self.wordPairs.items():
-            sortHit((word, hitlists))
+        self.wordPairs.freeze()
+        if self.useGST:
+            # Document hitlists are already in position order
+            self.documentPairs.freeze(sort=False)
 
         end = time.perf_counter()
         print(f"Time elapsed sorting hitlists: {end - start:0.4f}s")
 
     def cleanup(self):
-        self.wordPersistence.close()
-        if self.useGST:
-            self.documentPersistence.close()
-            self.treePersistence.close()
+        if self.segment is not None:
+            self.segment.close()
+        if self.wordPersistence is not None:
+            self.wordPersistence.close()
+        if self.barrelClient is not None:
+            self.barrelClient.close()
 
     def getWords(self) -> List[str]:
         return list(self.wordPairs.keys())
@@ -345,30 +584,54 @@ class Indexer:
     def prepareIndexer(self):
         print("Preparing indexer from persistence data...")
         start = time.perf_counter()
-        for barrel in self.wordPersistence.values():
-            self.wordPairs.update(barrel.pairs)
-        self.wordDocCount = pickle.load(self.docWordCountPersistence)
+        if self.barrelMode == "segment":
+            self.segment = Segment(SEGMENT_FILE)
+            self.wordPairs = self.segment
+            self.wordDocCount = self.segment.docLengths
+        elif self.barrelClient is not None:
+            self.wordPairs = RemotePostings(self.barrelClient, PacketScope.WORD)
+            self.wordDocCount = readDocWordCount(DOC_WORD_COUNT_FILE)
+        else:
+            # Barrels are loaded on demand
+            self.wordPersistence = BarrelStore(PERSISTENT_WORDPAIRS_FILE)
+            self.wordPairs = BarrelCache(self.wordPersistence, self.cacheBudget)
+            self.wordDocCount = readDocWordCount(DOC_WORD_COUNT_FILE)
+        self.scoringStats = readScoringStats(SCORING_FILE)
+        self.fuzzyIndex = readFuzzyIndex(FUZZY_FILE)
+        self.documentFrequency, self.commonWords = readTermStats(
+            TERM_STATS_FILE)
         end = time.perf_counter()
         print(f"Time elapsed restoring hitlists: {end - start:0.8f}s")
 
         if self.useGST:
             docStart = time.perf_counter()
-            self.documentPairs = pickle.load(self.documentPersistence)
+            if self.barrelClient is not None:
+                self.documentPairs = RemotePostings(self.barrelClient,
+                                                    PacketScope.DOC)
+            else:
+                self.documentPairs = readDocumentPairs(
+                    PERSISTENT_DOCPAIRS_FILE)
             docEnd = time.perf_counter()
             print(
                 f"Time elapsed restoring document pairs: {docEnd - docStart:0.8f}s"
             )
             treeStart = time.perf_counter()
-            self.gst.tree = pickle.load(self.treePersistence)
+            self.gst.tree = readTree(GST_FILE)
             treeEnd = time.perf_counter()
             print(
                 f"Time elapsed restoring GST structure: {treeEnd - treeStart:0.8f}s"
             )
         self.generateDocumentBlacklist(self.wordDocCount)
-        self.generateCommonLists()
         print("Preparing indexer from persistence data...DONE")
 
-    def generateIndex(self, data: List[Dict[str, Union[int, str]]]):
+    def generateIndex(self, data: Iterable[Document], workers: int = 1):
+        """generateIndex
+
+        Args:
+            data: Iterable of (docID, paragraphs)
+            workers: Number of indexing processes. Documents are tokenized
+                serially when set to 1
+        """
         start = time.perf_counter()
 
         if self.useGST:
@@ -378,20 +641,16 @@ class Indexer:
             print("Generating tree...DONE")
 
         print("Generating hitlists...")
-        docMap: Dict[int, List[str]] = {}
-        curDoc = int(data[0]["page_id"])
-        docMap[curDoc] = []
-
-        # Gather all paragraph as a single list value per word
-        for pair in data:
-            if pair["page_id"] != curDoc:
-                curDoc = int(pair["page_id"])
-                docMap[curDoc] = []
-
-            docMap[curDoc].append(str(pair["paragraph"]))
-
-        for docID, paragraphs in docMap.items():
-            self.wordDocCount[docID] = self.generateHitlists(docID, paragraphs)
+        if workers > 1:
+            shard = buildIndex(data, workers, self.useGST)
+            self.wordPairs.update(shard.wordPairs)
+            self.wordDocCount.update(shard.wordDocCount)
+            if self.useGST:
+                self.documentPairs.update(shard.documentPairs)
+        else:
+            for docID, paragraphs in data:
+                self.wordDocCount[docID] = self.generateHitlists(
+                    docID, paragraphs)
 
         # Generate document blacklist
         self.generateDocumentBlacklist(self.wordDocCount)
@@ -419,77 +678,60 @@ class Indexer:
         upperLimit = len(data) * UPPER_ELIMINATION_RATIO
         len(data) * LOWER_ELIMINATION_RATIO
 
-        self.documentBlacklist.extend(nlargest(int(upperLimit), data))
+        self.documentBlacklist.update(nlargest(int(upperLimit), data))
         # self.documentBlacklist.extend(nsmallest(int(lowerLimit), data))
 
         end = time.perf_counter()
         print(f"Time elapsed generating blacklists: {end - start:0.4f}s")
 
-    # def storeIndexRemote(self):
-    #     print("Storing indexes...")
-    #     barrelSize = int(len(self.wordPairs) / 64)
-    #     print(f"Barrel size: {barrelSize}")
-    #     maxedOut = True
-    #     firstWord = ""
-    #     tempBarrel = Barrel()
-    #     for k, v in sorted(self.wordPairs.items(), key=lambda x: x[0]):
-    #         if maxedOut:
-    #             firstWord = k
-    #             maxedOut = False
-    #             tempBarrel = Barrel()
-    #
-    #         tempBarrel.pairs[k] = v
-    #
-    #         if len(tempBarrel.pairs) == barrelSize:
-    #             self.wordPersistence[firstWord] = tempBarrel
-    #             maxedOut = True
-    #
-    #     if self.useGST:
-    #         pickle.dump(self.documentPairs,
-    #                     self.documentPersistence,
-    #                     protocol=pickle.HIGHEST_PROTOCOL)
-    #         pickle.dump(self.gst.tree,
-    #                     self.treePersistence,
-    #                     protocol=pickle.HIGHEST_PROTOCOL)
-    #
-    #     print("Done storing indexes")
-    #     self.wordPersistence.sync()
-
     def storeIndex(self):
         start = time.perf_counter()
         print("Storing indexes...")
-        barrelSize = int(len(self.wordPairs) / 64)
-        print(f"Barrel size: {barrelSize}")
-        maxedOut = True
-        firstWord = ""
-        tempBarrel = Barrel()
-        for k, v in sorted(self.wordPairs.items(), key=lambda x: x[0]):
-            if maxedOut:
-                firstWord = k
-                maxedOut = False
-                tempBarrel = Barrel()
-
-            tempBarrel.pairs[k] = v
-
-            if len(tempBarrel.pairs) == barrelSize:
-                self.wordPersistence[firstWord] = tempBarrel
-                maxedOut = True
-
-        pickle.dump(self.wordDocCount,
-                    self.docWordCountPersistence,
-                    protocol=pickle.HIGHEST_PROTOCOL)
+        if self.barrelMode == "segment":
+            writeSegment(SEGMENT_FILE, self.wordPairs, self.wordDocCount)
+        elif self.barrelClient is not None:
+            # The manager persists word pairs as barrels on its side
+            self.barrelClient.dump(PacketScope.WORD, self.wordPairs.items())
+            writeDocWordCount(DOC_WORD_COUNT_FILE, self.wordDocCount)
+        else:
+            self.storeBarrels()
+
+        # Scoring weights only depend on the index, compute them once here
+        self.scoringStats = BM25Stats.compute(self.documentFrequency,
+                                              self.wordDocCount)
+        writeScoringStats(SCORING_FILE, self.scoringStats)
+        writeTermStats(TERM_STATS_FILE, self.documentFrequency,
+                       self.commonWords)
+        self.fuzzyIndex = FuzzyIndex.build(self.wordPairs.keys())
+        writeFuzzyIndex(FUZZY_FILE, self.fuzzyIndex)
 
         if self.useGST:
-            pickle.dump(self.documentPairs,
-                        self.documentPersistence,
-                        protocol=pickle.HIGHEST_PROTOCOL)
-            pickle.dump(self.gst.tree,
-                        self.treePersistence,
-                        protocol=pickle.HIGHEST_PROTOCOL)
+            if self.barrelClient is not None:
+                self.barrelClient.dump(PacketScope.DOC,
+                                       self.documentPairs.items())
+            else:
+                writeDocumentPairs(PERSISTENT_DOCPAIRS_FILE,
+                                   self.documentPairs)
+            writeTree(GST_FILE, self.gst.tree)
 
         end = time.perf_counter()
         print(f"Time elapsed storing index to persistent: {end - start:0.4f}s")
-        self.wordPersistence.sync()
+
+    def storeBarrels(self):
+        """storeBarrels
+
+        Split sorted hitlists into `BARREL_COUNT` barrels of roughly the same
+        postings size, and write a manifest describing every barrel.
+        """
+        pairs = [(word, CompressedPostings.encode(hits))
+                 for word, hits in sorted(self.wordPairs.items())]
+        barrels, manifest = splitBarrels(pairs, BARREL_COUNT)
+        totalSize = sum(info["size"] for info in manifest)
+        print(f"Average barrel size: {totalSize / BARREL_COUNT:0.0f} bytes")
+
+        writeBarrels(PERSISTENT_WORDPAIRS_FILE, barrels, manifest)
+        writeDocWordCount(DOC_WORD_COUNT_FILE, self.wordDocCount)
+        print(f"Barrel count: {len(manifest)}")
 
     def generateHitlists(self, docID: int, paragraphs: List[str]) -> int:
         """Generate hitlists for docID
@@ -498,49 +740,14 @@ class Indexer:
             docID: Document ID
             paragraphs: List of texts in paragraph tags
         """
-        sdocID = bitarray(bin(docID)[2:].zfill(19))
-        wordCount = 1
-        totalCount = 0
-        for paragraph in paragraphs:
-            # TODO
-            # Stripping information might be better done in crawling process
-            paragraph = sub(r'\W+', ' ', paragraph)
-            # paragraph = sub('[^A-Za-z0-9 ]+', ' ', paragraph)
-            for char in FILTERED_CHAR:
-                paragraph = paragraph.replace(char, ' ')
-            words = str(paragraph).split()
-
-            # Strip empty or single-character word
-            for word in words:
-                # Skip word longer than 30 characters
-                # Realistically, if there is an abnormal condition where there are
-                # word longer than 30 chars, then there's a problem with filtering
-                if len(word) > 30:
-                    continue
-
-                # Word limit
-                if wordCount > 4094:
-                    wordCount = 4095
-
-                if word == "" or len(word) == 1:
-                    continue
-
-                isCapital = bool(match(CAPITAL_PATTERN, word))
-                if not isCapital:
-                    word = word.lower()
-
-                # Merge docID, word offset and capital information
-                hit = ba2int(sdocID + bitarray(bin(wordCount)[2:].zfill(12)) +
-                             bitarray(bin(int(isCapital))[2:].zfill(1)))
-
-                self.wordPairs[word].append(hit)
-                if self.useGST:
-                    self.documentPairs[docID].append(hit)
+        words, hits = encodeDocument(docID, paragraphs)
+        for word, hit in zip(words, hits):
+            self.wordPairs.append(word, hit)
 
-                wordCount += 1
-                totalCount += 1
+        if self.useGST:
+            self.documentPairs.extend(docID, hits)
 
-        return totalCount
+        return len(hits)
 
     # Get documents from database
     def __getDocuments(self, query: UserQuery):
@@ -596,43 +803,60 @@ class Indexer:
 
     def __getInputPairs(self, query: UserQuery, infoPairs: Dict[str,
                                                                 WordInfo]):
+        # Hitlists of every word and of its lowercase version, fetched at
+        # once so remote barrels cost a single request
+        lookup: List[str] = []
+        for word, info in infoPairs.items():
+            if not info[1]:
+                lookup.append(word)
+                if info[2]:
+                    lookup.append(word.lower())
+        found = fetchPostings(self.wordPairs, lookup)
+
+        # (word, info, whether its hitlist is stored), in input order
+        resolved: List[Tuple[str, WordInfo, bool]] = []
         for word in infoPairs.keys():
             # Skip storing hitlists if it's a common word
             if not infoPairs[word][1]:
                 # Check if word is exist in lexicon
-                try:
-                    query.wordPairs[word] = (infoPairs[word],
-                                             self.wordPairs[word])
-                except KeyError:
-                    # If capital, check if lowercase version exist
-                    if infoPairs[word][2]:
-                        lowerVer = word.lower()
-                        if lowerVer in self.wordPairs.keys():
-                            query.wordPairs[lowerVer] = (
-                                infoPairs[word], self.wordPairs[lowerVer])
+                if word in found:
+                    resolved.append((word, infoPairs[word], True))
+                    continue
+
+                # If capital, check if lowercase version exist
+                if infoPairs[word][2]:
+                    lowerVer = word.lower()
+                    if lowerVer in found:
+                        resolved.append((lowerVer, infoPairs[word], True))
+                        continue
+
+                # Find semantically nearest word with Jaccard index
+                bestMatch = self.rankSimilarity(word,
+                                                limit=1,
+                                                exclude=self.commonWords)
+                if len(bestMatch) == 0:
+                    resolved.append((word, infoPairs[word], False))
+                else:
+                    # Use word with highest similarity
+                    for m in bestMatch:
+                        if m[0] in self.commonWords:
                             continue
 
-                    # Find semantically nearest word with Jaccard index
-                    bestMatch = self.rankSimilarity(word)
-                    if len(bestMatch) == 0:
-                        query.wordPairs[word] = (infoPairs[word], [])
-                    else:
-                        # Use word with highest similarity
-                        for m in bestMatch:
-                            if m[0] in self.commonWords:
-                                continue
-
-                            query.wordPairs[m[0]] = ((infoPairs[word][0],
-                                                      False,
-                                                      bool(
-                                                          match(
-                                                              CAPITAL_PATTERN,
-                                                              m[0]))),
-                                                     self.wordPairs[m[0]])
-                            break
+                        resolved.append(
+                            (m[0], (infoPairs[word][0], False,
+                                    bool(match(CAPITAL_PATTERN, m[0]))), True))
+                        break
 
             else:
-                query.wordPairs[word] = (infoPairs[word], [])
+                resolved.append((word, infoPairs[word], False))
+
+        # Nearest words are fetched with a second single request, only when
+        # fuzzy lookup found new words
+        nearest = [w for w, _, stored in resolved if stored and w not in found]
+        if len(nearest) > 0:
+            found.update(fetchPostings(self.wordPairs, nearest))
+        for word, info, stored in resolved:
+            query.wordPairs[word] = (info, found[word] if stored else [])
 
         # Set root hitlist. Root hitlist is the first non common word's hitlist
         for w, h in sorted(query.wordPairs.values(), key=lambda x: x[0][0]):
@@ -649,119 +873,132 @@ class Indexer:
         # 4) Get word hitlist
         # 5) For each docID, get intersection between words
         # 6) Calculate diff directly
-        docPairs: Dict[str, List[Tuple[int, int]]] = defaultdict(
-            list)  # For (document,count)
-        docList: Dict[str, List[int]] = defaultdict(list)  # For document only
-        intersectPairs: Dict[float, List[int]] = defaultdict(list)
+        docList: Dict[str, DocSet] = {}  # For document only
         # TODO Confirm if common word is already filtered
         for word in query.wordPairs.keys():
             # Assumptions are there will always be a result
             # since the word is found in lexicon
-            docPairs[word] = self.gst.findTree(word)
-
-        # Sort by highest count
-        for val in docPairs.values():
-            val.sort(key=lambda x: x[1])
-
-        # Extract doc lists
-        for k, v in docPairs.items():
-            docList[k] = [d[0] for d in v]
-
-        # TODO
-        # Get intersection
-        if len(docList) > 1:
-            for iter in range(1, len(docList.keys())):
-                for pair in combinations(docList.keys(), iter):
-                    for p in pair:
-                        intersectPairs[iter / len(docList.keys())] = list(
-                            set(intersectPairs[iter / len(
-                                docList.keys())]).intersection(docList[p]))
-
-        # Get all docID-mapped hitlists
-        storeDoc: List[int] = []
-        for d in docList.values():
-            storeDoc.extend(d)
-        for doc in set(storeDoc):
-            # Filter document blacklist
-            if doc not in self.documentBlacklist:
-                query.docHitlists[doc] = self.documentPairs[doc]
-
-    def search(self, input: str) -> Dict[int, Tuple[int, float, str, str]]:
-        start = time.perf_counter()
+            docList[word] = self.gst.findDocuments(word)
+
+        # Get all docID-mapped hitlists, filtering document blacklist
+        storeDoc = docSetUnion(docList.values()) - self.documentBlacklist
+        # Documents without any indexed paragraph are skipped
+        query.docHitlists.update(fetchPostings(self.documentPairs, storeDoc))
+
+    def rankQuery(self, input: str, k: Optional[int] = 10) -> UserQuery:
+        """rankQuery
+
+        Rank the documents of a query, without fetching them from the
+        database.
+
+        Args:
+            input: User query
+            k: Number of documents to rank, every matching document when
+                None
+
+        Returns:
+            Processed query, with the score of every ranked document in
+            `documentRank`
+        """
         query = UserQuery()
         infoPairs = self.__parseInput(input)
-        res: Dict[int, Tuple[int, float, str, str]] = {}
+        self.__getInputPairs(query, infoPairs)
 
-        try:
-            self.__getInputPairs(query, infoPairs)
+        if self.useGST:
+            self.__getDocumentPairs(query)
 
-            if self.useGST:
-                self.__getDocumentPairs(query)
+        query.generateExpectedPos()
+        query.processQuery()
+        if self.scoringStats is not None:
+            # Only breaks ties between documents with the same phrase score
+            query.scorer = BM25Scorer(self.scoringStats, query.termWords)
 
-            query.generateExpectedPos()
-            query.processQuery()
+        if self.useGST:
+            query.calculateRankingGST(k)
+        elif k is not None:
+            query.calculateTopRanking(k, self.documentBlacklist)
+        else:
+            query.calculateRanking()
 
-            if self.useGST:
-                query.calculateRankingGST()
-            else:
-                query.calculateRanking()
+            # Filter docID result based on document blacklists
+            # GST-based method already filter these in query parsing step
+            self.filterQuery(query)
+        return query
 
-                # Filter docID result based on document blacklists
-                # GST-based method already filter these in query parsing step
-                self.filterQuery(query)
+    def search(self,
+               input: str,
+               k: Optional[int] = 10) -> Dict[int, Tuple[int, float, str, str]]:
+        """search
 
+        Args:
+            input: User query
+            k: Number of documents to rank and fetch, every matching
+                document when None
+        """
+        start = time.perf_counter()
+        res: Dict[int, Tuple[int, float, str, str]] = {}
+
+        try:
+            query = self.rankQuery(input, k)
             res = self.__getDocuments(query)
-            prettyPrint(res)
-        except Exception as e:
+            prettyPrint(res, len(res))
+        except IndexError as e:
+            # Nothing of the query is indexed
             print(f"Error on intermediate process: {e}")
         end = time.perf_counter()
         print(f"Time elapsed getting user result: {end - start:0.8f}s")
-
-        self.wordPersistence.close()
+        if isinstance(self.wordPairs, BarrelCache):
+            print(f"Barrel cache: {self.wordPairs.stats()}")
         return res
 
     def filterQuery(self, query: UserQuery):
-        filteredDoc: List[int] = []
-        for k in query.documentRank.keys():
-            if k in self.documentBlacklist:
-                filteredDoc.append(k)
-
-        for doc in filteredDoc:
+        for doc in DocSet(query.documentRank) & self.documentBlacklist:
             del query.documentRank[doc]
 
     def generateCommonLists(self):
         # TODO Accomodate this
         # if self.useGST:
         #     return
-        total = int(len(self.wordPairs.keys()) * COMMON_WORD_RATIO)
-        # Sort by highest count (most frequent word)
-        for word, _ in sorted(self.wordPairs.items(),
-                              key=lambda x: len(x[1]),
-                              reverse=True):
-            self.commonWords.append(word)
-            if len(self.commonWords) >= total:
-                break
-
-    def rankSimilarity(self, input: str) -> List[Tuple[str, float]]:
+        # Hitlists are only read once, the result is stored with the index
+        self.documentFrequency = documentFrequencies(self.wordPairs)
+        # At least one word, so small lexicons still filter stopwords
+        total = max(1, int(len(self.documentFrequency) * COMMON_WORD_RATIO))
+        # Words found in the most documents
+        self.commonWords = frozenset(
+            nlargest(total,
+                     self.documentFrequency,
+                     key=self.documentFrequency.__getitem__))
+
+    def rankSimilarity(
+            self,
+            input: str,
+            limit: int = FUZZY_CANDIDATES,
+            exclude: Container[str] = ()) -> List[Tuple[str, float]]:
         # TODO Accomodate this
         # if self.useGST:
         #     return []
-        result: Dict[str, float] = defaultdict(float)
+        if self.fuzzyIndex is None:
+            self.fuzzyIndex = FuzzyIndex.build(self.wordPairs.keys())
+        return self.fuzzyIndex.search(input, limit, exclude)
 
-        for word in self.wordPairs.keys():
-            result[word] = jaccard_similarity(input, word)
+    # Main loop for search service
+    def listen(self,
+               path: str = SEARCH_SOCKET_PATH,
+               server: str = SERVER_ASYNC):
+        """listen
 
-        return sorted(result.items(), key=lambda x: x[1], reverse=True)
+        Serve queries over a Unix socket until SIGINT or SIGTERM, keeping
+        the prepared index in memory.
 
-    # Main loop for search service
-    def listen(self):
-        while True:
-            try:
-                pass
-            except KeyboardInterrupt:
-                # Cleanup whole process
-                self.wordPersistence.close()
-                self.documentPersistence.close()
+        Args:
+            path: Socket path
+            server: Either SERVER_ASYNC (see `AsyncSearchServer`) or
+                SERVER_THREADED (see `SearchServer`)
+        """
+        if server == SERVER_THREADED:
+            SearchServer(path, self.search).serve()
+        else:
+            AsyncSearchServer(path, self.search).serve()
 
 
 ###################
@@ -769,6 +1006,36 @@ class Indexer:
 ###################
 
 
+def groupParagraphs(rows: Iterable[Tuple[int, str]]) -> Iterator[Document]:
+    """groupParagraphs
+
+    Gather consecutive (page_id, paragraph) rows as a single document.
+
+    Args:
+        rows: Rows ordered by page_id
+    """
+    for docID, group in groupby(rows, key=itemgetter(0)):
+        yield int(docID), [str(paragraph) for _, paragraph in group]
+
+
+def fetchPostings(store: Mapping[K, HitLists],
+                  keys: Iterable[K]) -> Dict[K, HitLists]:
+    """fetchPostings
+
+    Hitlists of every key found in store. Remote stores are asked with a
+    single request instead of one per key.
+    """
+    if isinstance(store, RemotePostings):
+        return store.fetch(keys)
+    result: Dict[K, HitLists] = {}
+    for key in keys:
+        try:
+            result[key] = store[key]
+        except KeyError:
+            continue
+    return result
+
+
 def getCapital(input: int) -> bool:
     return bool(input & CAPITAL_MASK)
 
@@ -781,14 +1048,14 @@ def getDocID(input: int) -> int:
     return input >> 13
 
 
-def sortHit(data: Tuple[str, HitLists]):
+def sortHit(data: Tuple[str, "array[int]"]):
     """sortHit
 
     Args:
         data: Tuple[word, histlists]
 
     """
-    data[1].sort(reverse=True)
+    data[1][:] = array(HIT_TYPECODE, sorted(data[1], reverse=True))
 
 
 def prettyPrint(data: Dict[int, Tuple[int, float, str, str]], limit: int = 10):
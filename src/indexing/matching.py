@@ -0,0 +1,290 @@
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from heapq import heappush, heapreplace
+from itertools import compress, repeat
+from operator import rshift
+from typing import (
+    AbstractSet,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from src.indexing.compression import CompressedPostings
+from src.indexing.hitlist import (
+    DOCID_SHIFT,
+    HIT_TYPECODE,
+    MAX_POSITION,
+    POSITION_SHIFT,
+)
+
+
+def ascendingHits(hits: Sequence[int]) -> "array[int]":
+    """ascendingHits
+
+    Get a hitlist sorted in descending order (see `Indexer.sortHitlists`)
+    as an ascending array.
+    """
+    if isinstance(hits, CompressedPostings):
+        return hits.decode()[::-1]
+    if isinstance(hits, array) and hits.typecode == HIT_TYPECODE:
+        return hits[::-1]
+    return array(HIT_TYPECODE, reversed(hits))
+
+
+def termHits(hits: Sequence[int]) -> Sequence[int]:
+    """termHits
+
+    Get the hitlist of a query term ready for `documentSlice`. Compressed
+    postings are kept as is, so only the blocks of candidate documents get
+    decoded, other hitlists become ascending arrays.
+    """
+    if isinstance(hits, CompressedPostings):
+        return hits
+    return ascendingHits(hits)
+
+
+def decodedHits(hits: Sequence[int]) -> Sequence[int]:
+    """Get a hitlist of `termHits` as an ascending array"""
+    if isinstance(hits, CompressedPostings):
+        return ascendingHits(hits)
+    return hits
+
+
+def iterDocuments(
+    hitlists: Sequence[Sequence[int]]
+) -> Iterator[Tuple[int, List[Sequence[int]]]]:
+    """iterDocuments
+
+    Walk ascending hitlists of every query term at once, document by
+    document. Each list keeps a cursor, and the hits of the current document
+    are found with a binary search from the cursor, so every list is only
+    read once.
+
+    Args:
+        hitlists: Hitlist of every term, sorted in ascending order
+
+    Yields:
+        (docID, hits of the document for every term), in docID order
+    """
+    cursors = [0] * len(hitlists)
+    while True:
+        docID = -1
+        for hits, cursor in zip(hitlists, cursors):
+            if cursor < len(hits):
+                d = hits[cursor] >> DOCID_SHIFT
+                if docID < 0 or d < docID:
+                    docID = d
+        if docID < 0:
+            return
+
+        upper = (docID + 1) << DOCID_SHIFT
+        slices: List[Sequence[int]] = []
+        for i, hits in enumerate(hitlists):
+            cursor = cursors[i]
+            if cursor < len(hits) and hits[cursor] < upper:
+                end = bisect_left(hits, upper, cursor)
+                slices.append(hits[cursor:end])
+                cursors[i] = end
+            else:
+                slices.append(())
+        yield docID, slices
+
+
+def documentHits(hitlists: Sequence[Sequence[int]],
+                 docID: int) -> List[Sequence[int]]:
+    """documentHits
+
+    Get the hits of a single document from every hitlist (see
+    `documentSlice`).
+
+    Args:
+        hitlists: Hitlist of every term, see `termHits`
+        docID: Document ID
+
+    Returns:
+        Hits of the document for every term, in ascending order
+    """
+    return [documentSlice(hits, docID)[0] for hits in hitlists]
+
+
+def documentSlice(hits: Sequence[int],
+                  docID: int) -> Tuple[Sequence[int], Sequence[int]]:
+    """documentSlice
+
+    Get the hits of a single document from an ascending hitlist, with two
+    binary searches. Compressed postings only decode the blocks that may
+    hold the document, found with their skip entries (see
+    `CompressedPostings.hitsForDocument`).
+
+    Args:
+        hits: Hitlist of a term, see `termHits`
+        docID: Document ID
+
+    Returns:
+        (hits of the document in ascending order, the following hit if any)
+    """
+    lower, upper = docID << DOCID_SHIFT, (docID + 1) << DOCID_SHIFT
+    if isinstance(hits, CompressedPostings):
+        following = hits.hitAbove(upper - 1)
+        return (hits.hitsForDocument(docID)[::-1],
+                () if following is None else (following, ))
+    start = bisect_left(hits, lower)
+    end = bisect_left(hits, upper, start)
+    return hits[start:end], hits[end:end + 1]
+
+
+def candidatePostings(hits: Sequence[int],
+                      candidateCount: int) -> Sequence[int]:
+    """candidatePostings
+
+    Get a hitlist of `termHits` to look up candidateCount documents in,
+    decoded at once unless its skip entries save decoding blocks.
+    """
+    if skipsBlocks(hits, candidateCount):
+        return hits
+    return decodedHits(hits)
+
+
+def skipsBlocks(hits: Sequence[int], candidateCount: int) -> bool:
+    """skipsBlocks
+
+    Whether hits are compressed postings with more blocks than candidates,
+    so looking candidates up decodes only some of the blocks.
+    """
+    return (isinstance(hits, CompressedPostings)
+            and candidateCount < hits.blockCount())
+
+
+def lowestHit(hits: Sequence[int]) -> int:
+    """Lowest hit of a non empty hitlist of `termHits`"""
+    if isinstance(hits, CompressedPostings):
+        return hits.lowest()
+    return hits[0]
+
+
+def phraseMatches(hits: Sequence[int], rootHits: AbstractSet[int],
+                  expectedPos: List[int]) -> Tuple[int, int]:
+    """phraseMatches
+
+    Split the ascending hits of a document into windows, a new window
+    starting at every root hit except the last hit, and compare them with
+    the expected positions (see `matchWindows`).
+
+    Args:
+        hits: Query term hits of a document, sorted in ascending order
+        rootHits: Root term hits of the document
+        expectedPos: Expected word position of the query
+
+    Returns:
+        (exact match count, partial match count)
+    """
+    last = len(hits) - 1
+    bounds = list(compress(range(last), map(rootHits.__contains__, hits)))
+    if not bounds or bounds[0] != 0:
+        bounds.insert(0, 0)
+    bounds.append(len(hits))
+
+    exactCount, partial = matchWindows(hits, bounds, expectedPos)
+    return exactCount, sum(partial.values())
+
+
+def matchWindows(hits: Sequence[int], bounds: Sequence[int],
+                 expectedPos: List[int]) -> Tuple[int, Dict[int, int]]:
+    """matchWindows
+
+    Compare the word positions of every window `hits[bounds[i]:bounds[i+1]]`
+    with the expected positions, after moving the window to the first
+    expected position. Only windows as long as the query are decoded.
+
+    Args:
+        hits: Hits sorted in ascending order
+        bounds: Start of every window, followed by the end of the last one
+        expectedPos: Expected word position of the query
+
+    Returns:
+        (exact match count, mapping between length and count of every other
+        window)
+    """
+    size = len(expectedPos)
+    offsets = [p - expectedPos[0] for p in expectedPos]
+    exactCount = 0
+    partial: Dict[int, int] = {}
+    for start, end in zip(bounds, bounds[1:]):
+        if end - start == size:
+            base = hits[start] >> POSITION_SHIFT & MAX_POSITION
+            if [(h >> POSITION_SHIFT & MAX_POSITION) - base
+                    for h in hits[start:end]] == offsets:
+                exactCount += 1
+                continue
+        partial[end - start] = partial.get(end - start, 0) + 1
+    return exactCount, partial
+
+
+def topDocuments(
+    hitlists: Sequence[Sequence[int]], k: int,
+    scoreBound: Callable[[int], float],
+    scoreDocument: Callable[[int, List[Sequence[int]], List[Sequence[int]]],
+                            Optional[float]]
+) -> List[Tuple[int, float]]:
+    """topDocuments
+
+    Get the k best documents without scoring every one of them. Scores only
+    grow with the number of hits of a document, so documents are counted
+    first and scored from the most hits down, stopping once the bound of the
+    remaining documents can't beat the current k-th best score.
+
+    Ties are broken by the lowest docID, the same as sorting every document
+    score in docID order.
+
+    Args:
+        hitlists: Hitlist of every term, see `termHits`
+        k: Number of documents
+        scoreBound: Upper bound of the score of a document with that many
+            hits
+        scoreDocument: Score of a document from its hits of every term and
+            the following hit of every term, or None when the document is
+            not ranked
+
+    Returns:
+        (docID, score) of the best documents, best first
+    """
+    if k <= 0:
+        return []
+    # Every hit is counted, so compressed postings are decoded here and
+    # only kept when their skip entries save decoding blocks
+    decoded = [decodedHits(hits) for hits in hitlists]
+    hitCounts: Counter = Counter()
+    for hits in decoded:
+        hitCounts.update(map(rshift, hits, repeat(DOCID_SHIFT)))
+    hitlists = [
+        hits if skipsBlocks(hits, len(hitCounts)) else plain
+        for hits, plain in zip(hitlists, decoded)
+    ]
+
+    heap: List[Tuple[float, int]] = []
+    for docID, hitCount in hitCounts.most_common():
+        if len(heap) == k and scoreBound(hitCount) <= heap[0][0]:
+            break
+
+        slices: List[Sequence[int]] = []
+        following: List[Sequence[int]] = []
+        for hits in hitlists:
+            docHits, nextHit = documentSlice(hits, docID)
+            slices.append(docHits)
+            following.append(nextHit)
+
+        score = scoreDocument(docID, slices, following)
+        if score is None:
+            continue
+        if len(heap) < k:
+            heappush(heap, (score, -docID))
+        elif (score, -docID) > heap[0]:
+            heapreplace(heap, (score, -docID))
+
+    return [(-negDocID, score) for score, negDocID in sorted(heap, reverse=True)]
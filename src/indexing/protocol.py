@@ -1,9 +1,31 @@
-import pickle
+import socket
+import struct
+from array import array
 from enum import Enum
-from typing import TypedDict
+from typing import (
+    Iterable,
+    Iterator,
+    Optional,
+    Sequence,
+    Tuple,
+    TypedDict,
+    Union,
+)
 
+from src.indexing.hitlist import HIT_TYPECODE
+
+BARREL_SOCKET_PATH = "/tmp/telusuri_barrel.sock"
 MSG_HEADER = bytes.fromhex("756E6A")
-HEADER_KEYSET = ["command", "isEnd", "magicPacket", "scope"]
+# magicPacket, command, scope, isEnd, payload length
+HEADER = struct.Struct("=3sBBBI")
+HEADER_LEN = HEADER.size
+Buffer = Union[bytes, bytearray, memoryview]
+# Largest payload of a single packet, longer payloads are split
+MAX_PAYLOAD_LEN = 65536 - HEADER_LEN
+# Key length and hit count of every record of a postings batch
+RECORD = struct.Struct("=II")
+DOC_KEY = struct.Struct("=I")
+HIT_SIZE = struct.calcsize(HIT_TYPECODE)
 
 class PacketScope(Enum):
     WORD = 0b0 # Word pairs
@@ -12,6 +34,7 @@ class PacketScope(Enum):
 class PacketCommand(Enum):
     GET = 0b0 # Get data from persistence
     DUMP = 0b1 # Input data to persistence
+    GET_BATCH = 0b10 # Get data of many keys at once
 
 class PacketEnd(Enum):
     F = 0b0 # False
@@ -22,18 +45,194 @@ class HeaderDict(TypedDict):
     isEnd: PacketEnd
     command: PacketCommand
     scope: PacketScope
+    length: int
 
-def parseHeader(data: bytes) -> HeaderDict:
-    h = pickle.loads(data)
+def encodeHeader(command: PacketCommand, scope: PacketScope, isEnd: PacketEnd,
+                 length: int) -> bytes:
+    return HEADER.pack(MSG_HEADER, command.value, scope.value, isEnd.value,
+                       length)
 
-    if sorted(h.keys()) != HEADER_KEYSET:
-        raise ValueError(f"Got keys {h.keys()}")
+def parseHeader(data: Buffer) -> HeaderDict:
+    if len(data) != HEADER_LEN:
+        raise ValueError(f"Header length | Got {len(data)} instead")
+    magic, command, scope, isEnd, length = HEADER.unpack(data)
 
-    if h["magicPacket"] != MSG_HEADER:
-        raise ValueError(f"magicPacket | Got {h['magicPacket']} instead")
+    if magic != MSG_HEADER:
+        raise ValueError(f"magicPacket | Got {magic} instead")
     return {
-        "magicPacket": h["magicPacket"],
-        "isEnd": h["isEnd"],
-        "command": h["command"],
-        "scope": h["scope"]
+        "magicPacket": magic,
+        "isEnd": PacketEnd(isEnd),
+        "command": PacketCommand(command),
+        "scope": PacketScope(scope),
+        "length": length
     }
+
+def sendPacket(sock: socket.socket, command: PacketCommand,
+               scope: PacketScope, payload: Buffer = b""):
+    """sendPacket
+
+    Send a payload as framed packets, split by MAX_PAYLOAD_LEN. Only the
+    last packet has isEnd set. Payload slices are sent along their header
+    with a single `sendmsg`, without being copied.
+
+    Args:
+        sock: Connected socket
+        command: Packet command
+        scope: Packet scope
+        payload: Any bytes-like object, see `postingsPayload` for hitlists
+    """
+    view = memoryview(payload).cast("B")
+    start = 0
+    while True:
+        chunk = view[start:start + MAX_PAYLOAD_LEN]
+        start += len(chunk)
+        isEnd = PacketEnd.T if start >= len(view) else PacketEnd.F
+        sendAll(sock, [encodeHeader(command, scope, isEnd, len(chunk)), chunk])
+        if isEnd == PacketEnd.T:
+            return
+
+def sendStream(sock: socket.socket, command: PacketCommand,
+               scope: PacketScope, pieces: Iterable[Buffer]):
+    """sendStream
+
+    Send pieces as a single message while they are produced. Full packets of
+    MAX_PAYLOAD_LEN are sent as soon as they are buffered, so a large
+    response is never built as a whole.
+    """
+    buffer = bytearray()
+    for piece in pieces:
+        buffer += piece
+        if len(buffer) < MAX_PAYLOAD_LEN:
+            continue
+        full = len(buffer) - len(buffer) % MAX_PAYLOAD_LEN
+        view = memoryview(buffer)
+        for start in range(0, full, MAX_PAYLOAD_LEN):
+            sendAll(sock, [
+                encodeHeader(command, scope, PacketEnd.F, MAX_PAYLOAD_LEN),
+                view[start:start + MAX_PAYLOAD_LEN]
+            ])
+        view.release()
+        del buffer[:full]
+    sendAll(sock, [encodeHeader(command, scope, PacketEnd.T, len(buffer)),
+                   buffer])
+
+def recvPacket(
+        sock: socket.socket) -> Optional[Tuple[HeaderDict, memoryview]]:
+    """recvPacket
+
+    Receive every packet of a message.
+
+    Returns:
+        (header of the last packet, whole payload), or None when the
+        connection is closed before a new message
+    """
+    data = recvExact(sock, HEADER_LEN)
+    if data is None:
+        return None
+    header = parseHeader(data)
+    chunks = []
+    while True:
+        chunk = recvExact(sock, header["length"])
+        if chunk is None:
+            raise ConnectionError("Connection closed inside a message")
+        chunks.append(chunk)
+        if header["isEnd"] == PacketEnd.T:
+            break
+        data = recvExact(sock, HEADER_LEN)
+        if data is None:
+            raise ConnectionError("Connection closed inside a message")
+        header = parseHeader(data)
+
+    if len(chunks) == 1:
+        return header, memoryview(chunks[0])
+    return header, memoryview(b"".join(chunks))
+
+def postingsPayload(hits: Sequence[int]) -> memoryview:
+    """Raw uint32 buffer of a hitlist, without copying hit arrays"""
+    if not (isinstance(hits, array) and hits.typecode == HIT_TYPECODE):
+        hits = array(HIT_TYPECODE, hits)
+    return memoryview(hits)  #type: ignore
+
+def parsePostings(payload: memoryview) -> memoryview:
+    """Hitlist view of a payload, without copying"""
+    return payload.cast(HIT_TYPECODE)  #type: ignore
+
+def encodeKey(scope: PacketScope, key: Union[str, int]) -> bytes:
+    """Word as UTF-8, or document ID as uint32"""
+    if scope == PacketScope.WORD:
+        return str(key).encode()
+    return DOC_KEY.pack(key)
+
+def decodeKey(scope: PacketScope, data: Buffer) -> Union[str, int]:
+    if scope == PacketScope.WORD:
+        return bytes(data).decode()
+    return DOC_KEY.unpack(data)[0]
+
+def encodeBatch(scope: PacketScope,
+                pairs: Iterable[Tuple[Union[str, int], Sequence[int]]]
+                ) -> bytearray:
+    """encodeBatch
+
+    Encode many postings as a single payload. Every record is a `RECORD`,
+    the key padded to 4 bytes and the raw hits, so hits stay aligned.
+    """
+    payload = bytearray()
+    for piece in batchRecords(scope, pairs):
+        payload += piece
+    return payload
+
+def batchRecords(scope: PacketScope,
+                 pairs: Iterable[Tuple[Union[str, int], Sequence[int]]]
+                 ) -> Iterator[Buffer]:
+    """Pieces of `encodeBatch`, hits are yielded without being copied"""
+    for key, hits in pairs:
+        data = encodeKey(scope, key)
+        view = postingsPayload(hits)
+        yield RECORD.pack(len(data), len(view)) + data + bytes(-len(data) % 4)
+        yield view
+
+def encodeKeys(scope: PacketScope, keys: Iterable[Union[str, int]]) -> bytearray:
+    """Batch of keys without hits, see `PacketCommand.GET_BATCH`"""
+    return encodeBatch(scope, ((key, ()) for key in keys))
+
+def iterBatch(
+    scope: PacketScope, payload: memoryview
+) -> Iterator[Tuple[Union[str, int], memoryview]]:
+    """Decode a payload of `encodeBatch`, hits are views into payload"""
+    payload = payload.cast("B")
+    pos = 0
+    while pos < len(payload):
+        keyLen, hitCount = RECORD.unpack_from(payload, pos)
+        pos += RECORD.size
+        key = decodeKey(scope, payload[pos:pos + keyLen])
+        pos += keyLen + -keyLen % 4
+        end = pos + hitCount * HIT_SIZE
+        yield key, parsePostings(payload[pos:end])
+        pos = end
+
+###################
+# Utility functions
+###################
+def sendAll(sock: socket.socket, buffers: Sequence[Buffer]):
+    views = [memoryview(b).cast("B") for b in buffers]
+    while views:
+        sent = sock.sendmsg(views)
+        while views and sent >= len(views[0]):
+            sent -= len(views[0])
+            views.pop(0)
+        if views:
+            views[0] = views[0][sent:]
+
+def recvExact(sock: socket.socket, size: int) -> Optional[bytearray]:
+    """Receive exactly size bytes, None when closed before the first one"""
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            if received == 0:
+                return None
+            raise ConnectionError("Connection closed inside a packet")
+        received += count
+    return buffer
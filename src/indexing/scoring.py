@@ -0,0 +1,143 @@
+import math
+from array import array
+from bisect import bisect_left
+from itertools import repeat
+from operator import rshift
+from typing import Dict, Final, List, Mapping, Sequence
+
+from src.indexing.hitlist import DOCID_SHIFT
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Typecode of precomputed weights
+WEIGHT_TYPECODE: Final = "d"
+
+
+class BM25Stats:
+    """BM25Stats - Collection statistics precomputed for BM25
+
+    Computed once when storing the index, so scoring a query only looks up
+    the weight of each term and the length normalization of each document.
+
+    Attributes:
+        idf: Mapping between word and inverse document frequency
+        docIDs: Sorted document IDs
+        lengthNorms: `k1 * (1 - b + b * length / averageLength)` of every
+            document, aligned with docIDs
+    """
+    __slots__ = ("idf", "docIDs", "lengthNorms")
+
+    def __init__(self, idf: Dict[str, float], docIDs: Sequence[int],
+                 lengthNorms: Sequence[float]) -> None:
+        self.idf = idf
+        self.docIDs = docIDs
+        self.lengthNorms = lengthNorms
+
+    @classmethod
+    def compute(cls, documentFrequency: Mapping[str, int],
+                wordDocCount: Mapping[int, int]) -> "BM25Stats":
+        """compute
+
+        Args:
+            documentFrequency: Mapping between word and the number of
+                documents containing it (see `documentFrequencies`)
+            wordDocCount: Mapping between document ID and it's word count
+        """
+        docCount = len(wordDocCount)
+        idf: Dict[str, float] = {}
+        for word, frequency in documentFrequency.items():
+            idf[word] = math.log(1 + (docCount - frequency + 0.5) /
+                                 (frequency + 0.5))
+
+        docIDs = array("I", sorted(wordDocCount.keys()))
+        averageLength = sum(wordDocCount.values()) / max(docCount, 1)
+        lengthNorms = array(
+            WEIGHT_TYPECODE,
+            (BM25_K1 *
+             (1 - BM25_B + BM25_B * wordDocCount[d] / max(averageLength, 1))
+             for d in docIDs))
+        return cls(idf, docIDs, lengthNorms)
+
+    def lengthNorm(self, docID: int) -> float:
+        i = bisect_left(self.docIDs, docID)
+        if i == len(self.docIDs) or self.docIDs[i] != docID:
+            # Unknown length, score as an average document
+            return BM25_K1
+        return self.lengthNorms[i]
+
+
+class Scorer:
+    """Scorer - Document score of a query, breaking phrase score ties
+
+    Implementations are created for a single query, with the terms of
+    `UserQuery.termHitlists` in the same order. Scores must stay below 1,
+    see `UserQuery.scorerWeight`.
+    """
+    __slots__ = ()
+
+    def score(self, docID: int, slices: List[Sequence[int]]) -> float:
+        """score
+
+        Args:
+            docID: Document ID
+            slices: Hits of the document for every term
+        """
+        raise NotImplementedError
+
+    def bound(self, hitCount: int) -> float:
+        """Upper bound of the score of a document with hitCount hits"""
+        raise NotImplementedError
+
+
+class BM25Scorer(Scorer):
+    """BM25Scorer - Okapi BM25 of the query terms
+
+    The score is divided by its upper bound (every term saturated), so it
+    stays below 1. Weighted by `UserQuery.scorerWeight`, it only orders
+    documents with the same phrase score.
+
+    Attributes:
+        stats: Precomputed collection statistics
+        weights: Normalized IDF of every term
+    """
+    __slots__ = ("stats", "weights")
+
+    def __init__(self, stats: BM25Stats, words: List[str]) -> None:
+        self.stats = stats
+        idf = [stats.idf.get(word, 0.0) for word in words]
+        total = sum(idf) * (BM25_K1 + 1)
+        self.weights = [w * (BM25_K1 + 1) / total if total > 0 else 0.0
+                        for w in idf]
+
+    def score(self, docID: int, slices: List[Sequence[int]]) -> float:
+        norm = self.stats.lengthNorm(docID)
+        result = 0.0
+        for weight, hits in zip(self.weights, slices):
+            tf = len(hits)
+            if tf > 0:
+                result += weight * tf / (tf + norm)
+        return result
+
+    def bound(self, hitCount: int) -> float:
+        # Every term contributes less than its weight, and at most hitCount
+        # terms are in the document
+        return sum(sorted(self.weights, reverse=True)[:hitCount])
+
+
+###################
+# Utility functions
+###################
+def documentFrequencies(
+        wordPairs: Mapping[str, Sequence[int]]) -> Dict[str, int]:
+    """documentFrequencies
+
+    Args:
+        wordPairs: Mapping between word and it's hitlist
+
+    Returns:
+        Mapping between word and the number of documents containing it
+    """
+    return {
+        word: len(set(map(rshift, hits, repeat(DOCID_SHIFT))))
+        for word, hits in wordPairs.items()
+    }
@@ -0,0 +1,435 @@
+import asyncio
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+SEARCH_SOCKET_PATH = "/tmp/telusuri.sock"
+# Number of documents returned when a request doesn't specify it
+DEFAULT_K = 10
+ENCODING = "utf-8"
+# Longest request line, same as the barrel manager packets
+MAX_REQUEST_LEN = 65536
+# Requests of a single connection waiting for their answer
+MAX_PIPELINE = 32
+# Requests of every connection waiting for the executor
+MAX_PENDING = 256
+# Connections waiting to be accepted
+MAX_BACKLOG = 128
+# Seconds spent discarding input before closing a connection on error
+DISCARD_TIMEOUT = 1.0
+
+SERVER_THREADED = "threaded"
+SERVER_ASYNC = "async"
+
+# search(input, k) -> {docID: (docID, score, title, url)}
+SearchFunc = Callable[[str, Optional[int]], Dict[int, Tuple[int, float, str,
+                                                             str]]]
+
+logger = logging.getLogger(__name__)
+
+
+class SearchHandler(socketserver.StreamRequestHandler):
+    """SearchHandler - Serve every request of a single connection
+
+    The protocol is line based, a request is a JSON object on a single line
+    and is answered by a JSON object on a single line.
+
+    Request: `{"query": "...", "k": 10}`, `k` being optional and `null` to
+        rank every matching document. Lines longer than MAX_REQUEST_LEN
+        are answered by an error, then the connection is closed
+    Response: `{"results": [{"docID", "score", "title", "url"}, ...],
+        "elapsed": seconds}`, or `{"error": "..."}` for invalid requests
+    """
+    server: "SearchServer"
+
+    def setup(self):
+        super().setup()
+        self.server.track(self.connection, True)
+
+    def finish(self):
+        self.server.track(self.connection, False)
+        super().finish()
+
+    def handle(self):
+        while True:
+            line = self.rfile.readline(MAX_REQUEST_LEN + 1)
+            if not line:
+                return
+            if len(line) > MAX_REQUEST_LEN:
+                # Framing is lost, same as the async server
+                self.send({
+                    "error": "Invalid request: longer than "
+                             f"{MAX_REQUEST_LEN} bytes"
+                })
+                self.discard()
+                return
+            if not line.strip():
+                continue
+            try:
+                query, k = parseRequest(line)
+            except (ValueError, TypeError, KeyError) as e:
+                response = {"error": f"Invalid request: {e}"}
+            else:
+                with self.server.lock:
+                    response = answer(self.server.searchFunc, query, k)
+            self.send(response)
+
+    def send(self, response: Dict[str, Any]):
+        self.wfile.write(encodeMessage(response))
+        self.wfile.flush()
+
+    def discard(self):
+        """discard
+
+        Closing with unread input resets the connection, and the client may
+        lose the last response. Signal the end of the responses, then read
+        until the client closes or DISCARD_TIMEOUT elapses.
+        """
+        deadline = time.monotonic() + DISCARD_TIMEOUT
+        with suppress(OSError):
+            self.connection.shutdown(socket.SHUT_WR)
+            self.connection.settimeout(DISCARD_TIMEOUT)
+            while (time.monotonic() < deadline
+                   and self.connection.recv(MAX_REQUEST_LEN)):
+                pass
+
+
+class SearchServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """SearchServer - Search daemon over a Unix socket
+
+    Every connection is served by its own thread, so clients can stay
+    connected and send many queries. The index isn't safe to use from
+    several threads (barrel cache, barrel file offset, database connection),
+    so queries themselves run one at a time.
+
+    Attributes:
+        path: Socket path
+        searchFunc: Search function of a prepared `Indexer`
+        lock: Serialize access to the index
+        connections: Currently open connections
+    """
+    daemon_threads = False
+    block_on_close = True
+    request_queue_size = MAX_BACKLOG
+
+    def __init__(self, path: str, searchFunc: SearchFunc) -> None:
+        if os.path.exists(path):
+            # Left by a daemon that wasn't shut down properly
+            os.remove(path)
+        self.path = path
+        self.searchFunc = searchFunc
+        self.lock = threading.Lock()
+        self.connections: Set[socket.socket] = set()
+        self.connectionsLock = threading.Lock()
+        super().__init__(path, SearchHandler)
+
+    def track(self, connection: socket.socket, isOpen: bool):
+        with self.connectionsLock:
+            if isOpen:
+                self.connections.add(connection)
+            else:
+                self.connections.discard(connection)
+
+    def stop(self):
+        """stop
+
+        Stop accepting connections, and end every open connection once its
+        current request is answered. Safe to call from a signal handler.
+        """
+        # shutdown() waits for serve_forever(), which may run in this thread
+        threading.Thread(target=self.shutdown).start()
+        with self.connectionsLock:
+            for connection in self.connections:
+                try:
+                    connection.shutdown(socket.SHUT_RD)
+                except OSError:
+                    continue
+
+    def serve(self):
+        """serve
+
+        Serve until SIGINT or SIGTERM, then wait for open connections and
+        remove the socket.
+        """
+        handlers = {
+            s: signal.signal(s, lambda *_: self.stop())
+            for s in (signal.SIGINT, signal.SIGTERM)
+        }
+        print(f"Serving search on {self.path}")
+        try:
+            self.serve_forever()
+        finally:
+            for s, handler in handlers.items():
+                signal.signal(s, handler)
+            print("Shutting down search service...")
+            self.server_close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            print("Shutting down search service...DONE")
+
+
+class AsyncSearchServer:
+    """AsyncSearchServer - asyncio search daemon over a Unix socket
+
+    Same protocol as `SearchServer`. Reading, parsing and writing messages
+    stay on the event loop, searches run on a single executor thread since
+    the index isn't thread safe.
+
+    Clients may pipeline requests, sending the next ones before reading the
+    answers. Answers are written in request order. A connection stops being
+    read while MAX_PIPELINE of its requests are unanswered, and every
+    connection waits while MAX_PENDING requests are queued for the executor.
+
+    On shutdown, connections stop being read but requests already received
+    are still answered.
+
+    Attributes:
+        path: Socket path
+        searchFunc: Search function of a prepared `Indexer`
+        executor: Ranking executor
+        pending: Bound requests queued for the executor
+        stopping: Set once the server is shutting down
+        writers: Stream of every open connection
+    """
+    __slots__ = ("path", "searchFunc", "executor", "pending", "stopping",
+                 "writers")
+    # Created by `run`, before Python 3.10 they bind to the current loop
+    pending: asyncio.Semaphore
+    stopping: asyncio.Event
+
+    def __init__(self, path: str, searchFunc: SearchFunc) -> None:
+        self.path = path
+        self.searchFunc = searchFunc
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.writers: Set[asyncio.StreamWriter] = set()
+
+    async def handle(self, reader: asyncio.StreamReader,
+                     writer: asyncio.StreamWriter):
+        answers: asyncio.Queue = asyncio.Queue(MAX_PIPELINE)
+        sender = asyncio.create_task(self.send(answers, writer))
+        self.writers.add(writer)
+        overrun = False
+        try:
+            while True:
+                try:
+                    line = await self.readRequest(reader)
+                except ValueError as e:
+                    # Request longer than MAX_REQUEST_LEN, framing is lost
+                    await answers.put(self.reject(e))
+                    overrun = True
+                    break
+                if not line:
+                    break
+                if line.strip():
+                    await answers.put(await self.submit(line))
+        finally:
+            self.writers.discard(writer)
+            await answers.put(None)
+            await sender
+            if overrun:
+                await self.discard(reader, writer)
+            writer.close()
+            with suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def discard(self, reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter):
+        """discard
+
+        Same as `SearchHandler.discard`, so the client gets the last
+        response before the connection is closed.
+        """
+
+        async def drain():
+            while await reader.read(MAX_REQUEST_LEN):
+                pass
+
+        with suppress(OSError, asyncio.TimeoutError):
+            writer.write_eof()
+            await asyncio.wait_for(drain(), DISCARD_TIMEOUT)
+
+    async def readRequest(self, reader: asyncio.StreamReader) -> bytes:
+        """readRequest
+
+        Next request line. Once the server is stopping, only lines already
+        received are returned, then an empty line as if the connection was
+        closed.
+        """
+        if not self.stopping.is_set():
+            read = asyncio.ensure_future(reader.readline())
+            stop = asyncio.ensure_future(self.stopping.wait())
+            await asyncio.wait((read, stop),
+                               return_when=asyncio.FIRST_COMPLETED)
+            stop.cancel()
+            if read.done():
+                return read.result()
+            read.cancel()
+            with suppress(asyncio.CancelledError):
+                await read
+
+        # Reading is paused, a complete line is returned without waiting
+        read = asyncio.ensure_future(reader.readline())
+        await asyncio.sleep(0)
+        if read.done():
+            return read.result()
+        read.cancel()
+        with suppress(asyncio.CancelledError):
+            await read
+        return b""
+
+    def stop(self):
+        """stop
+
+        Stop accepting data from every connection, see `readRequest`.
+        """
+        self.stopping.set()
+        for writer in self.writers:
+            writer.transport.pause_reading()
+
+    async def submit(self, line: bytes) -> "asyncio.Future[Dict[str, Any]]":
+        try:
+            query, k = parseRequest(line)
+        except (ValueError, TypeError, KeyError) as e:
+            return self.reject(e)
+
+        await self.pending.acquire()
+        future = asyncio.get_running_loop().run_in_executor(
+            self.executor, answer, self.searchFunc, query, k)
+        future.add_done_callback(lambda _: self.pending.release())
+        return future
+
+    def reject(self, error: Exception) -> "asyncio.Future[Dict[str, Any]]":
+        future = asyncio.get_running_loop().create_future()
+        future.set_result({"error": f"Invalid request: {error}"})
+        return future
+
+    async def send(self, answers: asyncio.Queue, writer: asyncio.StreamWriter):
+        while True:
+            future = await answers.get()
+            if future is None:
+                return
+            response = await future
+            try:
+                writer.write(encodeMessage(response))
+                await writer.drain()
+            except ConnectionError:
+                # Client is gone, its remaining answers are dropped
+                continue
+
+    async def run(self):
+        if os.path.exists(self.path):
+            # Left by a daemon that wasn't shut down properly
+            os.remove(self.path)
+        self.pending = asyncio.Semaphore(MAX_PENDING)
+        self.stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for s in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(s, self.stop)
+
+        connections: Set[asyncio.Task] = set()
+
+        async def track(reader: asyncio.StreamReader,
+                        writer: asyncio.StreamWriter):
+            task = asyncio.current_task()
+            assert task is not None
+            connections.add(task)
+            try:
+                await self.handle(reader, writer)
+            finally:
+                connections.discard(task)
+
+        server = await asyncio.start_unix_server(track,
+                                                 self.path,
+                                                 limit=MAX_REQUEST_LEN,
+                                                 backlog=MAX_BACKLOG)
+        print(f"Serving search on {self.path}")
+        try:
+            await self.stopping.wait()
+        finally:
+            print("Shutting down search service...")
+            for s in (signal.SIGINT, signal.SIGTERM):
+                loop.remove_signal_handler(s)
+            server.close()
+            # Connections end once their received requests are answered
+            await asyncio.gather(*connections, return_exceptions=True)
+            await server.wait_closed()
+            self.executor.shutdown()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            print("Shutting down search service...DONE")
+
+    def serve(self):
+        """serve
+
+        Serve until SIGINT or SIGTERM, then answer received requests and
+        remove the socket.
+        """
+        asyncio.run(self.run())
+
+
+###################
+# Utility functions
+###################
+def parseRequest(line: bytes) -> Tuple[str, Optional[int]]:
+    """parseRequest
+
+    Returns:
+        (query, number of documents)
+    """
+    request = json.loads(line)
+    query = request["query"]
+    k = request.get("k", DEFAULT_K)
+    if not isinstance(query, str):
+        raise TypeError("query must be a string")
+    if k is not None and (not isinstance(k, int) or k < 1):
+        raise ValueError("k must be a positive integer or null")
+    return query, k
+
+
+def answer(searchFunc: SearchFunc, query: str,
+           k: Optional[int]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        res = searchFunc(query, k)
+    except Exception:
+        # Not a query error, keep the connection but report it
+        logger.exception("Search failed for %r", query)
+        return {"error": "Search failed"}
+    elapsed = time.perf_counter() - start
+    return {
+        "results": [{
+            "docID": docID,
+            "score": score,
+            "title": title,
+            "url": url
+        } for docID, score, title, url in res.values()],
+        "elapsed": elapsed,
+    }
+
+
+def encodeMessage(response: Dict[str, Any]) -> bytes:
+    return json.dumps(response).encode(ENCODING) + b"\n"
+
+
+def searchRemote(input: str,
+                 k: Optional[int] = DEFAULT_K,
+                 path: str = SEARCH_SOCKET_PATH) -> Dict[str, Any]:
+    """searchRemote
+
+    Send a single query to a running `SearchServer`.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        with sock.makefile("rwb") as f:
+            request = {"query": input, "k": k}
+            f.write(encodeMessage(request))
+            f.flush()
+            return json.loads(f.readline())
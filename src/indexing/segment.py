@@ -0,0 +1,210 @@
+import mmap
+import os
+import struct
+from array import array
+from typing import Iterator, Mapping, Sequence
+
+from src.indexing.compression import CompressedPostings
+from src.indexing.storage import BYTE_ORDER
+
+SEGMENT_MAGIC = b"TLSG"
+SEGMENT_VERSION = 2
+
+# magic, version, byte order (see `storage.BYTE_ORDER`), term count, doc
+# count, then offset of every section: term offsets, postings offsets, term
+# blob, postings blob, doc table
+SEGMENT_HEADER = struct.Struct("=4sIB3xII5Q")
+SECTION_ALIGN = 8
+
+
+class DocLengthTable(Mapping[int, int]):
+    """DocLengthTable - Read-only mapping between docID and word count
+
+    Backed by two sorted uint32 columns (docIDs and lengths), looked up with
+    a binary search.
+    """
+    __slots__ = ("docIDs", "lengths")
+
+    def __init__(self, docIDs: Sequence[int], lengths: Sequence[int]) -> None:
+        self.docIDs = docIDs
+        self.lengths = lengths
+
+    def __getitem__(self, docID: int) -> int:
+        lo, hi = 0, len(self.docIDs)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.docIDs[mid] < docID:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == len(self.docIDs) or self.docIDs[lo] != docID:
+            raise KeyError(docID)
+        return self.lengths[lo]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.docIDs)
+
+    def __len__(self) -> int:
+        return len(self.docIDs)
+
+
+class Segment(Mapping[str, CompressedPostings]):
+    """Segment - Memory-mapped, read-only index segment
+
+    Segment file consist of a sorted term dictionary, a postings blob (every
+    hitlist stored as `CompressedPostings`) and a document length table.
+    Opening a segment only parses the fixed-size header, everything else is
+    paged in lazily by the OS when accessed. Nothing is unpickled.
+
+    Layout (every section aligned to 8 bytes):
+        header: see `SEGMENT_HEADER`
+        term offsets: uint32[termCount + 1], offset of each term in term blob
+        postings offsets: uint64[termCount + 1], offset of each postings
+        term blob: UTF-8 encoded terms, sorted
+        postings blob: `CompressedPostings.toBytes()` of every term
+        doc table: uint32[docCount] docIDs (sorted), uint32[docCount] lengths
+
+    Attributes:
+        docLengths: Mapping between docID and word count
+    """
+    __slots__ = ("file", "buffer", "termCount", "termOffsets",
+                 "postingsOffsets", "terms", "postings", "docLengths")
+
+    def __init__(self, path: str) -> None:
+        self.file = open(path, "rb")
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self.buffer)
+
+        (magic, version, byteOrder, self.termCount, docCount, termOffsetsAt,
+         postingsOffsetsAt, termsAt, postingsAt,
+         docTableAt) = SEGMENT_HEADER.unpack_from(view)
+        if magic != SEGMENT_MAGIC:
+            raise ValueError(f"Not a segment file. Got magic {magic!r}")
+        # Checked before version, which is itself in native byte order
+        if byteOrder != BYTE_ORDER:
+            raise ValueError(f"{path}: written with other byte order")
+        if version != SEGMENT_VERSION:
+            raise ValueError(f"Unsupported segment version {version}")
+
+        self.termOffsets = view[termOffsetsAt:termOffsetsAt + 4 *
+                                (self.termCount + 1)].cast("I")
+        self.postingsOffsets = view[postingsOffsetsAt:postingsOffsetsAt + 8 *
+                                    (self.termCount + 1)].cast("Q")
+        self.terms = view[termsAt:postingsAt]
+        self.postings = view[postingsAt:docTableAt]
+        docIDs = view[docTableAt:docTableAt + 4 * docCount].cast("I")
+        lengths = view[docTableAt + 4 * docCount:docTableAt +
+                       8 * docCount].cast("I")
+        self.docLengths = DocLengthTable(docIDs, lengths)
+
+    def close(self):
+        # Views must be released before the map can be closed
+        for view in (self.termOffsets, self.postingsOffsets, self.terms,
+                     self.postings, self.docLengths.docIDs,
+                     self.docLengths.lengths):
+            view.release()  #type: ignore
+        try:
+            self.buffer.close()
+        except BufferError:
+            # Postings handed out are still referenced. The map will be
+            # released once they are garbage collected
+            pass
+        self.file.close()
+
+    def term(self, index: int) -> bytes:
+        return bytes(self.terms[self.termOffsets[index]:self.
+                                termOffsets[index + 1]])
+
+    def find(self, word: str) -> int:
+        """Get term index of word, or -1 if it doesn't exist"""
+        key = word.encode()
+        lo, hi = 0, self.termCount
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.term(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.termCount and self.term(lo) == key:
+            return lo
+        return -1
+
+    def postingsAt(self, index: int) -> CompressedPostings:
+        return CompressedPostings.fromBytes(
+            self.postings[self.postingsOffsets[index]:self.
+                          postingsOffsets[index + 1]])
+
+    def __getitem__(self, word: str) -> CompressedPostings:
+        index = self.find(word)
+        if index < 0:
+            raise KeyError(word)
+        return self.postingsAt(index)
+
+    def __contains__(self, word: object) -> bool:
+        return isinstance(word, str) and self.find(word) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(self.termCount):
+            yield self.term(i).decode()
+
+    def __len__(self) -> int:
+        return self.termCount
+
+
+def writeSegment(path: str, wordPairs: Mapping[str, Sequence[int]],
+                 wordDocCount: Mapping[int, int]):
+    """writeSegment
+
+    Write sorted hitlists and document lengths as a segment file. The file
+    is written to a temporary path first, then moved atomically.
+
+    Args:
+        path: Segment file path
+        wordPairs: Mapping between word and it's hitlist, sorted in
+            descending order
+        wordDocCount: Mapping between document ID and it's word count
+    """
+    termOffsets = array("I", [0])
+    postingsOffsets = array("Q", [0])
+    terms = bytearray()
+    postings = bytearray()
+    for word in sorted(wordPairs.keys()):
+        hits = wordPairs[word]
+        if isinstance(hits, CompressedPostings):
+            compressed = hits
+        else:
+            compressed = CompressedPostings.encode(hits)
+        terms += word.encode()
+        termOffsets.append(len(terms))
+        postings += compressed.toBytes()
+        # Keep postings aligned for zero-copy uint32 views
+        postings += bytes(-len(postings) % 4)
+        postingsOffsets.append(len(postings))
+
+    docIDs = array("I", sorted(wordDocCount.keys()))
+    lengths = array("I", (wordDocCount[d] for d in docIDs))
+
+    sections = [
+        termOffsets.tobytes(),
+        postingsOffsets.tobytes(),
+        bytes(terms),
+        bytes(postings),
+        docIDs.tobytes() + lengths.tobytes(),
+    ]
+
+    offsets = []
+    pos = SEGMENT_HEADER.size
+    for section in sections:
+        pos += -pos % SECTION_ALIGN
+        offsets.append(pos)
+        pos += len(section)
+
+    tempPath = f"{path}.tmp"
+    with open(tempPath, "wb") as f:
+        f.write(
+            SEGMENT_HEADER.pack(SEGMENT_MAGIC, SEGMENT_VERSION, BYTE_ORDER,
+                                len(termOffsets) - 1, len(docIDs), *offsets))
+        for section in sections:
+            f.write(bytes(-f.tell() % SECTION_ALIGN))
+            f.write(section)
+    os.replace(tempPath, path)
@@ -0,0 +1,154 @@
+import time
+from array import array
+from concurrent.futures import Future, ProcessPoolExecutor
+from heapq import merge
+from itertools import islice
+from typing import Dict, Iterable, List, Optional
+
+from src.indexing.hitlist import (
+    HIT_TYPECODE,
+    Document,
+    PostingStore,
+    encodeDocument,
+)
+
+# Number of documents handed to a worker at once
+SHARD_SIZE = 1000
+
+
+class Shard:
+    """Shard - Partial index for a contiguous docID range
+
+    Attributes:
+        wordPairs: Word hitlists, sorted in descending order
+        documentPairs: Document hitlists, only filled when using GST
+        wordDocCount: Mapping between document ID and it's word count
+    """
+
+    __slots__ = ("wordPairs", "documentPairs", "wordDocCount")
+
+    def __init__(self) -> None:
+        self.wordPairs: PostingStore[str] = PostingStore()
+        self.documentPairs: PostingStore[int] = PostingStore()
+        self.wordDocCount: Dict[int, int] = {}
+
+
+def buildShard(documents: List[Document], useGST: bool) -> Shard:
+    """buildShard
+
+    Worker entry point. Tokenize documents and build their sorted postings.
+
+    Args:
+        documents: List of (docID, paragraphs)
+        useGST: Whether document hitlists should be generated
+    """
+    shard = Shard()
+    for docID, paragraphs in documents:
+        words, hits = encodeDocument(docID, paragraphs)
+        for word, hit in zip(words, hits):
+            shard.wordPairs.append(word, hit)
+        if useGST:
+            shard.documentPairs.extend(docID, hits)
+        shard.wordDocCount[docID] = len(hits)
+
+    shard.wordPairs.freeze()
+    shard.documentPairs.freeze(sort=False)
+    return shard
+
+
+def mergeShards(shards: List[Shard]) -> Shard:
+    """mergeShards
+
+    Merge partial shards with a k-way merge per word. Resulting hitlists are
+    kept in descending order, as produced by `Indexer.sortHitlists`.
+    """
+    result = Shard()
+    parts: Dict[str, List["array[int]"]] = {}
+    for shard in shards:
+        for word, hits in shard.wordPairs.items():
+            try:
+                parts[word].append(hits)
+            except KeyError:
+                parts[word] = [hits]
+        result.documentPairs.update(shard.documentPairs)
+        result.wordDocCount.update(shard.wordDocCount)
+
+    for word, hitlists in parts.items():
+        result.wordPairs[word] = mergeHitlists(hitlists)
+
+    result.wordPairs.isFrozen = True
+    result.documentPairs.isFrozen = True
+    return result
+
+
+def mergeHitlists(hitlists: List["array[int]"]) -> "array[int]":
+    """mergeHitlists
+
+    K-way merge of hitlists sorted in descending order.
+    """
+    if len(hitlists) == 1:
+        return hitlists[0]
+
+    # Shards usually cover disjoint docID ranges, in which case the merge is
+    # a plain concatenation from the highest range to the lowest
+    ordered = sorted(hitlists, key=lambda h: h[0], reverse=True)
+    if all(ordered[i][-1] >= ordered[i + 1][0]
+           for i in range(len(ordered) - 1)):
+        result = array(HIT_TYPECODE)
+        for hits in ordered:
+            result.extend(hits)
+        return result
+
+    return array(HIT_TYPECODE, merge(*hitlists, reverse=True))
+
+
+def buildIndex(data: Iterable[Document],
+               workers: int,
+               useGST: bool,
+               shardSize: int = SHARD_SIZE) -> Shard:
+    """buildIndex
+
+    Build the index using multiple processes.
+
+    Documents are partitioned into chunks of `shardSize` consecutive
+    documents (a docID range when reading from `getRepositoryDump`). Each
+    chunk is indexed by a worker, and the resulting shards are merged once
+    every chunk is done. At most two chunks per worker are in flight, so the
+    input can still be streamed.
+
+    Args:
+        data: Iterable of (docID, paragraphs)
+        workers: Number of worker processes
+        useGST: Whether document hitlists should be generated
+        shardSize: Number of documents per shard
+    """
+    start = time.perf_counter()
+    documents = iter(data)
+    shards: List[Optional[Shard]] = []
+    pending: Dict[int, "Future[Shard]"] = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            chunk = list(islice(documents, shardSize))
+            if len(chunk) > 0:
+                pending[len(shards)] = executor.submit(buildShard, chunk,
+                                                       useGST)
+                shards.append(None)
+
+            # Bound number of chunks in flight
+            while len(pending) > 0 and (len(pending) >= 2 * workers
+                                        or len(chunk) == 0):
+                order = min(pending.keys())
+                shards[order] = pending.pop(order).result()
+
+            if len(chunk) == 0:
+                break
+
+    end = time.perf_counter()
+    print(f"Time elapsed building {len(shards)} shards: {end - start:0.4f}s")
+
+    start = time.perf_counter()
+    result = mergeShards([s for s in shards if s is not None])
+    end = time.perf_counter()
+    print(f"Time elapsed merging shards: {end - start:0.4f}s")
+    return result
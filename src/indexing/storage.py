@@ -0,0 +1,590 @@
+import os
+import struct
+import sys
+import zlib
+from array import array
+from itertools import chain
+from typing import (
+    AbstractSet,
+    Any,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Mapping,
+    Sequence,
+    Tuple,
+    TypedDict,
+)
+
+from src.indexing.compression import CompressedPostings
+from src.indexing.fuzzy import ID_TYPECODE, FuzzyIndex
+from src.indexing.hitlist import HIT_TYPECODE, PostingStore
+from src.indexing.scoring import WEIGHT_TYPECODE, BM25Stats
+from src.indexing.suffix_tree import DOC_TYPECODE, NODE_TYPECODE, SuffixTree
+
+STORAGE_MAGIC = b"TLSR"
+# Version 2: suffix tree stores documents of every node's subtree
+STORAGE_VERSION = 2
+
+# Artifact kinds
+KIND_BARRELS = 1
+KIND_DOCUMENT_PAIRS = 2
+KIND_DOC_WORD_COUNT = 3
+KIND_TREE = 4
+KIND_SCORING = 5
+KIND_FUZZY = 6
+KIND_TERM_STATS = 7
+
+# Header and section table are always little-endian. Section payloads use
+# the byte order recorded in the header, and are rejected on other hosts.
+# magic, version, kind, byte order, section count
+STORAGE_HEADER = struct.Struct("<4sHHB3xI")
+# section ID, offset, length, CRC32
+SECTION_ENTRY = struct.Struct("<IQQI")
+BYTE_ORDER = {"little": 0, "big": 1}[sys.byteorder]
+# Typecodes of stored columns
+Typecode = Literal["I", "i", "Q", "d"]
+SECTION_ALIGN = 8
+
+# Section IDs of barrel file. Barrel N is stored in section N + 1
+SECTION_MANIFEST = 0
+
+
+class BarrelInfo(TypedDict):
+    firstWord: str
+    lastWord: str
+    size: int
+    hitCount: int
+    wordCount: int
+
+
+class Barrel:
+
+    __slots__ = ("lastAccessed","pairs", "isLoaded" )
+
+    def __init__(self) -> None:
+        self.pairs: Dict[str, CompressedPostings] = {}
+        self.isLoaded = False
+        self.lastAccessed = 0
+
+    def nbytes(self) -> int:
+        return sum(len(k) + v.nbytes() for k, v in self.pairs.items())
+
+
+class StorageError(ValueError):
+    pass
+
+
+#################
+# Section codecs
+#################
+
+
+class SectionWriter:
+    """SectionWriter - Build a section payload from struct-packed columns
+
+    Every column is aligned to 4 bytes, so readers can view it in place.
+    """
+    __slots__ = ("buffer", )
+
+    def __init__(self) -> None:
+        self.buffer = bytearray()
+
+    def align(self):
+        self.buffer += bytes(-len(self.buffer) % 4)
+
+    def uint(self, value: int):
+        self.buffer += struct.pack("=Q", value)
+
+    def column(self, typecode: Typecode, values: Iterable[float]):
+        data = array(typecode, values)
+        self.uint(len(data))
+        self.buffer += data.tobytes()
+        self.align()
+
+    def blob(self, data: bytes):
+        self.uint(len(data))
+        self.buffer += data
+        self.align()
+
+    def strings(self, values: Sequence[str]):
+        encoded = [v.encode() for v in values]
+        offsets = [0]
+        for e in encoded:
+            offsets.append(offsets[-1] + len(e))
+        self.column("Q", offsets)
+        self.blob(b"".join(encoded))
+
+    def getvalue(self) -> bytes:
+        return bytes(self.buffer)
+
+
+class SectionReader:
+    """SectionReader - Read columns written by `SectionWriter`
+
+    Columns are returned as memoryview into the section, without copying.
+    """
+    __slots__ = ("view", "pos")
+
+    def __init__(self, data: bytes) -> None:
+        self.view = memoryview(data)
+        self.pos = 0
+
+    def align(self):
+        self.pos += -self.pos % 4
+
+    def uint(self) -> int:
+        (value, ) = struct.unpack_from("=Q", self.view, self.pos)
+        self.pos += 8
+        return value
+
+    def column(self, typecode: Typecode) -> "memoryview[Any]":
+        count = self.uint()
+        size = count * struct.calcsize(typecode)
+        result = self.view[self.pos:self.pos + size].cast(typecode)
+        self.pos += size
+        self.align()
+        return result
+
+    def blob(self) -> memoryview:
+        size = self.uint()
+        result = self.view[self.pos:self.pos + size]
+        self.pos += size
+        self.align()
+        return result
+
+    def strings(self) -> List[str]:
+        offsets = self.column("Q")
+        data = bytes(self.blob())
+        return [
+            data[offsets[i]:offsets[i + 1]].decode()
+            for i in range(len(offsets) - 1)
+        ]
+
+
+############
+# Container
+############
+
+
+def writeContainer(path: str, kind: int, sections: Sequence[Tuple[int,
+                                                                   bytes]]):
+    """writeContainer
+
+    Write sections into a versioned binary file. The file is written to a
+    temporary path first, then moved atomically.
+
+    Args:
+        path: Destination file path
+        kind: Artifact kind stored in the header
+        sections: List of (section ID, payload)
+    """
+    offsets: List[int] = []
+    pos = STORAGE_HEADER.size + SECTION_ENTRY.size * len(sections)
+    for _, payload in sections:
+        pos += -pos % SECTION_ALIGN
+        offsets.append(pos)
+        pos += len(payload)
+
+    tempPath = f"{path}.tmp"
+    with open(tempPath, "wb") as f:
+        f.write(
+            STORAGE_HEADER.pack(STORAGE_MAGIC, STORAGE_VERSION, kind,
+                                BYTE_ORDER, len(sections)))
+        for (sectionID, payload), offset in zip(sections, offsets):
+            f.write(
+                SECTION_ENTRY.pack(sectionID, offset, len(payload),
+                                   zlib.crc32(payload)))
+        for _, payload in sections:
+            f.write(bytes(-f.tell() % SECTION_ALIGN))
+            f.write(payload)
+    os.replace(tempPath, path)
+
+
+class Container:
+    """Container - Reader for files written by `writeContainer`
+
+    Only the header and section table are read when opening. Sections are
+    read on demand, and their checksum verified.
+
+    Attributes:
+        entries: Mapping between section ID and (offset, length, crc)
+    """
+    __slots__ = ("file", "entries")
+
+    def __init__(self, path: str, kind: int) -> None:
+        self.file = open(path, "rb")
+        try:
+            header = self.file.read(STORAGE_HEADER.size)
+            if len(header) != STORAGE_HEADER.size:
+                raise StorageError(f"{path}: truncated header")
+            (magic, version, fileKind, byteOrder,
+             count) = STORAGE_HEADER.unpack(header)
+            if magic != STORAGE_MAGIC:
+                raise StorageError(f"{path}: got magic {magic!r} instead")
+            if version != STORAGE_VERSION:
+                raise StorageError(f"{path}: unsupported version {version}")
+            if fileKind != kind:
+                raise StorageError(
+                    f"{path}: expected kind {kind}, got {fileKind}")
+            if byteOrder != BYTE_ORDER:
+                raise StorageError(f"{path}: written with other byte order")
+
+            self.entries: Dict[int, Tuple[int, int, int]] = {}
+            table = self.file.read(SECTION_ENTRY.size * count)
+            for sectionID, offset, length, crc in SECTION_ENTRY.iter_unpack(
+                    table):
+                self.entries[sectionID] = (offset, length, crc)
+        except Exception:
+            self.file.close()
+            raise
+
+    def section(self, sectionID: int) -> bytes:
+        offset, length, crc = self.entries[sectionID]
+        self.file.seek(offset)
+        payload = self.file.read(length)
+        if len(payload) != length or zlib.crc32(payload) != crc:
+            raise StorageError(f"Section {sectionID} is corrupted")
+        return payload
+
+    def close(self):
+        self.file.close()
+
+
+##########
+# Barrels
+##########
+
+
+def encodeBarrel(barrel: Barrel) -> bytes:
+    words = list(barrel.pairs.keys())
+    postings = [barrel.pairs[w].toBytes() for w in words]
+    # Pad postings so every of them start aligned
+    postings = [p + bytes(-len(p) % 4) for p in postings]
+    offsets = [0]
+    for p in postings:
+        offsets.append(offsets[-1] + len(p))
+
+    w = SectionWriter()
+    w.strings(words)
+    w.column("Q", offsets)
+    w.blob(b"".join(postings))
+    return w.getvalue()
+
+
+def decodeBarrel(data: bytes) -> Barrel:
+    r = SectionReader(data)
+    words = r.strings()
+    offsets = r.column("Q")
+    blob = r.blob()
+    barrel = Barrel()
+    for i, word in enumerate(words):
+        barrel.pairs[word] = CompressedPostings.fromBytes(
+            blob[offsets[i]:offsets[i + 1]])
+    return barrel
+
+
+def splitBarrels(pairs: Sequence[Tuple[str, CompressedPostings]],
+                 barrelCount: int) -> Tuple[List[Barrel], List[BarrelInfo]]:
+    """splitBarrels
+
+    Split sorted hitlists into barrelCount barrels of roughly the same
+    postings size.
+
+    Args:
+        pairs: (word, postings), sorted by word
+        barrelCount: Number of barrels
+
+    Returns:
+        (barrels, information of every barrel)
+    """
+    remainingSize = sum(len(word) + hits.nbytes() for word, hits in pairs)
+    manifest: List[BarrelInfo] = []
+    barrels: List[Barrel] = []
+    tempBarrel = Barrel()
+    curSize = 0
+    for i, (word, hits) in enumerate(pairs):
+        tempBarrel.pairs[word] = hits
+        curSize += len(word) + hits.nbytes()
+        # Spread what's left evenly, so a large hitlist doesn't starve
+        # the remaining barrels
+        barrelSize = remainingSize / max(barrelCount - len(manifest), 1)
+
+        # Always flush the last barrel
+        if curSize >= barrelSize or i == len(pairs) - 1:
+            words = list(tempBarrel.pairs.keys())
+            manifest.append({
+                "firstWord": words[0],
+                "lastWord": words[-1],
+                "size": curSize,
+                "hitCount": sum(len(h) for h in tempBarrel.pairs.values()),
+                "wordCount": len(words),
+            })
+            barrels.append(tempBarrel)
+            tempBarrel = Barrel()
+            remainingSize -= curSize
+            curSize = 0
+    return barrels, manifest
+
+
+def writeBarrels(path: str, barrels: Sequence[Barrel],
+                 manifest: Sequence[BarrelInfo]):
+    w = SectionWriter()
+    w.strings([info["firstWord"] for info in manifest])
+    w.strings([info["lastWord"] for info in manifest])
+    w.column("Q", (info["size"] for info in manifest))
+    w.column("Q", (info["hitCount"] for info in manifest))
+    w.column("Q", (info["wordCount"] for info in manifest))
+
+    sections = [(SECTION_MANIFEST, w.getvalue())]
+    for i, barrel in enumerate(barrels):
+        sections.append((i + 1, encodeBarrel(barrel)))
+    writeContainer(path, KIND_BARRELS, sections)
+
+
+class BarrelStore(Mapping[str, Barrel]):
+    """BarrelStore - Barrel file reader, keyed by barrel first word
+
+    Only the manifest is read when opening the file. Every access to a
+    barrel reads and decodes it from disk.
+
+    Attributes:
+        manifest: Information of every barrel, sorted by first word
+    """
+    __slots__ = ("container", "manifest", "sectionIDs")
+
+    def __init__(self, path: str) -> None:
+        self.container = Container(path, KIND_BARRELS)
+        r = SectionReader(self.container.section(SECTION_MANIFEST))
+        firstWords = r.strings()
+        lastWords = r.strings()
+        sizes = r.column("Q")
+        hitCounts = r.column("Q")
+        wordCounts = r.column("Q")
+        self.manifest: List[BarrelInfo] = [{
+            "firstWord": firstWords[i],
+            "lastWord": lastWords[i],
+            "size": sizes[i],
+            "hitCount": hitCounts[i],
+            "wordCount": wordCounts[i],
+        } for i in range(len(firstWords))]
+        self.sectionIDs = {w: i + 1 for i, w in enumerate(firstWords)}
+
+    def __getitem__(self, firstWord: str) -> Barrel:
+        return decodeBarrel(self.container.section(
+            self.sectionIDs[firstWord]))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.sectionIDs)
+
+    def __len__(self) -> int:
+        return len(self.sectionIDs)
+
+    def close(self):
+        self.container.close()
+
+
+##################
+# Document pairs
+##################
+
+
+def writeDocumentPairs(path: str, documentPairs: Mapping[int,
+                                                         Sequence[int]]):
+    docIDs = sorted(documentPairs.keys())
+    offsets = [0]
+    hits = array(HIT_TYPECODE)
+    for docID in docIDs:
+        hits.extend(documentPairs[docID])
+        offsets.append(len(hits))
+
+    w = SectionWriter()
+    w.column("I", docIDs)
+    w.column("Q", offsets)
+    w.column(HIT_TYPECODE, hits)
+    writeContainer(path, KIND_DOCUMENT_PAIRS, [(0, w.getvalue())])
+
+
+def readDocumentPairs(path: str) -> PostingStore[int]:
+    container = Container(path, KIND_DOCUMENT_PAIRS)
+    try:
+        r = SectionReader(container.section(0))
+    finally:
+        container.close()
+    docIDs = r.column("I")
+    offsets = r.column("Q")
+    hits = r.column(HIT_TYPECODE)
+
+    result: PostingStore[int] = PostingStore()
+    for i, docID in enumerate(docIDs):
+        result[docID] = array(HIT_TYPECODE, hits[offsets[i]:offsets[i + 1]])
+    result.isFrozen = True
+    return result
+
+
+######################
+# Document word count
+######################
+
+
+def writeDocWordCount(path: str, wordDocCount: Mapping[int, int]):
+    docIDs = sorted(wordDocCount.keys())
+    w = SectionWriter()
+    w.column("I", docIDs)
+    w.column("I", (wordDocCount[d] for d in docIDs))
+    writeContainer(path, KIND_DOC_WORD_COUNT, [(0, w.getvalue())])
+
+
+def readDocWordCount(path: str) -> Dict[int, int]:
+    container = Container(path, KIND_DOC_WORD_COUNT)
+    try:
+        r = SectionReader(container.section(0))
+    finally:
+        container.close()
+    docIDs = r.column("I")
+    counts = r.column("I")
+    return dict(zip(docIDs, counts))
+
+
+#######
+# Tree
+#######
+
+
+def writeTree(path: str, tree: SuffixTree):
+    """writeTree
+
+    Write a frozen suffix tree. Every node array is stored as a column.
+    """
+    if not tree.isFrozen:
+        raise ValueError("Suffix tree must be frozen before stored")
+    w = SectionWriter()
+    w.blob(bytes(tree.text))
+    for column in (tree.edgeStart, tree.edgeEnd, tree.firstChild,
+                   tree.nextSibling):
+        w.column(NODE_TYPECODE, column)
+    w.column(DOC_TYPECODE, tree.postingOffsets)
+    w.column(DOC_TYPECODE, tree.postingDocs)
+    writeContainer(path, KIND_TREE, [(0, w.getvalue())])
+
+
+def readTree(path: str) -> SuffixTree:
+    container = Container(path, KIND_TREE)
+    try:
+        r = SectionReader(container.section(0))
+    finally:
+        container.close()
+
+    tree = SuffixTree()
+    tree.text = bytearray(r.blob())
+    # Initializing array from bytes copies the column as is
+    tree.edgeStart = array(NODE_TYPECODE, r.column(NODE_TYPECODE).tobytes())
+    tree.edgeEnd = array(NODE_TYPECODE, r.column(NODE_TYPECODE).tobytes())
+    tree.firstChild = array(NODE_TYPECODE, r.column(NODE_TYPECODE).tobytes())
+    tree.nextSibling = array(NODE_TYPECODE, r.column(NODE_TYPECODE).tobytes())
+    tree.posting = array(NODE_TYPECODE)
+    tree.postingOffsets = array(DOC_TYPECODE, r.column(DOC_TYPECODE).tobytes())
+    tree.postingDocs = array(DOC_TYPECODE, r.column(DOC_TYPECODE).tobytes())
+    tree.isFrozen = True
+    tree.indexChildren()
+    return tree
+
+
+##########
+# Scoring
+##########
+
+
+def writeScoringStats(path: str, stats: BM25Stats):
+    words = sorted(stats.idf.keys())
+    w = SectionWriter()
+    w.strings(words)
+    w.column(WEIGHT_TYPECODE, (stats.idf[word] for word in words))
+    w.column("I", stats.docIDs)
+    w.column(WEIGHT_TYPECODE, stats.lengthNorms)
+    writeContainer(path, KIND_SCORING, [(0, w.getvalue())])
+
+
+def readScoringStats(path: str) -> BM25Stats:
+    container = Container(path, KIND_SCORING)
+    try:
+        r = SectionReader(container.section(0))
+    finally:
+        container.close()
+    words = r.strings()
+    idf = r.column(WEIGHT_TYPECODE)
+    docIDs = array("I", r.column("I").tobytes())
+    lengthNorms = array(WEIGHT_TYPECODE, r.column(WEIGHT_TYPECODE).tobytes())
+    return BM25Stats(dict(zip(words, idf)), docIDs, lengthNorms)
+
+
+#############
+# Term stats
+#############
+
+
+def writeTermStats(path: str, documentFrequency: Mapping[str, int],
+                   commonWords: AbstractSet[str]):
+    words = sorted(documentFrequency.keys())
+    w = SectionWriter()
+    w.strings(words)
+    w.column("I", (documentFrequency[word] for word in words))
+    w.strings(sorted(commonWords))
+    writeContainer(path, KIND_TERM_STATS, [(0, w.getvalue())])
+
+
+def readTermStats(path: str) -> Tuple[Dict[str, int], FrozenSet[str]]:
+    """readTermStats
+
+    Returns:
+        (mapping between word and it's document frequency, common words)
+    """
+    container = Container(path, KIND_TERM_STATS)
+    try:
+        r = SectionReader(container.section(0))
+    finally:
+        container.close()
+    words = r.strings()
+    documentFrequency = dict(zip(words, r.column("I")))
+    return documentFrequency, frozenset(r.strings())
+
+
+##############
+# Fuzzy index
+##############
+
+
+def writeFuzzyIndex(path: str, index: FuzzyIndex):
+    keys = sorted(index.postings.keys())
+    offsets = [0]
+    for key in keys:
+        offsets.append(offsets[-1] + len(index.postings[key]))
+    w = SectionWriter()
+    w.strings(index.words)
+    w.column(ID_TYPECODE, index.sizeStarts)
+    w.strings(keys)
+    w.column("Q", offsets)
+    w.column(ID_TYPECODE, chain.from_iterable(index.postings[k] for k in keys))
+    writeContainer(path, KIND_FUZZY, [(0, w.getvalue())])
+
+
+def readFuzzyIndex(path: str) -> FuzzyIndex:
+    container = Container(path, KIND_FUZZY)
+    try:
+        r = SectionReader(container.section(0))
+    finally:
+        container.close()
+    words = r.strings()
+    sizeStarts = array(ID_TYPECODE, r.column(ID_TYPECODE).tobytes())
+    keys = r.strings()
+    offsets = r.column("Q")
+    ids = r.column(ID_TYPECODE)
+    # Posting lists are views into the section, without copying
+    postings: Dict[str, Sequence[int]] = {
+        key: ids[offsets[i]:offsets[i + 1]]
+        for i, key in enumerate(keys)
+    }
+    return FuzzyIndex(words, sizeStarts, postings)
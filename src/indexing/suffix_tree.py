@@ -0,0 +1,371 @@
+from array import array
+from typing import Dict, Final, List, Sequence
+
+# Node ID of the tree root
+ROOT = 0
+# Sentinel for missing node / posting
+NONE = -1
+# Terminal symbol appended to every word
+TERMINATOR = ord("$")
+
+NODE_TYPECODE: Final = "i"
+DOC_TYPECODE: Final = "I"
+
+# Tree builders. Naive builder insert every suffix from the root, Ukkonen
+# builder insert a whole word in linear time using suffix links
+BUILDER_NAIVE = "naive"
+BUILDER_UKKONEN = "ukkonen"
+BUILDERS = (BUILDER_NAIVE, BUILDER_UKKONEN)
+
+
+class SuffixTree:
+    """SuffixTree - Generalized suffix tree stored in flat integer arrays
+
+    Every node is an index into parallel arrays. Edge labels are slices of a
+    single text buffer holding every unique word (terminated by `$`), and
+    children form a linked list through `firstChild` / `nextSibling`. No
+    object is allocated per node.
+
+    While building, every leaf owns a posting (referenced by `posting`)
+    holding the documents containing its suffix. `freeze` precomputes the
+    documents of every node's subtree, i.e. every document containing the
+    node's path as a substring, as a sorted docID array packed into
+    `postingOffsets` / `postingDocs`. Both builders produce the same tree
+    and postings.
+
+    Once frozen, children are also indexed in `childIndex`, keyed by parent
+    node and first character of the edge (`node << 8 | char`), so a lookup
+    doesn't scan the sibling list.
+
+    Attributes:
+        text: Text buffer referenced by edge labels
+        edgeStart: Start offset of each node's edge label in `text`
+        edgeEnd: End offset (exclusive) of each node's edge label in `text`
+        firstChild: First child of each node, or -1
+        nextSibling: Next sibling of each node, or -1
+        posting: Posting ID of each leaf, or -1. Only used while building
+        postingOffsets: Offset of each node's documents in `postingDocs`
+        postingDocs: Sorted document IDs of every node's subtree
+        words: Mapping between inserted word and posting ID of each suffix
+        link: Suffix link of each inner node, only used by Ukkonen builder
+        childIndex: Mapping between (node, first character) and child
+    """
+    __slots__ = ("text", "edgeStart", "edgeEnd", "firstChild", "nextSibling",
+                 "posting", "postingOffsets", "postingDocs", "postings",
+                 "words", "isFrozen", "builder", "link", "childIndex")
+
+    def __init__(self, builder: str = BUILDER_UKKONEN) -> None:
+        if builder not in BUILDERS:
+            raise ValueError(f"Unknown suffix tree builder {builder}")
+        self.builder = builder
+        self.text = bytearray()
+        self.edgeStart = array(NODE_TYPECODE, [0])
+        self.edgeEnd = array(NODE_TYPECODE, [0])
+        self.firstChild = array(NODE_TYPECODE, [NONE])
+        self.nextSibling = array(NODE_TYPECODE, [NONE])
+        self.posting = array(NODE_TYPECODE, [NONE])
+        self.postingOffsets = array(DOC_TYPECODE, [0])
+        self.postingDocs = array(DOC_TYPECODE)
+        self.postings: List[List[int]] = []
+        self.words: Dict[str, "array[int]"] = {}
+        self.isFrozen = False
+        self.link = array(NODE_TYPECODE, [NONE])
+        self.childIndex: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.edgeStart)
+
+    def add(self, word: str, docID: int):
+        """add
+
+        Add every suffix of word, marking them as found in docID. Suffixes of
+        a word are only inserted once, later occurrences only update postings.
+        """
+        if self.isFrozen:
+            raise RuntimeError("Suffix tree is already frozen")
+        try:
+            postingIDs = self.words[word]
+        except KeyError:
+            start = len(self.text)
+            self.text += word.encode()
+            self.text.append(TERMINATOR)
+            end = len(self.text)
+            if self.builder == BUILDER_UKKONEN:
+                postingIDs = self.__insertWord(start, end)
+            else:
+                postingIDs = array(NODE_TYPECODE,
+                                   (self.__insertSuffix(i, end)
+                                    for i in range(start, end)))
+            self.words[word] = postingIDs
+
+        for p in postingIDs:
+            docs = self.postings[p]
+            # Words of a document are added together
+            if len(docs) == 0 or docs[-1] != docID:
+                docs.append(docID)
+
+    def freeze(self):
+        """freeze
+
+        Compute and pack the documents of every node's subtree. Frozen tree
+        can't be modified anymore.
+        """
+        # Children come after their parent in pre-order, so reversed
+        # pre-order visits every subtree before its root
+        order = array(NODE_TYPECODE)
+        stack = [ROOT]
+        while len(stack) > 0:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(self.children(node))
+
+        subtree: List[Sequence[int]] = [()] * len(self)
+        for node in reversed(order):
+            child = self.firstChild[node]
+            if node == ROOT:
+                # Empty path matches nothing
+                continue
+            if child == NONE:
+                docs = set(self.postings[self.posting[node]])
+            else:
+                docs = set()
+                while child != NONE:
+                    docs.update(subtree[child])
+                    child = self.nextSibling[child]
+            subtree[node] = array(DOC_TYPECODE, sorted(docs))
+
+        for docs in subtree:
+            self.postingDocs.extend(docs)
+            self.postingOffsets.append(len(self.postingDocs))
+        self.posting = array(NODE_TYPECODE)
+        self.postings = []
+        self.words = {}
+        self.link = array(NODE_TYPECODE)
+        self.isFrozen = True
+        self.indexChildren()
+
+    def indexChildren(self):
+        """indexChildren
+
+        Build `childIndex` from the sibling lists. The index isn't stored, it
+        has to be rebuilt whenever a frozen tree is restored.
+        """
+        text = self.text
+        edgeStart = self.edgeStart
+        nextSibling = self.nextSibling
+        index: Dict[int, int] = {}
+        for node, child in enumerate(self.firstChild):
+            while child != NONE:
+                index[node << 8 | text[edgeStart[child]]] = child
+                child = nextSibling[child]
+        self.childIndex = index
+
+    def child(self, node: int, char: int) -> int:
+        """Get child of node whose edge starts with char, or -1"""
+        if self.isFrozen:
+            return self.childIndex.get(node << 8 | char, NONE)
+        text = self.text
+        child = self.firstChild[node]
+        while child != NONE and text[self.edgeStart[child]] != char:
+            child = self.nextSibling[child]
+        return child
+
+    def children(self, node: int) -> List[int]:
+        result: List[int] = []
+        child = self.firstChild[node]
+        while child != NONE:
+            result.append(child)
+            child = self.nextSibling[child]
+        return result
+
+    def label(self, node: int) -> str:
+        return self.text[self.edgeStart[node]:self.edgeEnd[node]].decode()
+
+    def locate(self, key: bytes) -> int:
+        """locate
+
+        Walk down the path spelled by key, matching whole edge labels at
+        once.
+
+        Returns:
+            Node whose subtree holds every suffix starting with key, or -1
+            if key doesn't occur in the tree
+        """
+        text = self.text
+        node = ROOT
+        pos = 0
+        while pos < len(key):
+            node = self.child(node, key[pos])
+            if node == NONE:
+                return NONE
+            start = self.edgeStart[node]
+            length = min(self.edgeEnd[node] - start, len(key) - pos)
+            if text[start:start + length] != key[pos:pos + length]:
+                return NONE
+            pos += length
+        return node
+
+    def documents(self, node: int) -> Sequence[int]:
+        """Get sorted document IDs of the node's subtree"""
+        if not self.isFrozen:
+            raise RuntimeError("Suffix tree must be frozen first")
+        return self.postingDocs[self.postingOffsets[node]:self.
+                                postingOffsets[node + 1]]
+
+    def __newNode(self, start: int, end: int, posting: int) -> int:
+        self.edgeStart.append(start)
+        self.edgeEnd.append(end)
+        self.firstChild.append(NONE)
+        self.nextSibling.append(NONE)
+        self.posting.append(posting)
+        self.link.append(NONE)
+        return len(self.edgeStart) - 1
+
+    def __newLeaf(self, parent: int, start: int, end: int) -> int:
+        self.postings.append([])
+        leaf = self.__newNode(start, end, len(self.postings) - 1)
+        self.nextSibling[leaf] = self.firstChild[parent]
+        self.firstChild[parent] = leaf
+        return self.posting[leaf]
+
+    def __insertSuffix(self, pos: int, end: int) -> int:
+        """__insertSuffix
+
+        Insert text[pos:end] (ending with the terminator), walking down from
+        the root and splitting at most one edge.
+
+        Returns:
+            Posting ID of the suffix's leaf
+        """
+        text = self.text
+        edgeStart = self.edgeStart
+        edgeEnd = self.edgeEnd
+        node = ROOT
+        while True:
+            char = text[pos]
+            prev = NONE
+            child = self.firstChild[node]
+            while child != NONE and text[edgeStart[child]] != char:
+                prev = child
+                child = self.nextSibling[child]
+            if child == NONE:
+                return self.__newLeaf(node, pos, end)
+
+            childStart = edgeStart[child]
+            length = edgeEnd[child] - childStart
+            k = 1
+            while k < length and text[childStart + k] == text[pos + k]:
+                k += 1
+            pos += k
+            if k == length:
+                # Terminator only appears at the end of a leaf's edge
+                if pos == end:
+                    return self.posting[child]
+                node = child
+                continue
+
+            # Split the edge, inner node takes over child's place
+            inner = self.__newNode(childStart, childStart + k, NONE)
+            self.nextSibling[inner] = self.nextSibling[child]
+            if prev == NONE:
+                self.firstChild[node] = inner
+            else:
+                self.nextSibling[prev] = inner
+            edgeStart[child] = childStart + k
+            self.nextSibling[child] = NONE
+            self.firstChild[inner] = child
+            return self.__newLeaf(inner, pos, end)
+
+    def __insertWord(self, start: int, end: int) -> "array[int]":
+        """__insertWord
+
+        Insert every suffix of text[start:end] with Ukkonen's algorithm. The
+        tree is extended one character at a time from an active point, and
+        suffix links are followed to the next extension instead of walking
+        down from the root again.
+
+        Every word ends with the same terminator, so the last phase may find
+        suffixes that already exist in the tree (inserted by other words).
+        Their existing leaves are collected instead of stopping the phase.
+
+        Returns:
+            Posting ID of the leaf of each suffix, from the longest one
+        """
+        text = self.text
+        edgeStart = self.edgeStart
+        edgeEnd = self.edgeEnd
+        link = self.link
+        postingIDs = array(NODE_TYPECODE)
+
+        activeNode = ROOT
+        activeEdge = start
+        activeLength = 0
+        remainder = 0
+        for pos in range(start, end):
+            char = text[pos]
+            remainder += 1
+            lastInner = NONE
+            while remainder > 0:
+                if activeLength == 0:
+                    activeEdge = pos
+
+                prev = NONE
+                child = self.firstChild[activeNode]
+                edgeChar = text[activeEdge]
+                while child != NONE and text[edgeStart[child]] != edgeChar:
+                    prev = child
+                    child = self.nextSibling[child]
+
+                if child == NONE:
+                    postingIDs.append(self.__newLeaf(activeNode, pos, end))
+                    if lastInner != NONE:
+                        link[lastInner] = activeNode
+                        lastInner = NONE
+                else:
+                    childStart = edgeStart[child]
+                    length = edgeEnd[child] - childStart
+                    if activeLength >= length:
+                        # Walk down to the next node
+                        activeEdge += length
+                        activeLength -= length
+                        activeNode = child
+                        continue
+
+                    if text[childStart + activeLength] == char:
+                        if lastInner != NONE:
+                            link[lastInner] = activeNode
+                            lastInner = NONE
+                        if char != TERMINATOR:
+                            activeLength += 1
+                            break
+                        # Terminator only ends a leaf's edge, so the suffix
+                        # already exists as that leaf
+                        postingIDs.append(self.posting[child])
+                    else:
+                        # Split the edge, inner node takes over child's place
+                        inner = self.__newNode(childStart,
+                                               childStart + activeLength,
+                                               NONE)
+                        self.nextSibling[inner] = self.nextSibling[child]
+                        if prev == NONE:
+                            self.firstChild[activeNode] = inner
+                        else:
+                            self.nextSibling[prev] = inner
+                        edgeStart[child] = childStart + activeLength
+                        self.nextSibling[child] = NONE
+                        self.firstChild[inner] = child
+                        postingIDs.append(self.__newLeaf(inner, pos, end))
+                        if lastInner != NONE:
+                            link[lastInner] = inner
+                        lastInner = inner
+
+                remainder -= 1
+                if activeNode == ROOT and activeLength > 0:
+                    activeLength -= 1
+                    activeEdge = pos - remainder + 1
+                elif activeNode != ROOT:
+                    activeNode = link[activeNode]
+                    if activeNode == NONE:
+                        activeNode = ROOT
+
+        return postingIDs